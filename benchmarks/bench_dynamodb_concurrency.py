@@ -0,0 +1,59 @@
+"""Compares inline PynamoDB calls against the executor-backed repository layer.
+
+Each DbUser.get is replaced with a fake that sleeps for a simulated DynamoDB round
+trip, so no DynamoDB (or LocalStack) is needed. Inline calls block the event loop
+and run one after another; repository calls overlap up to the pool size.
+
+    PYTHONPATH=. python benchmarks/bench_dynamodb_concurrency.py
+"""
+
+import asyncio
+import time
+from typing import Callable, List
+
+from openapi_server.orms.user import DbUser
+from openapi_server.repositories import user_repository
+from openapi_server.repositories.executor import configure_executor
+
+ROUND_TRIP_SECONDS: float = 0.02
+REQUESTS: int = 200
+
+
+def fake_get(username: str) -> DbUser:
+    time.sleep(ROUND_TRIP_SECONDS)  # stands in for the network round trip
+    return DbUser(username)
+
+
+async def inline_handler(username: str) -> DbUser:
+    return DbUser.get(username)  # what the handlers did before the repository layer
+
+
+async def repository_handler(username: str) -> DbUser:
+    return await user_repository.get_user(username)
+
+
+async def run(handler: Callable) -> float:
+    start: float = time.perf_counter()
+    await asyncio.gather(*[handler(f"user{i}") for i in range(REQUESTS)])
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    DbUser.get = fake_get  # type: ignore
+    results: List[str] = []
+
+    elapsed: float = asyncio.run(run(inline_handler))
+    results.append(f"inline          {elapsed:7.3f}s  {REQUESTS / elapsed:8.1f} req/s")
+    for workers in (1, 8, 32, 64):
+        configure_executor(workers)
+        elapsed = asyncio.run(run(repository_handler))
+        results.append(
+            f"executor x{workers:<4} {elapsed:7.3f}s  {REQUESTS / elapsed:8.1f} req/s"
+        )
+
+    print(f"{REQUESTS} concurrent gets, {ROUND_TRIP_SECONDS * 1000:.0f}ms round trip")
+    print("\n".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compares a client per request against the shared pooled Google Maps client.
+
+Starts a fake Places server on localhost and sends the same nearby searches both
+ways, counting the TCP connections the server accepted. The fake server speaks
+plain HTTP, so the real saving against maps.googleapis.com is larger: every new
+connection there also pays a TLS handshake.
+
+    PYTHONPATH=. python benchmarks/bench_google_maps_client.py
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import time
+from typing import Set, Tuple
+
+import uvicorn
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from openapi_server.clients import google_maps
+
+REQUESTS: int = 200
+CONCURRENCY: int = 10
+
+connections: Set[Tuple[str, int]] = set()
+
+
+async def nearby_search(request: Request) -> JSONResponse:
+    connections.add((request.client.host, request.client.port))
+    return JSONResponse({"results": [], "status": "OK"})
+
+
+def start_fake_places_server() -> str:
+    sock: socket.socket = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port: int = sock.getsockname()[1]
+    sock.close()
+    app: Starlette = Starlette(
+        routes=[Route("/maps/api/place/nearbysearch/json", nearby_search)]
+    )
+    server: uvicorn.Server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def client_per_request(base_url: str) -> None:
+    async with AsyncClient(base_url=base_url) as ac:
+        await ac.get("/maps/api/place/nearbysearch/json")
+
+
+async def shared_client(base_url: str) -> None:
+    await google_maps.nearby_search(40.7546795, -73.9870291, 500)
+
+
+async def run(call, base_url: str) -> Tuple[float, int]:
+    connections.clear()
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited() -> None:
+        async with semaphore:
+            await call(base_url)
+
+    start: float = time.perf_counter()
+    await asyncio.gather(*[limited() for _ in range(REQUESTS)])
+    return time.perf_counter() - start, len(connections)
+
+
+async def main() -> None:
+    base_url: str = start_fake_places_server()
+    os.environ["GOOGLE_MAPS_BASE_URL"] = base_url
+    await google_maps.start_client()
+
+    print(f"{REQUESTS} nearby searches, {CONCURRENCY} in flight")
+    for name, call in (("per-request", client_per_request), ("shared", shared_client)):
+        elapsed, opened = await run(call, base_url)
+        print(
+            f"{name:<12} {elapsed:7.3f}s  {elapsed / REQUESTS * 1000:6.2f}ms/req  "
+            f"{opened:4d} connections"
+        )
+
+    await google_maps.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
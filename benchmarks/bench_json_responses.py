@@ -0,0 +1,86 @@
+"""Compares the default response encoding against the opt-in orjson path.
+
+The default path builds validated models and runs them through jsonable_encoder and
+the stdlib json module. The fast path builds the same models with construct() and
+serializes them with orjson (FAST_JSON_RESPONSES=true). No DynamoDB is needed.
+
+    PYTHONPATH=. python benchmarks/bench_json_responses.py
+"""
+
+import json
+import os
+import time
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+
+from openapi_server import fast_json
+from openapi_server.converters import to_review
+from openapi_server.models.list_reviews import ListReviews
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+
+SIZES: List[int] = [10, 100, 1000]
+ROUNDS: int = 20
+
+USER: DbUser = DbUser("theUser", id="1", first_name="John", last_name="James")
+RESTAURANT: DbRestaurant = DbRestaurant(
+    "restaurant_id_example",
+    name="Joe's Pizza Broadway",
+    latitude=40.7546795,
+    longitude=-73.9870291,
+    review_count=10,
+    rating_sum=42,
+)
+
+
+def build(size: int) -> ListReviews:
+    reviews: List = [
+        to_review(
+            DbReview(
+                f"review{i}",
+                username=USER.username,
+                restaurantId=RESTAURANT.id,
+                rating=i % 5 + 1,
+                favorite_food="pizza",
+                created_at="2022-12-01 00:00:00",
+                updated_at="2022-12-01 00:00:00",
+            ),
+            USER,
+            RESTAURANT,
+        )
+        for i in range(size)
+    ]
+    return ListReviews(reviews=reviews, next_cursor="abc")
+
+
+def default_response(size: int) -> bytes:
+    return json.dumps(jsonable_encoder(build(size), by_alias=True)).encode("utf-8")
+
+
+def fast_response(size: int) -> bytes:
+    return fast_json.dumps(build(size))
+
+
+def run(response: Callable[[int], bytes], size: int) -> float:
+    start: float = time.perf_counter()
+    for _ in range(ROUNDS):
+        response(size)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main() -> None:
+    for size in SIZES:
+        os.environ.pop("FAST_JSON_RESPONSES", None)
+        default: float = run(default_response, size)
+        os.environ["FAST_JSON_RESPONSES"] = "true"
+        fast: float = run(fast_response, size)
+        print(
+            f"{size:>5} reviews: default {default * 1000:.2f}ms, "
+            f"fast {fast * 1000:.2f}ms ({default / fast:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measures scrypt cost parameters and password hashing throughput.
+
+Prints the latency and memory of one hash for each work factor, which is what the
+PASSWORD_SCRYPT_N default was picked from: the largest n that stays well under
+100 ms on one core. Then hashes a burst of passwords on spawned process pools of
+increasing size, timing how late a 1 ms timer on the event loop fires meanwhile
+to show that other requests keep being served. No DynamoDB is needed.
+
+    PYTHONPATH=. python benchmarks/bench_password_hashing.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Tuple
+
+from openapi_server import passwords
+from openapi_server.services.password_service import PARAMS
+
+PASSWORDS: int = 32
+TICK_SECONDS: float = 0.001
+
+
+def hash_latency(params: passwords.Params, rounds: int = 5) -> float:
+    start: float = time.perf_counter()
+    for _ in range(rounds):
+        passwords.hash_password("correct horse battery staple", params)
+    return (time.perf_counter() - start) / rounds
+
+
+async def ticks(done: asyncio.Event) -> List[float]:
+    """Returns how late each timer fired, in seconds"""
+    lateness: List[float] = []
+    while not done.is_set():
+        start: float = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lateness.append(time.perf_counter() - start - TICK_SECONDS)
+    return lateness
+
+
+async def burst(pool: ProcessPoolExecutor) -> Tuple[float, float]:
+    """Returns hashes per second and the 99th percentile timer lateness"""
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    done: asyncio.Event = asyncio.Event()
+    timer: asyncio.Task = asyncio.ensure_future(ticks(done))
+    start: float = time.perf_counter()
+    await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                pool, partial(passwords.hash_password, f"password{i}", PARAMS)
+            )
+            for i in range(PASSWORDS)
+        ]
+    )
+    elapsed: float = time.perf_counter() - start
+    done.set()
+    lateness: List[float] = await timer
+    return PASSWORDS / elapsed, statistics.quantiles(lateness, n=100)[98]
+
+
+def main() -> None:
+    cpus: int = os.cpu_count() or 1
+    print(f"{cpus} CPUs")
+    for log_n in range(13, 18):
+        params: passwords.Params = (2**log_n, PARAMS[1], PARAMS[2])
+        print(
+            f"n=2^{log_n:<3} r={params[1]} p={params[2]}"
+            f" {hash_latency(params) * 1000:7.1f} ms"
+            f" {128 * params[1] * params[0] / 2**20:6.0f} MiB"
+        )
+    print(f"burst of {PASSWORDS} at n={PARAMS[0]} r={PARAMS[1]} p={PARAMS[2]}")
+    for workers in sorted({1, 2, 4, cpus}):
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            list(pool.map(int, range(workers)))  # start the workers before timing
+            throughput, lateness = asyncio.run(burst(pool))
+            print(
+                f"processes x{workers:<3} {throughput:6.1f} hashes/s,"
+                f" p99 loop lag {lateness * 1000:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Measures photo variant rendering throughput for different process pool sizes.
+
+Renders the variants of synthetic 12 megapixel JPEGs, as an upload from a phone
+would be, inline and on spawned process pools of increasing size. No S3 is needed.
+
+    PYTHONPATH=. python benchmarks/bench_photo_variants.py
+"""
+
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+from typing import Callable, Dict, List
+
+from PIL import Image, ImageFilter
+
+from openapi_server import imaging
+from openapi_server.services.photo_variants import VARIANT_QUALITY
+
+PHOTOS: int = 24
+WIDTH: int = 4000
+HEIGHT: int = 3000
+
+
+def synthetic_photo(seed: int) -> bytes:
+    # blurred noise compresses roughly like a real photo, unlike a flat color
+    size: int = WIDTH // 8 * HEIGHT // 8 * 3
+    noise: Image.Image = Image.frombytes(
+        "RGB",
+        (WIDTH // 8, HEIGHT // 8),
+        random.Random(seed).getrandbits(size * 8).to_bytes(size, "little"),
+    )
+    image: Image.Image = noise.resize((WIDTH, HEIGHT)).filter(ImageFilter.BLUR)
+    out: BytesIO = BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def run(map_photos: Callable, photos: List[bytes]) -> float:
+    render: Callable = partial(
+        imaging.render_variants, sizes=imaging.VARIANT_SIZES, quality=VARIANT_QUALITY
+    )
+    start: float = time.perf_counter()
+    variants: List[Dict[str, bytes]] = list(map_photos(render, photos))
+    elapsed: float = time.perf_counter() - start
+    assert len(variants) == len(photos)
+    return len(photos) / elapsed
+
+
+def main() -> None:
+    photos: List[bytes] = [synthetic_photo(i) for i in range(PHOTOS)]
+    cpus: int = os.cpu_count() or 1
+    print(f"{PHOTOS} photos, {WIDTH}x{HEIGHT}, {cpus} CPUs")
+    print(f"inline          {run(map, photos):6.1f} images/s")
+    for workers in sorted({1, 2, 4, cpus, cpus * 2}):
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            list(pool.map(int, range(workers)))  # start the workers before timing
+            print(f"processes x{workers:<3} {run(pool.map, photos):6.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# coding: utf-8
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Request, Response
+
+from openapi_server.repositories import user_repository
+from openapi_server.services import (
+    password_service,
+    photo_cleanup,
+    restaurant_index,
+    restaurant_search,
+)
+
+router = APIRouter()
+
+
+@router.get(
+    "/healthz",
+    responses={
+        200: {"description": "The process is up"},
+    },
+    tags=["health"],
+    summary="Liveness probe",
+)
+async def healthz() -> Dict[str, str]:
+    """Answers as soon as the server accepts requests"""
+    return {"status": "ok"}
+
+
+@router.get(
+    "/readyz",
+    responses={
+        200: {"description": "Ready to serve traffic"},
+        503: {
+            "description": "Tables are still being provisioned or provisioning failed"
+        },
+    },
+    tags=["health"],
+    summary="Readiness probe",
+)
+async def readyz(request: Request, response: Response) -> Dict[str, str]:
+    """Reports ready once startup provisioning has finished"""
+    if request.app.state.ready:
+        return {"status": "ready"}
+    response.status_code = 503
+    if request.app.state.provisioning_error:
+        return {"status": "failed", "detail": request.app.state.provisioning_error}
+    return {"status": "starting"}
+
+
+@router.get(
+    "/metrics",
+    responses={
+        200: {"description": "Counters of the in-process caches"},
+    },
+    tags=["health"],
+    summary="Cache metrics",
+)
+async def metrics() -> Dict[str, Any]:
+    """Reports size, hit ratio and evictions of each in-process cache, and the
+    photo cleanup worker's and password hashing pool's counters
+    """
+    return {
+        "user_cache": user_repository.cache_stats(),
+        "geo_cache": restaurant_search.cache.stats(),
+        "geo_index_cells": restaurant_index.cells.stats(),
+        "photo_cleanup": photo_cleanup.stats(),
+        "password_hashing": password_service.stats(),
+    }
@@ -1,8 +1,6 @@
 # coding: utf-8
 
-import os
-
-from typing import Dict, List, Union  # noqa: F401
+from typing import Any, Dict, List, Optional, Union  # noqa: F401
 from dotenv import load_dotenv
 
 from fastapi import (  # noqa: F401
@@ -20,16 +18,28 @@ from fastapi import (  # noqa: F401
     HTTPException,
 )
 
-from httpx import AsyncClient
-
+from openapi_server import etags
+from openapi_server.converters import to_restaurant
+from openapi_server.models.batch_get_keys import BatchGetKeys
+from openapi_server.fast_json import FastJSONRoute
 from openapi_server.models.extra_models import TokenModel  # noqa: F401
 from openapi_server.models.list_restaurants import ListRestaurants
 from openapi_server.models.list_reviews import ListReviews
+from openapi_server.models.list_top_foods import ListTopFoods
 from openapi_server.models.restaurant import Restaurant
+from openapi_server.models.top_food import TopFood
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.pagination import PageParams, encode_cursor
+from openapi_server.repositories import (
+    batch,
+    restaurant_repository,
+    review_repository,
+)
+from openapi_server.services import restaurant_search, review_service, top_foods
 
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 
 @router.get(
@@ -46,37 +56,88 @@ async def get_restaurants(
     longitude: float = Query(None, description="longitude of center"),
     latitude: float = Query(None, description="latitude of center"),
     radius: int = Query(None, description="radius"),
+    page: PageParams = Depends(),
 ) -> ListRestaurants:
     """Returns all restauarants in given location radius"""
-    results: List
+    if latitude is None or longitude is None or radius is None:
+        raise HTTPException(status_code=400, detail="Invalid query supplied")
+
+    scope: str = restaurant_search.cursor_scope(latitude, longitude, radius)
+    position: Optional[Dict[str, Any]] = page.position(scope)
     try:
-        async with AsyncClient(base_url="https://maps.googleapis.com") as ac:
-            response = await ac.get(
-                f"/maps/api/place/nearbysearch/json?location={latitude}%2C{longitude}&radius={radius}&type=restaurant&key={os.environ.get('GOOGLE_API_KEY')}"
-            )
-            results = response.json()["results"]
+        restaurants, next_position = await restaurant_search.find_restaurants(
+            latitude, longitude, radius, page.limit, position
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    restaurants: List[Restaurant] = []
-    for place in results:
-        if place["business_status"] == "OPERATIONAL":
-            restaurant: Restaurant = Restaurant(
-                id=place["place_id"],
-                name=place["name"],
-                latitude=place["geometry"]["location"]["lat"],
-                longitude=place["geometry"]["location"]["lng"],
-                address=place["vicinity"],
-            )
-            restaurants.append(restaurant)
+    return ListRestaurants(
+        restaurants=restaurants,
+        next_cursor=next_position and encode_cursor(scope, next_position),
+    )
+
 
-    return ListRestaurants(restaurants=restaurants)
+@router.get(
+    "/restaurants/{restaurantId}",
+    responses={
+        200: {"model": Restaurant, "description": "successful operation"},
+        404: {"description": "Restaurant not found"},
+    },
+    tags=["restaurants"],
+    summary="Find restaurant by ID",
+    response_model_by_alias=True,
+)
+async def get_restaurant_by_id(
+    restaurantId: str = Path(None, description="ID of restaurant to return"),
+) -> Restaurant:
+    """Returns a stored restaurant with its review aggregates"""
+    try:
+        restaurant: DbRestaurant = await restaurant_repository.get_restaurant(
+            restaurantId
+        )
+    except DbRestaurant.DoesNotExist:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return to_restaurant(restaurant)
+
+
+@router.get(
+    "/restaurants/{restaurantId}/top-foods",
+    responses={
+        200: {"model": ListTopFoods, "description": "successful operation"},
+        404: {"description": "Restaurant not found"},
+    },
+    tags=["restaurants"],
+    summary="Find the favorite foods most often named in a restaurant's reviews",
+    response_model_by_alias=True,
+)
+async def get_top_foods(
+    restaurantId: str = Path(None, description="ID of restaurant"),
+    limit: int = Query(10, ge=1, le=top_foods.SUMMARY_SIZE),
+) -> ListTopFoods:
+    """Returns approximate counts; each lies between minCount and count"""
+    try:
+        restaurant: DbRestaurant = await restaurant_repository.get_restaurant(
+            restaurantId
+        )
+    except DbRestaurant.DoesNotExist:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListTopFoods(
+        top_foods=[
+            TopFood(name=name, count=count, min_count=count - error)
+            for name, count, error in top_foods.load_summary(restaurant).top(limit)
+        ]
+    )
 
 
 @router.get(
     "/restaurants/{restaurantId}/reviews",
     responses={
         200: {"model": ListReviews, "description": "Successful operation"},
+        304: {"description": "Not modified since the ETag in If-None-Match"},
         400: {"description": "Invalid ID supplied"},
     },
     tags=["restaurants"],
@@ -84,10 +145,70 @@ async def get_restaurants(
     response_model_by_alias=True,
 )
 async def get_review_by_restaurant(
+    response: Response,
     restaurantId: str = Path(
         None,
         description="ID of restaurant to return all reviews for a single restaurant",
     ),
-) -> ListReviews:
+    page: PageParams = Depends(),
+    if_none_match: str = Header(None),
+) -> Union[ListReviews, Response]:
     """Returns all reviews for a single restaurant"""
-    ...
+    scope: str = f"reviews:restaurant:{restaurantId}"
+    position: Optional[Dict[str, Any]] = page.position(scope)
+    loader: review_service.ReviewLoader = review_service.ReviewLoader()
+    try:
+        (
+            reviews,
+            last_evaluated_key,
+        ) = await review_repository.query_reviews_by_restaurant(
+            restaurantId, page.limit, position
+        )
+        for review in reviews:
+            loader.add(review)
+        await loader.fetch()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # the rows are read either way; an unchanged page skips building the models
+    tag: str = etags.etag(scope, page.cursor, page.limit, *loader.versions())
+    if etags.matches(if_none_match, tag):
+        return etags.not_modified(tag)
+    response.headers["ETag"] = tag
+    return ListReviews(
+        reviews=loader.build(),
+        next_cursor=last_evaluated_key and encode_cursor(scope, last_evaluated_key),
+    )
+
+
+@router.post(
+    "/restaurants:batchGet",
+    responses={
+        200: {"model": ListRestaurants, "description": "successful operation"},
+        400: {"description": "Too many keys supplied"},
+    },
+    tags=["restaurants"],
+    summary="Find restaurants by IDs",
+    response_model_by_alias=True,
+)
+async def batch_get_restaurants(
+    batch_get_keys: BatchGetKeys = Body(
+        None, description="IDs of the restaurants to return"
+    ),
+) -> ListRestaurants:
+    """Returns the stored restaurants that exist, in the order requested"""
+    if len(batch_get_keys.keys) > batch.MAX_BATCH_GET_KEYS:
+        raise HTTPException(status_code=400, detail="Too many keys supplied")
+    try:
+        restaurants: Dict[
+            str, DbRestaurant
+        ] = await restaurant_repository.batch_get_restaurants(batch_get_keys.keys)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListRestaurants(
+        restaurants=[
+            to_restaurant(restaurants[key])
+            for key in dict.fromkeys(batch_get_keys.keys)
+            if key in restaurants
+        ]
+    )
@@ -1,13 +1,14 @@
 # coding: utf-8
 
-import os
-from typing import Dict, List  # noqa: F401
+import asyncio
+
+from typing import Any, Dict, List, Optional  # noqa: F401
 from datetime import datetime
 from uuid import uuid4
-from httpx import AsyncClient
 
 from fastapi import (  # noqa: F401
     APIRouter,
+    BackgroundTasks,
     Body,
     Cookie,
     Depends,
@@ -15,47 +16,114 @@ from fastapi import (  # noqa: F401
     Header,
     Path,
     Query,
+    Request,
     Response,
     Security,
     status,
     HTTPException,
 )
 
-from pynamodb.expressions.update import Action
+from fastapi.responses import StreamingResponse
 
+from openapi_server.converters import to_review
+from openapi_server.fast_json import FastJSONRoute
 from openapi_server.models.extra_models import TokenModel  # noqa: F401
-from openapi_server.models.api_response import ApiResponse
+from openapi_server.models.batch_create_reviews import BatchCreateReviews
+from openapi_server.models.batch_get_keys import BatchGetKeys
+from openapi_server.models.confirm_upload import ConfirmUpload
 from openapi_server.models.create_review import CreateReview
+from openapi_server.models.list_reviews import ListReviews
+from openapi_server.models.presigned_upload import PresignedUpload
 from openapi_server.models.review import Review
 from openapi_server.models.update_review import UpdateReview
-from openapi_server.models.user import User
-from openapi_server.models.restaurant import Restaurant
 from openapi_server.orms.review import DbReview
 from openapi_server.orms.user import DbUser
 from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.repositories import (
+    batch,
+    cleanup_repository,
+    photo_repository,
+    restaurant_repository,
+    review_repository,
+    user_repository,
+)
+from openapi_server.services import (
+    feed_service,
+    photo_service,
+    photo_variants,
+    restaurant_service,
+    review_export,
+    review_service,
+    top_foods,
+)
+
+
+router = APIRouter(route_class=FastJSONRoute)
 
+# most reviews one batchCreate request may add
+MAX_BATCH_CREATE_REVIEWS: int = 100
+
+
+async def _get_review_or_404(review_id: str) -> DbReview:
+    try:
+        return await review_repository.get_review(review_id)
+    except DbReview.DoesNotExist:
+        raise HTTPException(status_code=404, detail="Review not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-router = APIRouter()
+
+def _check_photo_url(photo_url: Optional[str], current: Optional[str] = None) -> None:
+    """Photos in our bucket are attached through the image endpoints, which check
+    that the object belongs to the review; other urls are stored as given.
+    """
+    if photo_url != current and photo_repository.key_for_url(photo_url) is not None:
+        raise HTTPException(
+            status_code=400, detail="Photos are attached through the image endpoints"
+        )
+
+
+def _new_review(create_review: CreateReview) -> DbReview:
+    new_review: DbReview = DbReview(
+        uuid4().hex,
+        created_at=str(datetime.utcnow()),
+        username=create_review.username,
+        restaurantId=create_review.restaurant_id,
+        rating=create_review.rating,
+        favorite_food=create_review.favorite_food,
+        starred=create_review.starred,
+    )
+    new_review.updated_at = new_review.created_at
+    # optional request body properties
+    if create_review.content:
+        new_review.content = create_review.content
+    if create_review.photo_url:
+        new_review.photo_url = create_review.photo_url
+    return new_review
 
 
 @router.post(
     "/reviews",
     responses={
         200: {"model": Review, "description": "Successful operation"},
+        400: {"description": "Photo not attached through the image endpoints"},
         405: {"description": "Invalid input"},
+        409: {"description": "Review already exists"},
     },
     tags=["reviews"],
     summary="Add a new review about a restaurant",
     response_model_by_alias=True,
 )
 async def add_review(
+    background_tasks: BackgroundTasks,
     create_review: CreateReview = Body(
         None, description="Create a new review about a restaurant"
     ),
 ) -> Review:
     """Add a new review about a restaurant"""
+    _check_photo_url(create_review.photo_url)
     try:
-        user: DbUser = DbUser.get(create_review.username)
+        user: DbUser = await user_repository.get_user(create_review.username)
     except DbUser.DoesNotExist:
         raise HTTPException(status_code=404, detail="User not found")
     except Exception as e:
@@ -63,72 +131,153 @@ async def add_review(
 
     # check if the restaurant information is stored in the database; create the item if not
     try:
-        restaurant: DbRestaurant = DbRestaurant.get(create_review.restaurant_id)
-    except DbRestaurant.DoesNotExist:
-        try:
-            async with AsyncClient(base_url="https://maps.googleapis.com") as ac:
-                response = await ac.get(
-                    f"/maps/api/place/details/json?place_id={create_review.restaurant_id}&key={os.environ.get('GOOGLE_API_KEY')}"
-                )
-                result: Dict = response.json()["result"]
-
-            restaurant = DbRestaurant(
-                result["place_id"],
-                name=result["name"],
-                latitude=result["geometry"]["location"]["lat"],
-                longitude=result["geometry"]["location"]["lng"],
-                address=result["formatted_address"],
+        restaurant: DbRestaurant = await restaurant_service.get_or_create_restaurant(
+            create_review.restaurant_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    new_review: DbReview = _new_review(create_review)
+    try:
+        created: bool = await review_repository.create_review(new_review)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not created:
+        raise HTTPException(status_code=409, detail="Review already exists")
+    restaurant_repository.apply_rating_deltas(restaurant, added=[new_review])
+    background_tasks.add_task(feed_service.fan_out, [new_review])
+    background_tasks.add_task(top_foods.record, [new_review])
+
+    return to_review(new_review, user, restaurant)
+
+
+@router.get(
+    "/reviews:export",
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One review per line",
+        },
+    },
+    tags=["reviews"],
+    summary="Export reviews as NDJSON",
+    response_class=StreamingResponse,
+)
+async def export_reviews(
+    username: str = Query(None, description="Only export this user's reviews"),
+    restaurant_id: str = Query(
+        None, alias="restaurantId", description="Only export this restaurant's reviews"
+    ),
+) -> StreamingResponse:
+    """Streams the reviews as they are read, without building the list in memory"""
+    return StreamingResponse(
+        review_export.export_lines(username, restaurant_id),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post(
+    "/reviews:batchGet",
+    responses={
+        200: {"model": ListReviews, "description": "Successful operation"},
+        400: {"description": "Too many keys supplied"},
+    },
+    tags=["reviews"],
+    summary="Find reviews by IDs",
+    response_model_by_alias=True,
+)
+async def batch_get_reviews(
+    batch_get_keys: BatchGetKeys = Body(None, description="IDs of reviews to return"),
+) -> ListReviews:
+    """Returns the reviews that exist, in the order requested"""
+    if len(batch_get_keys.keys) > batch.MAX_BATCH_GET_KEYS:
+        raise HTTPException(status_code=400, detail="Too many keys supplied")
+    try:
+        reviews: Dict[str, DbReview] = await review_repository.batch_get_reviews(
+            batch_get_keys.keys
+        )
+        return ListReviews(
+            reviews=await review_service.hydrate_reviews(
+                [
+                    reviews[key]
+                    for key in dict.fromkeys(batch_get_keys.keys)
+                    if key in reviews
+                ]
             )
-            restaurant.save()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    new_review: DbReview = DbReview(
-        uuid4().hex,
-        created_at=str(datetime.utcnow()),
-        username=create_review.username,
-        restaurantId=create_review.restaurant_id,
-        rating=create_review.rating,
-        favorite_food=create_review.favorite_food,
-        starred=create_review.starred,
+
+@router.post(
+    "/reviews:batchCreate",
+    responses={
+        200: {"model": ListReviews, "description": "Successful operation"},
+        400: {"description": "Too many reviews supplied"},
+        404: {"description": "User not found"},
+    },
+    tags=["reviews"],
+    summary="Add several reviews",
+    response_model_by_alias=True,
+)
+async def batch_create_reviews(
+    background_tasks: BackgroundTasks,
+    batch_create_reviews: BatchCreateReviews = Body(
+        None, description="Reviews to create"
+    ),
+) -> ListReviews:
+    """Add several reviews with one BatchWriteItem per 25 reviews"""
+    create_reviews: List[CreateReview] = batch_create_reviews.reviews
+    if len(create_reviews) > MAX_BATCH_CREATE_REVIEWS:
+        raise HTTPException(status_code=400, detail="Too many reviews supplied")
+    for create_review in create_reviews:
+        _check_photo_url(create_review.photo_url)
+
+    try:
+        users: Dict[str, DbUser] = await user_repository.batch_get_users(
+            create_review.username for create_review in create_reviews
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if any(create_review.username not in users for create_review in create_reviews):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    restaurant_ids: List[str] = list(
+        dict.fromkeys(create_review.restaurant_id for create_review in create_reviews)
     )
-    new_review.updated_at = new_review.created_at
-    # optional request body properties
-    if create_review.content:
-        new_review.content = create_review.content
-    if create_review.photo_url:
-        new_review.photo_url = create_review.photo_url
     try:
-        new_review.save()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    return Review(
-        id=new_review.id,
-        user=User(
-            id=user.id,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            email=user.email,
-            password=user.password,
-        ),
-        restaurant=Restaurant(
-            id=restaurant.id,
-            name=restaurant.name,
-            latitude=restaurant.latitude,
-            longitude=restaurant.longitude,
-            address=restaurant.address,
-        ),
-        rating=new_review.rating,
-        content=new_review.content,
-        photo_url=new_review.photo_url,
-        favorite_food=new_review.favorite_food,
-        starred=new_review.starred,
-        created_at=new_review.created_at,
-        updated_at=new_review.updated_at,
+        fetched: List[DbRestaurant] = await asyncio.gather(
+            *[
+                restaurant_service.get_or_create_restaurant(restaurant_id)
+                for restaurant_id in restaurant_ids
+            ]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    restaurants: Dict[str, DbRestaurant] = dict(zip(restaurant_ids, fetched))
+
+    new_reviews: List[DbReview] = [
+        _new_review(create_review) for create_review in create_reviews
+    ]
+    try:
+        await review_repository.batch_save_reviews(new_reviews)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    for restaurant in restaurants.values():
+        restaurant_repository.apply_rating_deltas(
+            restaurant,
+            added=[
+                review for review in new_reviews if review.restaurantId == restaurant.id
+            ],
+        )
+    background_tasks.add_task(feed_service.fan_out, new_reviews)
+    background_tasks.add_task(top_foods.record, new_reviews)
+
+    return ListReviews(
+        reviews=[
+            to_review(review, users[review.username], restaurants[review.restaurantId])
+            for review in new_reviews
+        ]
     )
 
 
@@ -138,6 +287,7 @@ async def add_review(
         204: {"description": "Successful operation"},
         400: {"description": "Invalid ID supplied"},
         404: {"description": "Review or image not found"},
+        409: {"description": "Review was changed concurrently"},
     },
     tags=["reviews"],
     summary="deletes an image",
@@ -145,9 +295,18 @@ async def add_review(
 )
 async def delete_image(
     reviewId: str = Path(None, description="ID of review to update"),
-) -> None:
-    """"""
-    ...
+) -> Response:
+    """Detaches the photo; its objects are deleted from S3 in the background"""
+    review: DbReview = await _get_review_or_404(reviewId)
+    if review.photo_url is None:
+        raise HTTPException(status_code=404, detail="Review has no image")
+    try:
+        removed: bool = await review_repository.set_photo_url(review, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=409, detail="Review was changed concurrently")
+    return Response(status_code=204)
 
 
 @router.delete(
@@ -155,6 +314,8 @@ async def delete_image(
     responses={
         204: {"description": "Successful operation"},
         400: {"description": "Invalid review value"},
+        404: {"description": "Review not found"},
+        409: {"description": "Review was changed concurrently"},
     },
     tags=["reviews"],
     summary="Deletes a review",
@@ -162,9 +323,16 @@ async def delete_image(
 )
 async def delete_review(
     reviewId: str = Path(None, description="Review id to delete"),
-) -> None:
+) -> Response:
     """delete a review"""
-    ...
+    review: DbReview = await _get_review_or_404(reviewId)
+    try:
+        deleted: bool = await review_repository.delete_review(review)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=409, detail="Review was changed concurrently")
+    return Response(status_code=204)
 
 
 @router.get(
@@ -182,7 +350,15 @@ async def get_review_by_id(
     reviewId: str = Path(None, description="ID of review to return"),
 ) -> Review:
     """Returns a single review"""
-    ...
+    review: DbReview = await _get_review_or_404(reviewId)
+    try:
+        reviews: List[Review] = await review_service.hydrate_reviews([review])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not reviews:
+        # the author or restaurant has been removed since the review was written
+        raise HTTPException(status_code=404, detail="Review not found")
+    return reviews[0]
 
 
 @router.put(
@@ -192,34 +368,172 @@ async def get_review_by_id(
         400: {"description": "Invalid ID supplied"},
         404: {"description": "Review not found"},
         405: {"description": "Validation exception"},
+        409: {"description": "Review was changed concurrently"},
     },
     tags=["reviews"],
     summary="Update an existing review",
     response_model_by_alias=True,
 )
 async def update_reviewby_id(
+    background_tasks: BackgroundTasks,
     reviewId: str = Path(None, description="ID of review to return"),
     update_review: UpdateReview = Body(
         None, description="Update an existent review on a restaurant"
     ),
 ) -> Review:
     """Update an existing review by Id"""
-    ...
+    review: DbReview = await _get_review_or_404(reviewId)
+    # echoing the photo the review already has back is no change
+    _check_photo_url(update_review.photo_url, review.photo_url)
+
+    # only the supplied fields are written
+    changes: Dict[str, Any] = {
+        "updated_at": str(datetime.utcnow()),
+        **update_review.dict(exclude_none=True),
+    }
+    try:
+        updated: Optional[DbReview] = await review_repository.update_review(
+            review, changes
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if updated is None:
+        raise HTTPException(status_code=409, detail="Review was changed concurrently")
+    if updated.favorite_food != review.favorite_food:
+        background_tasks.add_task(top_foods.record, [updated])
+
+    try:
+        reviews: List[Review] = await review_service.hydrate_reviews([updated])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not reviews:
+        raise HTTPException(status_code=404, detail="Review not found")
+    return reviews[0]
+
+
+def _check_photo_type(content_type: Optional[str]) -> str:
+    if not content_type or not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Photos must be image/*")
+    return content_type
+
+
+async def _attach_photo(review: DbReview, key: str) -> Review:
+    """Points the review at the uploaded object; the object is removed again if
+    the review changed meanwhile. Attaching the photo the review already has is a
+    no-op, so retries are safe.
+    """
+    photo_url: str = photo_repository.photo_url(key)
+    try:
+        attached: bool = review.photo_url == photo_url or (
+            await review_repository.set_photo_url(review, photo_url)
+        )
+        if not attached:
+            await cleanup_repository.enqueue([key])
+        reviews: List[Review] = await review_service.hydrate_reviews([review])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not attached:
+        raise HTTPException(status_code=409, detail="Review was changed concurrently")
+    if not reviews:
+        raise HTTPException(status_code=404, detail="Review not found")
+    return reviews[0]
 
 
 @router.post(
     "/reviews/{reviewId}/image",
     responses={
-        200: {"model": ApiResponse, "description": "successful operation"},
+        200: {"model": Review, "description": "successful operation"},
+        404: {"description": "Review not found"},
+        409: {"description": "Review was changed concurrently"},
+        413: {"description": "Photo too large"},
+        415: {"description": "Not an image"},
     },
     tags=["reviews"],
     summary="uploads an image",
     response_model_by_alias=True,
 )
 async def upload_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
     reviewId: str = Path(None, description="ID of review to update"),
-    additional_metadata: str = Query(None, description="Additional Metadata"),
-    body: str = Body(None, description=""),
-) -> ApiResponse:
-    """"""
-    ...
+    content_type: str = Header(None),
+    content_length: int = Header(None),
+) -> Review:
+    """Streams the request body to S3 without holding the photo in memory"""
+    content_type = _check_photo_type(content_type)
+    if content_length is not None and content_length > photo_service.MAX_PHOTO_BYTES:
+        raise HTTPException(status_code=413)
+    review: DbReview = await _get_review_or_404(reviewId)
+    key: str = photo_service.new_photo_key(reviewId)
+    try:
+        await photo_service.upload_stream(key, request.stream(), content_type)
+    except photo_service.PhotoTooLarge:
+        raise HTTPException(status_code=413)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    attached: Review = await _attach_photo(review, key)
+    background_tasks.add_task(photo_variants.generate, reviewId, key)
+    return attached
+
+
+@router.post(
+    "/reviews/{reviewId}/image:presign",
+    responses={
+        200: {"model": PresignedUpload, "description": "successful operation"},
+        404: {"description": "Review not found"},
+        415: {"description": "Not an image"},
+    },
+    tags=["reviews"],
+    summary="Sign a direct upload of an image to S3",
+    response_model_by_alias=True,
+)
+async def presign_image(
+    reviewId: str = Path(None, description="ID of review to update"),
+    content_type: str = Query(
+        None, alias="contentType", description="Content type of the photo"
+    ),
+) -> PresignedUpload:
+    """POST the file to url with the returned fields, then confirm the key"""
+    content_type = _check_photo_type(content_type)
+    await _get_review_or_404(reviewId)
+    try:
+        return PresignedUpload(
+            expires_in=photo_service.PRESIGN_EXPIRES_SECONDS,
+            **photo_service.presign_upload(reviewId, content_type),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/reviews/{reviewId}/image:confirm",
+    responses={
+        200: {"model": Review, "description": "successful operation"},
+        400: {"description": "Key not signed for this review or not uploaded"},
+        404: {"description": "Review not found"},
+        409: {"description": "Review was changed concurrently"},
+    },
+    tags=["reviews"],
+    summary="Attach a directly uploaded image",
+    response_model_by_alias=True,
+)
+async def confirm_image(
+    background_tasks: BackgroundTasks,
+    reviewId: str = Path(None, description="ID of review to update"),
+    confirm_upload: ConfirmUpload = Body(None, description="Key that was uploaded"),
+) -> Review:
+    """Attaches a photo uploaded with a presigned form"""
+    if not photo_service.is_photo_key(reviewId, confirm_upload.key):
+        raise HTTPException(status_code=400, detail="Key not signed for this review")
+    review: DbReview = await _get_review_or_404(reviewId)
+    try:
+        uploaded: Optional[Dict] = await photo_repository.head_photo(confirm_upload.key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if uploaded is None:
+        raise HTTPException(status_code=400, detail="Photo not uploaded")
+    retried: bool = review.photo_url == photo_repository.photo_url(confirm_upload.key)
+    attached: Review = await _attach_photo(review, confirm_upload.key)
+    if not retried:
+        background_tasks.add_task(photo_variants.generate, reviewId, confirm_upload.key)
+    return attached
@@ -1,11 +1,13 @@
 # coding: utf-8
 
+import asyncio
 import uuid
 
-from typing import Dict, List, Union, Optional  # noqa: F401
+from typing import Any, Dict, List, Set, Union, Optional  # noqa: F401
 
 from fastapi import (  # noqa: F401
     APIRouter,
+    BackgroundTasks,
     Body,
     Cookie,
     Depends,
@@ -19,20 +21,63 @@ from fastapi import (  # noqa: F401
     HTTPException,
 )
 
+from pynamodb.expressions.update import Action
+
+from openapi_server import etags
+from openapi_server.converters import to_user
+from openapi_server.fast_json import FastJSONRoute
 from openapi_server.models.extra_models import TokenModel  # noqa: F401
+from openapi_server.models.batch_get_keys import BatchGetKeys
 from openapi_server.models.create_user import CreateUser
 from openapi_server.models.list_favorite_foods import ListFavoriteFoods
 from openapi_server.models.list_friends import ListFriends
 from openapi_server.models.list_reviews import ListReviews
+from openapi_server.models.list_users import ListUsers
 from openapi_server.models.login_payload import LoginPayload
 from openapi_server.models.login_user import LoginUser
+from openapi_server.models.update_friends import UpdateFriends
 from openapi_server.models.update_user import UpdateUser
 from openapi_server.models.user import User
 from openapi_server.models.favorite_food import FavoriteFood
 from openapi_server.orms.user import DbUser, DbFavoriteFood
+from openapi_server.pagination import PageParams, encode_cursor
+from openapi_server.repositories import (
+    batch,
+    feed_repository,
+    friend_repository,
+    review_repository,
+    user_repository,
+)
+from openapi_server.services import feed_service, password_service, review_service
+
+
+router = APIRouter(route_class=FastJSONRoute)
+
+
+async def _get_user_or_404(username: str) -> DbUser:
+    try:
+        return await user_repository.get_user(username)
+    except DbUser.DoesNotExist:
+        raise HTTPException(status_code=404)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _hash_password(password: str) -> str:
+    try:
+        return await password_service.hash_password(password)
+    except password_service.PasswordPoolBusy:
+        raise HTTPException(status_code=503, headers={"Retry-After": "1"})
 
 
-router = APIRouter()
+async def _load_friends(friend_usernames: List[str]) -> List[User]:
+    """Resolves usernames with one batch get, keeping their order"""
+    users: Dict[str, DbUser] = await user_repository.batch_get_users(friend_usernames)
+    return [
+        to_user(users[friend_username])
+        for friend_username in friend_usernames
+        if friend_username in users
+    ]
 
 
 @router.post(
@@ -40,6 +85,7 @@ router = APIRouter()
     responses={
         200: {"model": User, "description": "successful operation"},
         409: {"description": "Username already exists"},
+        503: {"description": "Too many passwords are being hashed, retry later"},
     },
     tags=["users"],
     summary="Create user",
@@ -49,36 +95,23 @@ async def create_user(
     create_user: CreateUser = Body(None, description="Created user object"),
 ) -> Union[User, Response]:
     """"""
-    try:
-        DbUser.get(create_user.username)
-        return Response(status_code=409)
-    except DbUser.DoesNotExist:
-        pass
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
     new_user: DbUser = DbUser(
         create_user.username,
         first_name=create_user.first_name,
         last_name=create_user.last_name,
-        email=create_user.email,
+        email=create_user.email or None,
         # should let Cognito handle pw storage and access in prod
-        password=create_user.password,
+        password=await _hash_password(create_user.password),
         id=uuid.uuid4().hex,  # can use Cognito id in prod
     )
     try:
-        new_user.save()
+        created: bool = await user_repository.create_user(new_user)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not created:
+        return Response(status_code=409)
 
-    return User(
-        id=new_user.id,
-        username=new_user.username,
-        firstName=new_user.first_name,
-        lastName=new_user.last_name,
-        email=new_user.email,
-        password=new_user.password,
-    )
+    return to_user(new_user)
 
 
 @router.delete(
@@ -95,7 +128,14 @@ async def delete_friends(
     username: str = Path(None, description="Name of user"),
 ) -> ListFriends:
     """Unlink the connection of a user&#39;s friends list from their FB friends list, and remove all friends from a user&#39;s friends list since they are 1-to-1"""
-    ...
+    await _get_user_or_404(username)
+    try:
+        await friend_repository.remove_friends(
+            username, await friend_repository.list_friends(username)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListFriends(friends=[])
 
 
 @router.delete(
@@ -115,7 +155,14 @@ async def delete_user(
 ) -> Response:
     """This can only be done by the logged in user."""
     try:
-        DbUser.get(username).delete()
+        user: DbUser = await user_repository.get_user(username)
+        await user_repository.delete_user(user)
+        await asyncio.gather(
+            friend_repository.remove_friends(
+                username, await friend_repository.list_friends(username)
+            ),
+            feed_repository.delete_feed(username),
+        )
         return Response(status_code=204)
     except DbUser.DoesNotExist:
         raise HTTPException(status_code=404)
@@ -127,6 +174,7 @@ async def delete_user(
     "/users/{username}/favorite-foods",
     responses={
         200: {"model": ListFavoriteFoods, "description": "successful operation"},
+        304: {"description": "Not modified since the ETag in If-None-Match"},
         404: {"description": "User not found"},
     },
     tags=["users"],
@@ -134,20 +182,33 @@ async def delete_user(
     response_model_by_alias=True,
 )
 async def get_favorite_foods(
+    response: Response,
     username: str = Path(None, description="Name of user"),
-) -> ListFavoriteFoods:
+    page: PageParams = Depends(),
+    if_none_match: str = Header(None),
+) -> Union[ListFavoriteFoods, Response]:
     """"""
-    try:
-        user: DbUser = DbUser.get(username)
-    except DbUser.DoesNotExist:
-        raise HTTPException(status_code=404)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
+    scope: str = f"favorite-foods:{username}"
+    offset: int = (page.position(scope) or {}).get("offset", 0)
+    user: DbUser = await _get_user_or_404(username)
+    tag: str = etags.etag(scope, user.id, user.version, offset, page.limit)
+    if etags.matches(if_none_match, tag):
+        return etags.not_modified(tag)
+    response.headers["ETag"] = tag
+
+    end: int = offset + page.limit
     favorite_foods: List[FavoriteFood] = list(
-        map(lambda food: FavoriteFood(id=food.id, name=food.name), user.favorite_foods)
+        map(
+            lambda food: FavoriteFood(id=food.id, name=food.name),
+            user.favorite_foods[offset:end],
+        )
+    )
+    return ListFavoriteFoods(
+        favoriteFoods=favorite_foods,
+        next_cursor=encode_cursor(scope, {"offset": end})
+        if end < len(user.favorite_foods)
+        else None,
     )
-    return ListFavoriteFoods(favoriteFoods=favorite_foods)
 
 
 @router.get(
@@ -162,9 +223,53 @@ async def get_favorite_foods(
 )
 async def get_friends(
     username: str = Path(None, description="Name of user"),
+    page: PageParams = Depends(),
 ) -> ListFriends:
     """Returns all friends of a single user"""
-    ...
+    await _get_user_or_404(username)
+
+    scope: str = f"friends:{username}"
+    position: Optional[Dict[str, Any]] = page.position(scope)
+    try:
+        friend_usernames, last_evaluated_key = await friend_repository.query_friends(
+            username, page.limit, position
+        )
+        friends: List[User] = await _load_friends(friend_usernames)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListFriends(
+        friends=friends,
+        next_cursor=last_evaluated_key and encode_cursor(scope, last_evaluated_key),
+    )
+
+
+@router.get(
+    "/users/{username}/feed",
+    responses={
+        200: {"model": ListReviews, "description": "successful operation"},
+        404: {"description": "User not found"},
+    },
+    tags=["users"],
+    summary="Get recent reviews by friends of a user",
+    response_model_by_alias=True,
+)
+async def get_feed(
+    username: str = Path(None, description="Name of user"),
+    page: PageParams = Depends(),
+) -> ListReviews:
+    """Returns reviews by the user&#39;s friends, newest first"""
+    await _get_user_or_404(username)
+
+    scope: str = f"feed:{username}"
+    before: Optional[str] = (page.position(scope) or {}).get("before")
+    try:
+        reviews, next_before = await feed_service.get_feed(username, page.limit, before)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListReviews(
+        reviews=reviews,
+        next_cursor=next_before and encode_cursor(scope, {"before": next_before}),
+    )
 
 
 @router.get(
@@ -172,6 +277,7 @@ async def get_friends(
     responses={
         200: {"model": ListReviews, "description": "successful operation"},
         400: {"description": "Invalid username supplied"},
+        404: {"description": "User not found"},
     },
     tags=["users"],
     summary="Get reviews by user name",
@@ -181,15 +287,35 @@ async def get_reviews_by_username(
     username: str = Path(
         None, description="The name of user to return user&#39;s reviews"
     ),
+    page: PageParams = Depends(),
 ) -> ListReviews:
     """Returns all reviews by a single user"""
-    ...
+    try:
+        await user_repository.get_user(username)
+    except DbUser.DoesNotExist:
+        raise HTTPException(status_code=404)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    scope: str = f"reviews:user:{username}"
+    position: Optional[Dict[str, Any]] = page.position(scope)
+    try:
+        reviews, last_evaluated_key = await review_repository.query_reviews_by_username(
+            username, page.limit, position
+        )
+        return ListReviews(
+            reviews=await review_service.hydrate_reviews(reviews),
+            next_cursor=last_evaluated_key and encode_cursor(scope, last_evaluated_key),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get(
     "/users/{username}",
     responses={
         200: {"model": User, "description": "successful operation"},
+        304: {"description": "Not modified since the ETag in If-None-Match"},
         400: {"description": "Invalid username supplied"},
         404: {"description": "User not found"},
     },
@@ -198,23 +324,17 @@ async def get_reviews_by_username(
     response_model_by_alias=True,
 )
 async def get_user_by_name(
+    response: Response,
     username: str = Path(None, description="The name that needs to be fetched"),
-) -> User:
+    if_none_match: str = Header(None),
+) -> Union[User, Response]:
     """"""
-    try:
-        user: DbUser = DbUser.get(username)
-        return User(
-            id=user.id,
-            username=user.username,
-            firstName=user.first_name,
-            lastName=user.last_name,
-            email=user.email,
-            password=user.password,
-        )
-    except DbUser.DoesNotExist:
-        raise HTTPException(status_code=404)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    user: DbUser = await _get_user_or_404(username)
+    tag: str = etags.etag("user", user.username, user.id, user.version)
+    if etags.matches(if_none_match, tag):
+        return etags.not_modified(tag)
+    response.headers["ETag"] = tag
+    return to_user(user)
 
 
 @router.post(
@@ -222,16 +342,42 @@ async def get_user_by_name(
     responses={
         200: {"model": LoginPayload, "description": "successful operation"},
         400: {"description": "Invalid username/password supplied"},
+        503: {"description": "Too many passwords are being hashed, retry later"},
     },
     tags=["users"],
     summary="Logs user into the system",
     response_model_by_alias=True,
 )
 async def login_user(
+    background_tasks: BackgroundTasks,
     login_user: LoginUser = Body(None, description="Login information"),
 ) -> LoginPayload:
     """"""
-    ...
+    try:
+        users: List[DbUser] = await user_repository.get_users_by_email(login_user.email)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not users:
+        # hash anyway, so unknown emails take as long to turn away as wrong passwords
+        await _hash_password(login_user.password)
+        raise HTTPException(status_code=400)
+
+    for user in users:
+        try:
+            matched, rehashed = await password_service.verify_password(
+                login_user.password, user.password
+            )
+        except password_service.PasswordPoolBusy:
+            raise HTTPException(status_code=503, headers={"Retry-After": "1"})
+        if not matched:
+            continue
+        if rehashed is not None:
+            background_tasks.add_task(
+                password_service.store_rehash, user.username, user.password, rehashed
+            )
+        # should let Cognito issue the session token in prod
+        return LoginPayload(username=user.username)
+    raise HTTPException(status_code=400)
 
 
 @router.post(
@@ -265,21 +411,21 @@ async def update_favorite_foods(
     ),
 ) -> ListFavoriteFoods:
     """This can only be done by the logged in user."""
-    try:
-        user: DbUser = DbUser.get(username)
-    except DbUser.DoesNotExist:
-        raise HTTPException(status_code=404)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    user.favorite_foods = list(
+    favorite_foods: List[DbFavoriteFood] = list(
         map(
             lambda food: DbFavoriteFood(id=food.id, name=food.name),
             list_favorite_foods.favorite_foods,
         )
     )
+    action: Action = (
+        DbUser.favorite_foods.set(favorite_foods)
+        if favorite_foods
+        else DbUser.favorite_foods.remove()
+    )
     try:
-        user.save()
+        await user_repository.update_user(username, [action])
+    except DbUser.DoesNotExist:
+        raise HTTPException(status_code=404)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -298,15 +444,64 @@ async def update_favorite_foods(
 )
 async def update_friends(
     username: str = Path(None, description="Name of user"),
+    update_friends: UpdateFriends = Body(
+        None, description="User names the friends list should match"
+    ),
 ) -> ListFriends:
     """Refresh or initialize a user&#39;s friends list to match 1-to-1 to their Facebook friends that have accounts, and return the list"""
-    ...
+    if len(update_friends.usernames) > batch.MAX_BATCH_GET_KEYS:
+        raise HTTPException(status_code=400, detail="Too many friends supplied")
+    user: DbUser = await _get_user_or_404(username)
+
+    try:
+        # only names with an account can become friends
+        users: Dict[str, DbUser] = await user_repository.batch_get_users(
+            friend_username
+            for friend_username in update_friends.usernames
+            if friend_username != username
+        )
+        current: Set[str] = set(await friend_repository.list_friends(username))
+        pull_authors: Set[str] = {
+            friend.username for friend in [user, *users.values()] if friend.pull_author
+        }
+        # only the edges that differ are written
+        await asyncio.gather(
+            friend_repository.add_friends(
+                username,
+                [
+                    friend_username
+                    for friend_username in users
+                    if friend_username not in current
+                ],
+                pull_authors,
+            ),
+            friend_repository.remove_friends(
+                username,
+                [
+                    friend_username
+                    for friend_username in current
+                    if friend_username not in users
+                ],
+            ),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListFriends(
+        friends=[
+            to_user(users[friend_username])
+            for friend_username in dict.fromkeys(update_friends.usernames)
+            if friend_username in users
+        ]
+    )
 
 
 @router.put(
     "/users/{username}",
     responses={
-        200: {"description": "successful operation"},
+        200: {"model": User, "description": "successful operation"},
+        404: {"description": "User not found"},
+        409: {"description": "Username already exists"},
+        503: {"description": "Too many passwords are being hashed, retry later"},
     },
     tags=["users"],
     summary="Update user",
@@ -317,39 +512,111 @@ async def update_user(
     update_user: UpdateUser = Body(
         None, description="Update an existent user in the store"
     ),
-) -> Optional[Response]:
+) -> Union[User, Response]:
     """This can only be done by the logged in user."""
+    password: Optional[str] = (
+        await _hash_password(update_user.password) if update_user.password else None
+    )
+    if update_user.username and update_user.username != username:
+        return await _rename_user(username, update_user, password)
+
+    # only the supplied fields are written
+    actions: List[Action] = [
+        attribute.set(value)
+        for attribute, value in [
+            (DbUser.first_name, update_user.first_name),
+            (DbUser.last_name, update_user.last_name),
+            (DbUser.email, update_user.email),
+            (DbUser.password, password),
+        ]
+        if value
+    ]
     try:
-        user: DbUser = DbUser.get(username)
+        user: DbUser = (
+            await user_repository.update_user(username, actions)
+            if actions
+            else await user_repository.get_user(username)
+        )
+    except DbUser.DoesNotExist:
+        raise HTTPException(status_code=404)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return to_user(user)
+
+
+async def _rename_user(
+    username: str, update_user: UpdateUser, password: Optional[str]
+) -> Union[User, Response]:
+    try:
+        user: DbUser = await user_repository.get_user(username)
     except DbUser.DoesNotExist:
         raise HTTPException(status_code=404)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    old_user_item: Union[DbUser, None]
-    if update_user.username and update_user.username != user.username:
-        try:
-            DbUser.get(update_user.username)
-            return Response(status_code=409)
-        except DbUser.DoesNotExist:
-            old_user_item = DbUser.get(user.username)
-            user.username = update_user.username
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    else:
-        old_user_item = None
     if update_user.first_name:
         user.first_name = update_user.first_name
     if update_user.last_name:
         user.last_name = update_user.last_name
     if update_user.email:
         user.email = update_user.email
-    if update_user.password:
-        user.password = update_user.password
+    if password:
+        user.password = password
+    incomplete: Optional[user_repository.RenameIncomplete] = None
     try:
-        user.save()
-        if old_user_item:
-            old_user_item.delete()
+        renamed: Optional[DbUser] = await user_repository.rename_user(
+            user, update_user.username
+        )
+    except user_repository.RenameIncomplete as e:
+        # the user has moved, so friends and feed must follow before reporting it
+        incomplete = e
+        renamed = e.renamed
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return None
+    if renamed is None:
+        return Response(status_code=409)
+    try:
+        await asyncio.gather(
+            friend_repository.rename_friends(
+                username, renamed.username, renamed.pull_author
+            ),
+            feed_repository.move_feed(username, renamed.username),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if incomplete is not None:
+        raise HTTPException(status_code=500, detail=str(incomplete))
+    return to_user(renamed)
+
+
+@router.post(
+    "/users:batchGet",
+    responses={
+        200: {"model": ListUsers, "description": "successful operation"},
+        400: {"description": "Too many keys supplied"},
+    },
+    tags=["users"],
+    summary="Get users by user names",
+    response_model_by_alias=True,
+)
+async def batch_get_users(
+    batch_get_keys: BatchGetKeys = Body(
+        None, description="User names of the users to return"
+    ),
+) -> ListUsers:
+    """Returns the users that exist, in the order requested"""
+    if len(batch_get_keys.keys) > batch.MAX_BATCH_GET_KEYS:
+        raise HTTPException(status_code=400, detail="Too many keys supplied")
+    try:
+        users: Dict[str, DbUser] = await user_repository.batch_get_users(
+            batch_get_keys.keys
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return ListUsers(
+        users=[
+            to_user(users[key])
+            for key in dict.fromkeys(batch_get_keys.keys)
+            if key in users
+        ]
+    )
@@ -0,0 +1,51 @@
+"""Counts reviews that lack the counted mark into their restaurants' aggregates.
+
+    flavorite-backfill-review-aggregates [--page-size N]
+
+Run once after upgrading from a version without aggregates, and again after a
+batch create fails, which can leave reviews stored but uncounted. Scans the
+Review table named by the usual AWS_* settings; each review is counted exactly
+once, so reruns alongside the server are safe.
+"""
+
+import argparse
+import itertools
+from typing import Iterator, List, Optional
+
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories import review_repository
+
+BACKFILL_PAGE_SIZE: int = 1000
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Count uncounted reviews into the restaurant aggregates"
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=BACKFILL_PAGE_SIZE,
+        help="reviews counted per batch of transactions",
+    )
+    return parser.parse_args(argv)
+
+
+def backfill(page_size: int = BACKFILL_PAGE_SIZE) -> int:
+    """Counts uncounted reviews a page at a time; returns how many it counted"""
+    uncounted: Iterator[DbReview] = DbReview.scan(DbReview.counted.does_not_exist())
+    counted: int = 0
+    while True:
+        page: List[DbReview] = list(itertools.islice(uncounted, page_size))
+        if not page:
+            return counted
+        counted += review_repository.add_to_aggregates(page)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args: argparse.Namespace = parse_args(argv)
+    print(f"counted {backfill(args.page_size)} reviews")
+
+
+if __name__ == "__main__":
+    main()
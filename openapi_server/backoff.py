@@ -0,0 +1,22 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+async def wait_until(
+    check: Callable[[], Awaitable[bool]],
+    initial_delay: float = 0.05,
+    max_delay: float = 2.0,
+    timeout: Optional[float] = None,
+) -> None:
+    """Awaits check() until it returns True, doubling the delay between attempts.
+
+    raises asyncio.TimeoutError if timeout seconds pass first
+    """
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    deadline: Optional[float] = None if timeout is None else loop.time() + timeout
+    delay: float = initial_delay
+    while not await check():
+        if deadline is not None and loop.time() + delay > deadline:
+            raise asyncio.TimeoutError()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,103 @@
+import os
+from typing import Any, Dict, Optional, Set
+
+from httpx import AsyncClient, Limits, Response, Timeout
+
+# every other status (OVER_QUERY_LIMIT, REQUEST_DENIED, ...) still comes back as
+# HTTP 200 with empty results
+OK_STATUSES: Set[str] = {"OK", "ZERO_RESULTS"}
+
+_client: Optional[AsyncClient] = None
+
+
+class PlacesError(Exception):
+    pass
+
+
+def _checked(response: Response) -> Dict[str, Any]:
+    """raises PlacesError unless Google answered the request"""
+    body: Dict[str, Any] = response.json()
+    status: Optional[str] = body.get("status")
+    if status not in OK_STATUSES:
+        raise PlacesError(
+            f"Places API returned {status}: {body.get('error_message', '')}"
+        )
+    return body
+
+
+def _build_client() -> AsyncClient:
+    # settings are read when the client is built so .env values loaded at import
+    # time by the routers are picked up
+    return AsyncClient(
+        base_url=os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com"),
+        limits=Limits(
+            max_connections=int(os.environ.get("GOOGLE_MAPS_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(
+                os.environ.get("GOOGLE_MAPS_MAX_KEEPALIVE_CONNECTIONS", "20")
+            ),
+            keepalive_expiry=float(
+                os.environ.get("GOOGLE_MAPS_KEEPALIVE_EXPIRY", "30")
+            ),
+        ),
+        timeout=Timeout(
+            float(os.environ.get("GOOGLE_MAPS_TIMEOUT", "5")),
+            connect=float(os.environ.get("GOOGLE_MAPS_CONNECT_TIMEOUT", "2")),
+        ),
+        # needs the h2 package (pip install httpx[http2])
+        http2=os.environ.get("GOOGLE_MAPS_HTTP2", "false").lower() == "true",
+    )
+
+
+async def start_client() -> None:
+    """Creates the application-wide client; called from the app startup event"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_client() -> None:
+    """Closes pooled connections; called from the app shutdown event"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> AsyncClient:
+    """Returns the shared client, building it if the app lifespan has not run"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def nearby_search(
+    latitude: float, longitude: float, radius: int
+) -> Dict[str, Any]:
+    response: Response = await get_client().get(
+        "/maps/api/place/nearbysearch/json",
+        params={
+            "location": f"{latitude},{longitude}",
+            "radius": radius,
+            "type": "restaurant",
+            "key": os.environ.get("GOOGLE_API_KEY"),
+        },
+    )
+    return _checked(response)
+
+
+async def nearby_search_page(page_token: str) -> Dict[str, Any]:
+    """Fetches a further page of a nearby search from its next_page_token"""
+    response: Response = await get_client().get(
+        "/maps/api/place/nearbysearch/json",
+        params={"pagetoken": page_token, "key": os.environ.get("GOOGLE_API_KEY")},
+    )
+    return _checked(response)
+
+
+async def place_details(place_id: str) -> Dict[str, Any]:
+    response: Response = await get_client().get(
+        "/maps/api/place/details/json",
+        params={"place_id": place_id, "key": os.environ.get("GOOGLE_API_KEY")},
+    )
+    return _checked(response)
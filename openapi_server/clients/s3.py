@@ -0,0 +1,33 @@
+import os
+from typing import Any, Optional
+
+import boto3
+from botocore.config import Config
+
+_client: Optional[Any] = None
+
+
+def _build_client() -> Any:
+    return boto3.client(
+        "s3",
+        # LocalStack in development; unset for AWS
+        endpoint_url=os.environ.get("AWS_S3_HOST"),
+        region_name=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+        config=Config(
+            s3={"addressing_style": "path"},
+            # calls run on the DynamoDB executor, so size the pool to match it
+            max_pool_connections=int(os.environ.get("DYNAMODB_MAX_WORKERS", "32")),
+        ),
+    )
+
+
+def get_client() -> Any:
+    """Returns the shared client; boto3 clients are safe to use across threads"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def photo_bucket() -> str:
+    return os.environ.get("REVIEW_PHOTO_BUCKET", "flavorite-review-photos")
@@ -0,0 +1,67 @@
+from typing import Any, Type, TypeVar
+
+from pydantic import BaseModel
+
+from openapi_server import fast_json
+from openapi_server.models.restaurant import Restaurant
+from openapi_server.models.review import Review
+from openapi_server.models.user import User
+from openapi_server.orms.restaurant import DbRestaurant, rating_histogram
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _build(model: Type[M], **values: Any) -> M:
+    # DB rows are already typed, so the fast path skips validating them again
+    if fast_json.enabled():
+        return model.construct(**values)
+    return model(**values)
+
+
+def to_user(user: DbUser) -> User:
+    return _build(
+        User,
+        id=user.id,
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email or "",
+    )
+
+
+def to_restaurant(restaurant: DbRestaurant) -> Restaurant:
+    return _build(
+        Restaurant,
+        id=restaurant.id,
+        name=restaurant.name,
+        latitude=restaurant.latitude,
+        longitude=restaurant.longitude,
+        address=restaurant.address,
+        review_count=restaurant.review_count,
+        average_rating=restaurant.rating_sum / restaurant.review_count
+        if restaurant.review_count
+        else None,
+        rating_histogram=rating_histogram(restaurant),
+        starred_count=restaurant.starred_count,
+    )
+
+
+def to_review(review: DbReview, user: DbUser, restaurant: DbRestaurant) -> Review:
+    return _build(
+        Review,
+        id=review.id,
+        user=to_user(user),
+        restaurant=to_restaurant(restaurant),
+        rating=review.rating,
+        content=review.content,
+        photo_url=review.photo_url,
+        photo_variants=review.photo_variants.as_dict()
+        if review.photo_variants is not None
+        else None,
+        favorite_food=review.favorite_food,
+        starred=review.starred,
+        created_at=review.created_at,
+        updated_at=review.updated_at,
+    )
@@ -0,0 +1,40 @@
+import hashlib
+from typing import Any, Iterable, Optional
+
+from starlette.responses import Response
+
+# Users, reviews and restaurants carry a version number that every write bumps with
+# an ADD action, and tags are built from those. It is a plain NumberAttribute
+# rather than a VersionAttribute, which would turn the blind ADD updates into
+# conditional writes. Review writes that depend on the whole item as read, such as
+# deletes, condition on it explicitly instead.
+
+
+def etag(*parts: Any) -> str:
+    """Strong ETag over the keys and versions a response is built from.
+
+    Include everything the body depends on (item versions, page position, limit),
+    so that equal tags mean equal bodies.
+    """
+    digest: str = hashlib.blake2b(
+        "\0".join(map(str, parts)).encode(), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def _candidates(if_none_match: str) -> Iterable[str]:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses weak comparison
+        yield candidate[2:] if candidate.startswith("W/") else candidate
+
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Whether an If-None-Match header value names the tag (or is *)"""
+    if not if_none_match:
+        return False
+    return any(candidate in ("*", tag) for candidate in _candidates(if_none_match))
+
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": tag})
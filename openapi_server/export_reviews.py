@@ -0,0 +1,51 @@
+"""Writes reviews to stdout, or a file, as NDJSON.
+
+    flavorite-export-reviews [--username NAME] [--restaurant-id ID] [--segments N]
+                             [--output PATH]
+
+Reads the table named by the usual AWS_* settings with a parallel Scan, or a
+Query when filtered by user or restaurant.
+"""
+
+import argparse
+import sys
+from typing import BinaryIO, List, Optional
+
+from openapi_server.services import review_export
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Export reviews as NDJSON"
+    )
+    parser.add_argument("--username", help="only export this user's reviews")
+    parser.add_argument("--restaurant-id", help="only export this restaurant's reviews")
+    parser.add_argument(
+        "--segments",
+        type=int,
+        default=review_export.EXPORT_SEGMENTS,
+        help="parallel Scan segments for a full export",
+    )
+    parser.add_argument("--output", help="file to write instead of stdout")
+    return parser.parse_args(argv)
+
+
+def export(args: argparse.Namespace, out: BinaryIO) -> None:
+    for chunk in review_export.export_lines(
+        args.username, args.restaurant_id, args.segments
+    ):
+        out.write(chunk)
+    out.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args: argparse.Namespace = parse_args(argv)
+    if args.output is None:
+        export(args, sys.stdout.buffer)
+        return
+    with open(args.output, "wb") as out:
+        export(args, out)
+
+
+if __name__ == "__main__":
+    main()
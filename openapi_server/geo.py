@@ -0,0 +1,86 @@
+import math
+from typing import Tuple
+
+EARTH_RADIUS_METERS: float = 6371008.8
+
+_BASE32: str = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    """Encodes a point as a geohash string of the given length"""
+    lat_range: Tuple[float, float] = (-90.0, 90.0)
+    lng_range: Tuple[float, float] = (-180.0, 180.0)
+    geohash: str = ""
+    bits: int = 0
+    bit_count: int = 0
+    even: bool = True  # bits alternate longitude, latitude starting w/ longitude
+    while len(geohash) < precision:
+        if even:
+            mid: float = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range = (mid, lng_range[1])
+            else:
+                bits = bits << 1
+                lng_range = (lng_range[0], mid)
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range = (mid, lat_range[1])
+            else:
+                bits = bits << 1
+                lat_range = (lat_range[0], mid)
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash += _BASE32[bits]
+            bits = 0
+            bit_count = 0
+    return geohash
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Returns (min latitude, min longitude, max latitude, max longitude) of a cell"""
+    lat_range: Tuple[float, float] = (-90.0, 90.0)
+    lng_range: Tuple[float, float] = (-180.0, 180.0)
+    even: bool = True
+    for char in geohash:
+        value: int = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit: int = (value >> shift) & 1
+            if even:
+                mid: float = (lng_range[0] + lng_range[1]) / 2
+                lng_range = (mid, lng_range[1]) if bit else (lng_range[0], mid)
+            else:
+                mid = (lat_range[0] + lat_range[1]) / 2
+                lat_range = (mid, lat_range[1]) if bit else (lat_range[0], mid)
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+def geohash_half_diagonal(geohash: str) -> float:
+    """Distance in meters from a cell's center to its farthest corner"""
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(geohash)
+    center_lat, center_lng = geohash_center(geohash)
+    # the corner nearer the equator is the widest
+    corner_lat: float = min_lat if abs(min_lat) < abs(max_lat) else max_lat
+    return haversine(center_lat, center_lng, corner_lat, max_lng)
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters between two points"""
+    phi1: float = math.radians(lat1)
+    phi2: float = math.radians(lat2)
+    d_phi: float = math.radians(lat2 - lat1)
+    d_lambda: float = math.radians(lng2 - lng1)
+    a: float = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
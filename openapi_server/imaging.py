@@ -0,0 +1,29 @@
+from io import BytesIO
+from typing import Dict
+
+from PIL import Image, ImageOps
+
+# variant name -> longest edge in pixels
+VARIANT_SIZES: Dict[str, int] = {"large": 1080, "medium": 480, "thumb": 160}
+
+
+def render_variants(
+    data: bytes, sizes: Dict[str, int], quality: int = 80
+) -> Dict[str, bytes]:
+    """Decodes a photo once and returns it re-encoded as a JPEG at each size.
+
+    Photos are never upscaled, so a variant may be smaller than its size. CPU-bound;
+    meant to run in a worker process.
+    """
+    image: Image.Image = Image.open(BytesIO(data))
+    # JPEGs can be decoded straight to a reduced scale, which is much cheaper
+    image.draft("RGB", (max(sizes.values()),) * 2)
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    variants: Dict[str, bytes] = {}
+    # each variant is resized from the previous, larger one
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        out: BytesIO = BytesIO()
+        image.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        variants[name] = out.getvalue()
+    return variants
@@ -9,19 +9,26 @@
     Generated by: https://openapi-generator.tech
 """
 
+import asyncio
+import logging
 import os
 import typing
-import time
 
 from httpx import AsyncClient
 from httpx import Response
 
 from fastapi import FastAPI, APIRouter
 
+from openapi_server.apis.health_api import router as HealthApiRouter
 from openapi_server.apis.restaurants_api import router as RestaurantsApiRouter
 from openapi_server.apis.reviews_api import router as ReviewsApiRouter
 from openapi_server.apis.users_api import router as UsersApiRouter
+from openapi_server.backoff import wait_until
+from openapi_server.clients import google_maps
 from openapi_server.orms.dynamodb_setup import dynamodb_setup
+from openapi_server.repositories import photo_repository
+from openapi_server.repositories.executor import shutdown_executor
+from openapi_server.services import password_service, photo_cleanup, photo_variants
 
 app = FastAPI(
     title="Flavorite - OpenAPI 3.0",
@@ -37,12 +44,12 @@ sub_router.include_router(UsersApiRouter)
 
 top_router.include_router(sub_router)
 app.include_router(top_router)
+app.include_router(HealthApiRouter)
 
+app.state.ready = False
+app.state.provisioning_error = None
 
-# function to check if localstack server is accessible
-async def is_localstack():
-    async with AsyncClient(base_url=os.environ.get("AWS_DYNAMODB_HOST")) as ac:
-        await ac.get("")
+logger: logging.Logger = logging.getLogger(__name__)
 
 
 # function to get status of localstack server "ready" stage
@@ -52,21 +59,52 @@ async def localstack_status() -> typing.Dict[str, typing.Any]:
     return response.json()
 
 
+async def is_localstack_ready() -> bool:
+    try:
+        status: typing.Dict[str, typing.Any] = await localstack_status()
+    # server not accepting connections yet
+    except Exception:
+        return False
+    return status["completed"]
+
+
+async def provision() -> None:
+    # production tables are managed outside the app; set this to skip the work
+    if os.environ.get("SKIP_DYNAMODB_PROVISIONING", "false").lower() != "true":
+        await wait_until(is_localstack_ready)
+        # init dynamodb and the photo bucket
+        await asyncio.gather(dynamodb_setup(), photo_repository.create_bucket())
+    app.state.ready = True
+
+
+async def run_provisioning() -> None:
+    try:
+        await provision()
+    except Exception as e:
+        logger.exception("table provisioning failed")
+        app.state.provisioning_error = str(e)
+
+
+async def run_photo_cleanup() -> None:
+    await app.state.provisioning  # the queue table may not exist before
+    if app.state.ready:
+        await photo_cleanup.run()
+
+
 @app.on_event("startup")
 async def startup_event():
-    # loop to ping localstack server
-    while True:
-        try:
-            await is_localstack()
-            break
-        # catch errors
-        except Exception as e:
-            time.sleep(2)  # try again after 2s
-    # loop to refresh server stage completion status
-    while True:
-        status: typing.Dict[str, typing.Any] = await localstack_status()
-        if status["completed"]:
-            break
-        else:
-            time.sleep(2)  # try again after 2s
-    dynamodb_setup()  # init dynamodb
+    await google_maps.start_client()  # pooled client shared by all requests
+    # provision in the background so /healthz answers right away; /readyz reports
+    # when the tables are ready
+    app.state.provisioning = asyncio.create_task(run_provisioning())
+    app.state.photo_cleanup = asyncio.create_task(run_photo_cleanup())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.provisioning.cancel()
+    app.state.photo_cleanup.cancel()
+    await google_maps.close_client()
+    shutdown_executor()  # let in-flight dynamodb calls finish
+    photo_variants.shutdown_pool()
+    password_service.shutdown_pool()
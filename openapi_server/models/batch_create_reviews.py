@@ -0,0 +1,27 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+from openapi_server.models.create_review import CreateReview
+
+
+class BatchCreateReviews(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    BatchCreateReviews - a model defined in OpenAPI
+
+        reviews: The reviews of this BatchCreateReviews.
+    """
+
+    reviews: List[CreateReview] = Field(alias="reviews")
+
+
+BatchCreateReviews.update_forward_refs()
@@ -0,0 +1,26 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+
+
+class BatchGetKeys(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    BatchGetKeys - a model defined in OpenAPI
+
+        keys: The keys of this BatchGetKeys.
+    """
+
+    keys: List[str] = Field(alias="keys")
+
+
+BatchGetKeys.update_forward_refs()
@@ -0,0 +1,26 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+
+
+class ConfirmUpload(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    ConfirmUpload - a model defined in OpenAPI
+
+        key: The key of this ConfirmUpload.
+    """
+
+    key: str = Field(alias="key")
+
+
+ConfirmUpload.update_forward_refs()
@@ -19,9 +19,11 @@ class ListFavoriteFoods(CamelModel):
     ListFavoriteFoods - a model defined in OpenAPI
 
         favorite_foods: The favorite_foods of this ListFavoriteFoods.
+        next_cursor: The next_cursor of this ListFavoriteFoods [Optional].
     """
 
     favorite_foods: List[FavoriteFood] = Field(alias="favoriteFoods")
+    next_cursor: Optional[str] = Field(alias="nextCursor", default=None)
 
 
 ListFavoriteFoods.update_forward_refs()
@@ -20,10 +20,12 @@ class ListFriends(CamelModel):
 
         friends: The friends of this ListFriends.
         fb_connected: The fb_connected of this ListFriends [Optional].
+        next_cursor: The next_cursor of this ListFriends [Optional].
     """
 
     friends: List[User] = Field(alias="friends")
     fb_connected: Optional[bool] = Field(alias="fbConnected", default=None)
+    next_cursor: Optional[str] = Field(alias="nextCursor", default=None)
 
 
 ListFriends.update_forward_refs()
@@ -19,9 +19,11 @@ class ListRestaurants(CamelModel):
     ListRestaurants - a model defined in OpenAPI
 
         restaurants: The restaurants of this ListRestaurants.
+        next_cursor: The next_cursor of this ListRestaurants [Optional].
     """
 
     restaurants: List[Restaurant] = Field(alias="restaurants")
+    next_cursor: Optional[str] = Field(alias="nextCursor", default=None)
 
 
 ListRestaurants.update_forward_refs()
@@ -19,9 +19,11 @@ class ListReviews(CamelModel):
     ListReviews - a model defined in OpenAPI
 
         reviews: The reviews of this ListReviews.
+        next_cursor: The next_cursor of this ListReviews [Optional].
     """
 
     reviews: List[Review] = Field(alias="reviews")
+    next_cursor: Optional[str] = Field(alias="nextCursor", default=None)
 
 
 ListReviews.update_forward_refs()
@@ -0,0 +1,27 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+from openapi_server.models.top_food import TopFood
+
+
+class ListTopFoods(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    ListTopFoods - a model defined in OpenAPI
+
+        top_foods: The top_foods of this ListTopFoods.
+    """
+
+    top_foods: List[TopFood] = Field(alias="topFoods")
+
+
+ListTopFoods.update_forward_refs()
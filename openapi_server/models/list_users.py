@@ -0,0 +1,27 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+from openapi_server.models.user import User
+
+
+class ListUsers(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    ListUsers - a model defined in OpenAPI
+
+        users: The users of this ListUsers.
+    """
+
+    users: List[User] = Field(alias="users")
+
+
+ListUsers.update_forward_refs()
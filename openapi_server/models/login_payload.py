@@ -21,7 +21,7 @@ class LoginPayload(CamelModel):
         username: The username of this LoginPayload.
     """
 
-    token: str = Field(alias="token")
+    token: Optional[str] = Field(alias="token", default=None)
     username: str = Field(alias="username")
 
 
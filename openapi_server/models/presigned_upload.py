@@ -0,0 +1,32 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+
+
+class PresignedUpload(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    PresignedUpload - a model defined in OpenAPI
+
+        key: The key of this PresignedUpload.
+        url: The url of this PresignedUpload.
+        fields: The fields of this PresignedUpload.
+        expires_in: The expires_in of this PresignedUpload.
+    """
+
+    key: str = Field(alias="key")
+    url: str = Field(alias="url")
+    fields: Dict[str, str] = Field(alias="fields")
+    expires_in: int = Field(alias="expiresIn")
+
+
+PresignedUpload.update_forward_refs()
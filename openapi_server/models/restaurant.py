@@ -22,6 +22,10 @@ class Restaurant(CamelModel):
         longitude: The longitude of this Restaurant.
         latitude: The latitude of this Restaurant.
         address: The address of this Restaurant.
+        review_count: The review_count of this Restaurant [Optional].
+        average_rating: The average_rating of this Restaurant [Optional].
+        rating_histogram: The rating_histogram of this Restaurant [Optional].
+        starred_count: The starred_count of this Restaurant [Optional].
     """
 
     id: str = Field(alias="id")
@@ -29,6 +33,10 @@ class Restaurant(CamelModel):
     longitude: float = Field(alias="longitude")
     latitude: float = Field(alias="latitude")
     address: str = Field(alias="address")
+    review_count: Optional[int] = Field(alias="reviewCount", default=None)
+    average_rating: Optional[float] = Field(alias="averageRating", default=None)
+    rating_histogram: Optional[List[int]] = Field(alias="ratingHistogram", default=None)
+    starred_count: Optional[int] = Field(alias="starredCount", default=None)
 
 
 Restaurant.update_forward_refs()
@@ -25,6 +25,7 @@ class Review(CamelModel):
         rating: The rating of this Review.
         content: The content of this Review [Optional].
         photo_url: The photo_url of this Review [Optional].
+        photo_variants: The photo_variants of this Review [Optional].
         favorite_food: The favorite_food of this Review.
         starred: The starred of this Review.
         created_at: The created_at of this Review.
@@ -37,6 +38,9 @@ class Review(CamelModel):
     rating: int = Field(alias="rating")
     content: Optional[str] = Field(alias="content", default=None)
     photo_url: Optional[str] = Field(alias="photoUrl", default=None)
+    photo_variants: Optional[Dict[str, str]] = Field(
+        alias="photoVariants", default=None
+    )
     favorite_food: str = Field(alias="favoriteFood")
     starred: bool = Field(alias="starred")
     created_at: str = Field(alias="createdAt")
@@ -0,0 +1,30 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+
+
+class TopFood(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    TopFood - a model defined in OpenAPI
+
+        name: The name of this TopFood.
+        count: The count of this TopFood.
+        min_count: The min_count of this TopFood.
+    """
+
+    name: str = Field(alias="name")
+    count: int = Field(alias="count")
+    min_count: int = Field(alias="minCount")
+
+
+TopFood.update_forward_refs()
@@ -0,0 +1,26 @@
+# coding: utf-8
+
+from __future__ import annotations
+from datetime import date, datetime  # noqa: F401
+
+import re  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from pydantic import AnyUrl, EmailStr, Field, validator  # noqa: F401
+from fastapi_camelcase import CamelModel
+
+
+class UpdateFriends(CamelModel):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+
+    UpdateFriends - a model defined in OpenAPI
+
+        usernames: The usernames of this UpdateFriends.
+    """
+
+    usernames: List[str] = Field(alias="usernames")
+
+
+UpdateFriends.update_forward_refs()
@@ -22,7 +22,6 @@ class User(CamelModel):
         first_name: The first_name of this User.
         last_name: The last_name of this User.
         email: The email of this User.
-        password: The password of this User.
     """
 
     id: str = Field(alias="id")
@@ -30,7 +29,6 @@ class User(CamelModel):
     first_name: str = Field(alias="firstName")
     last_name: str = Field(alias="lastName")
     email: str = Field(alias="email")
-    password: str = Field(alias="password")
 
 
 User.update_forward_refs()
@@ -1,14 +1,114 @@
+import asyncio
+from typing import Any, Dict, List, Set, Type
+
+from pynamodb.indexes import GlobalSecondaryIndex
+from pynamodb.models import Model
+
+from openapi_server.backoff import wait_until
+from openapi_server.orms.feed import DbFeedItem
+from openapi_server.orms.friend import DbFriend
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
 from openapi_server.orms.user import DbUser
 from openapi_server.orms.review import DbReview
-from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.restaurant import DbRestaurant, set_geohash
+from openapi_server.repositories.executor import run_db
+
+
+async def _describe_table(model: Type[Model]) -> Dict[str, Any]:
+    return await run_db(
+        model._get_connection().connection.describe_table, model.Meta.table_name
+    )
+
+
+async def _is_active(model: Type[Model]) -> bool:
+    """True once the table and all of its global secondary indexes are ACTIVE"""
+    description: Dict[str, Any] = await _describe_table(model)
+    return description["TableStatus"] == "ACTIVE" and all(
+        index["IndexStatus"] == "ACTIVE"
+        for index in description.get("GlobalSecondaryIndexes", [])
+    )
+
 
+async def create_missing_indexes(model: Type[Model]) -> List[str]:
+    """Adds global secondary indexes declared on the model to an existing table.
 
-def dynamodb_setup():
-    if not DbUser.exists():
-        DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
-    if not DbReview.exists():
-        DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
-    if not DbRestaurant.exists():
-        DbRestaurant.create_table(
-            read_capacity_units=1, write_capacity_units=1, wait=True
+    Returns the names of the indexes it created.
+    """
+    description: Dict[str, Any] = await _describe_table(model)
+    existing: Set[str] = {
+        index["IndexName"] for index in description.get("GlobalSecondaryIndexes", [])
+    }
+    attribute_types: Dict[str, str] = {
+        definition["AttributeName"]: definition["AttributeType"]
+        for definition in model._get_schema()["attribute_definitions"]
+    }
+    created: List[str] = []
+    for index in model._indexes.values():
+        if not isinstance(index, GlobalSecondaryIndex):
+            continue
+        schema: Dict[str, Any] = index._get_schema()
+        if schema["index_name"] in existing:
+            continue
+        key_names: List[str] = [key["AttributeName"] for key in schema["key_schema"]]
+        # DynamoDB only allows one index creation per UpdateTable call
+        await run_db(
+            model._get_connection().connection.dispatch,
+            "UpdateTable",
+            {
+                "TableName": model.Meta.table_name,
+                "AttributeDefinitions": [
+                    {"AttributeName": name, "AttributeType": attribute_types[name]}
+                    for name in key_names
+                ],
+                "GlobalSecondaryIndexUpdates": [
+                    {
+                        "Create": {
+                            "IndexName": schema["index_name"],
+                            "KeySchema": schema["key_schema"],
+                            "Projection": schema["projection"],
+                            "ProvisionedThroughput": schema["provisioned_throughput"],
+                        }
+                    }
+                ],
+            },
         )
+        await wait_until(lambda: _is_active(model))
+        created.append(schema["index_name"])
+    return created
+
+
+def backfill_restaurant_geohashes() -> None:
+    """Sets the cell index keys on restaurants stored before the index existed"""
+    for restaurant in DbRestaurant.scan(DbRestaurant.geohash_cell.does_not_exist()):
+        set_geohash(restaurant)
+        restaurant.update(
+            actions=[
+                DbRestaurant.geohash.set(restaurant.geohash),
+                DbRestaurant.geohash_cell.set(restaurant.geohash_cell),
+            ]
+        )
+
+
+async def _provision(model: Type[Model]) -> List[str]:
+    """Creates the table, or its missing indexes; returns the indexes created"""
+    if await run_db(model.exists):
+        return await create_missing_indexes(model)
+    await run_db(
+        model.create_table, read_capacity_units=1, write_capacity_units=1, wait=False
+    )
+    await wait_until(lambda: _is_active(model))
+    return []
+
+
+async def dynamodb_setup() -> None:
+    """Provisions every table concurrently rather than waiting on each in turn"""
+    _, _, restaurant_indexes, _, _, _ = await asyncio.gather(
+        _provision(DbUser),
+        _provision(DbReview),
+        _provision(DbRestaurant),
+        _provision(DbFriend),
+        _provision(DbFeedItem),
+        _provision(DbPhotoCleanup),
+    )
+    if restaurant_indexes:
+        await run_db(backfill_restaurant_geohashes)
@@ -0,0 +1,22 @@
+import os
+from typing import Optional
+from pynamodb.models import Model
+from pynamodb.attributes import UnicodeAttribute
+
+
+def feed_key(created_at: str, review_id: str) -> str:
+    """Sort key ordering feed entries by creation time, ties broken by review id"""
+    return f"{created_at}#{review_id}"
+
+
+class DbFeedItem(Model):
+    """A friend's review, copied into a user's feed when it was written"""
+
+    class Meta:
+        table_name: str = "Feed"
+        host: Optional[str] = os.environ.get("AWS_DYNAMODB_HOST")
+
+    username: UnicodeAttribute = UnicodeAttribute(hash_key=True, default="")
+    feed_key: UnicodeAttribute = UnicodeAttribute(range_key=True, default="")
+    review_id: UnicodeAttribute = UnicodeAttribute(default="")
+    author: UnicodeAttribute = UnicodeAttribute(default="")
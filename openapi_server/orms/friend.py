@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+from pynamodb.models import Model
+from pynamodb.indexes import GlobalSecondaryIndex, KeysOnlyProjection
+from pynamodb.attributes import UnicodeAttribute
+
+
+class DbFriendsByPullIndex(GlobalSecondaryIndex):
+    """Sparse index of the edges whose friend has too many friends for fan-out.
+
+    Only those edges carry pull_username, so querying it returns just the friends
+    whose reviews have to be pulled into the user's feed at read time.
+    """
+
+    class Meta:
+        index_name: str = "pull_username-friend_username-index"
+        read_capacity_units: int = 1
+        write_capacity_units: int = 1
+        projection: KeysOnlyProjection = KeysOnlyProjection()
+
+    pull_username: UnicodeAttribute = UnicodeAttribute(hash_key=True)
+    friend_username: UnicodeAttribute = UnicodeAttribute(range_key=True)
+
+
+class DbFriend(Model):
+    """One direction of a friendship edge; each friendship is stored both ways.
+
+    A user's friends form one item collection, so listing them is a Query whose
+    cost depends on the number of friends rather than on the user item.
+    """
+
+    class Meta:
+        table_name: str = "Friend"
+        host: Optional[str] = os.environ.get("AWS_DYNAMODB_HOST")
+
+    username: UnicodeAttribute = UnicodeAttribute(hash_key=True, default="")
+    friend_username: UnicodeAttribute = UnicodeAttribute(range_key=True, default="")
+    created_at: UnicodeAttribute = UnicodeAttribute(default="")
+    # set to username when friend_username is a pull author
+    pull_username: UnicodeAttribute = UnicodeAttribute(null=True)
+
+    pull_index: DbFriendsByPullIndex = DbFriendsByPullIndex()
@@ -0,0 +1,17 @@
+import os
+from typing import Optional
+from pynamodb.models import Model
+from pynamodb.attributes import NumberAttribute, UnicodeAttribute
+
+
+class DbPhotoCleanup(Model):
+    """An S3 object no review points at any more, waiting to be deleted"""
+
+    class Meta:
+        table_name: str = "PhotoCleanup"
+        host: Optional[str] = os.environ.get("AWS_DYNAMODB_HOST")
+
+    key: UnicodeAttribute = UnicodeAttribute(hash_key=True, default="")
+    enqueued_at: UnicodeAttribute = UnicodeAttribute(default="")
+    # failed DeleteObjects attempts so far
+    attempts: NumberAttribute = NumberAttribute(default=0)
@@ -1,11 +1,36 @@
 import os
-from typing import Optional
+from typing import List, Optional
 from pynamodb.models import Model
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection
 from pynamodb.attributes import (
+    ListAttribute,
+    MapAttribute,
     UnicodeAttribute,
     NumberAttribute,
 )
 
+from openapi_server.geo import geohash_encode
+
+# geohash length of the index partitions; precision 5 cells are about 4.9km x 4.9km
+GEOHASH_CELL_PRECISION: int = 5
+
+
+class DbFoodCounter(MapAttribute):
+    name: UnicodeAttribute = UnicodeAttribute(default="")
+    count: NumberAttribute = NumberAttribute(default=0)
+    error: NumberAttribute = NumberAttribute(default=0)
+
+
+class DbRestaurantsByCellIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name: str = "geohash_cell-geohash-index"
+        read_capacity_units: int = 1
+        write_capacity_units: int = 1
+        projection: AllProjection = AllProjection()
+
+    geohash_cell: UnicodeAttribute = UnicodeAttribute(hash_key=True)
+    geohash: UnicodeAttribute = UnicodeAttribute(range_key=True)
+
 
 class DbRestaurant(Model):
     class Meta:
@@ -17,3 +42,40 @@ class DbRestaurant(Model):
     latitude: NumberAttribute = NumberAttribute(default=0)
     longitude: NumberAttribute = NumberAttribute(default=0)
     address: UnicodeAttribute = UnicodeAttribute(default="")
+    # full-precision geohash and its GEOHASH_CELL_PRECISION prefix
+    geohash: UnicodeAttribute = UnicodeAttribute(null=True)
+    geohash_cell: UnicodeAttribute = UnicodeAttribute(null=True)
+    # review aggregates, only ever changed with ADD so concurrent writes compose
+    review_count: NumberAttribute = NumberAttribute(default=0)
+    rating_sum: NumberAttribute = NumberAttribute(default=0)
+    rating_1: NumberAttribute = NumberAttribute(default=0)
+    rating_2: NumberAttribute = NumberAttribute(default=0)
+    rating_3: NumberAttribute = NumberAttribute(default=0)
+    rating_4: NumberAttribute = NumberAttribute(default=0)
+    rating_5: NumberAttribute = NumberAttribute(default=0)
+    starred_count: NumberAttribute = NumberAttribute(default=0)
+    # Space-Saving summary of review favorite foods; top_foods_version guards the
+    # read-modify-write that updates it
+    top_foods: ListAttribute = ListAttribute(of=DbFoodCounter, default=[])
+    top_foods_version: NumberAttribute = NumberAttribute(default=0)
+    # ETag source, see openapi_server.etags
+    version: NumberAttribute = NumberAttribute(default=0)
+
+    cell_index: DbRestaurantsByCellIndex = DbRestaurantsByCellIndex()
+
+
+def rating_histogram(restaurant: DbRestaurant) -> List[int]:
+    """Number of reviews with each rating from 1 to 5"""
+    return [
+        restaurant.rating_1,
+        restaurant.rating_2,
+        restaurant.rating_3,
+        restaurant.rating_4,
+        restaurant.rating_5,
+    ]
+
+
+def set_geohash(restaurant: DbRestaurant) -> None:
+    """Fills in the attributes the cell index is keyed on"""
+    restaurant.geohash = geohash_encode(restaurant.latitude, restaurant.longitude)
+    restaurant.geohash_cell = restaurant.geohash[:GEOHASH_CELL_PRECISION]
@@ -1,13 +1,37 @@
 import os
 from typing import Optional
 from pynamodb.models import Model
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection
 from pynamodb.attributes import (
     UnicodeAttribute,
     NumberAttribute,
     BooleanAttribute,
+    MapAttribute,
 )
 
 
+class DbReviewsByRestaurantIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name: str = "restaurantId-created_at-index"
+        read_capacity_units: int = 1
+        write_capacity_units: int = 1
+        projection: AllProjection = AllProjection()
+
+    restaurantId: UnicodeAttribute = UnicodeAttribute(hash_key=True)
+    created_at: UnicodeAttribute = UnicodeAttribute(range_key=True)
+
+
+class DbReviewsByUsernameIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name: str = "username-created_at-index"
+        read_capacity_units: int = 1
+        write_capacity_units: int = 1
+        projection: AllProjection = AllProjection()
+
+    username: UnicodeAttribute = UnicodeAttribute(hash_key=True)
+    created_at: UnicodeAttribute = UnicodeAttribute(range_key=True)
+
+
 class DbReview(Model):
     class Meta:
         table_name: str = "Review"
@@ -23,3 +47,14 @@ class DbReview(Model):
     starred: BooleanAttribute = BooleanAttribute(default=False)
     content: UnicodeAttribute = UnicodeAttribute(null=True)
     photo_url: UnicodeAttribute = UnicodeAttribute(null=True)
+    # set once the review is in its restaurant's aggregates; reviews stored before
+    # those existed, or whose batch write was not counted, lack it
+    counted: BooleanAttribute = BooleanAttribute(null=True)
+    # resized copies of the photo, variant name -> url; set once they are rendered
+    photo_variants: MapAttribute = MapAttribute(null=True)
+    # ETag source, see openapi_server.etags
+    version: NumberAttribute = NumberAttribute(default=0)
+
+    # created_at range keys so listings come back newest-first from a Query
+    restaurant_index: DbReviewsByRestaurantIndex = DbReviewsByRestaurantIndex()
+    username_index: DbReviewsByUsernameIndex = DbReviewsByUsernameIndex()
@@ -1,7 +1,9 @@
 import os
 from typing import Optional
 from pynamodb.models import Model
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection
 from pynamodb.attributes import (
+    BooleanAttribute,
     UnicodeAttribute,
     NumberAttribute,
     MapAttribute,
@@ -14,6 +16,16 @@ class DbFavoriteFood(MapAttribute):
     name: UnicodeAttribute = UnicodeAttribute(default="")
 
 
+class DbUsersByEmailIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name: str = "email-index"
+        read_capacity_units: int = 1
+        write_capacity_units: int = 1
+        projection: AllProjection = AllProjection()
+
+    email: UnicodeAttribute = UnicodeAttribute(hash_key=True)
+
+
 class DbUser(Model):
     class Meta:
         table_name: str = "User"
@@ -22,8 +34,17 @@ class DbUser(Model):
     username: UnicodeAttribute = UnicodeAttribute(hash_key=True, default="")
     first_name: UnicodeAttribute = UnicodeAttribute(default="")
     last_name: UnicodeAttribute = UnicodeAttribute(default="")
-    email: UnicodeAttribute = UnicodeAttribute(default="")
+    # unset rather than empty, which DynamoDB does not accept as an index key
+    email: UnicodeAttribute = UnicodeAttribute(null=True)
+    # "scrypt$n$r$p$salt$key", see openapi_server.passwords
     password: UnicodeAttribute = UnicodeAttribute(default="")
     id: UnicodeAttribute = UnicodeAttribute(default="")
     favorite_foods: ListAttribute = ListAttribute(of=DbFavoriteFood, default=[])
     friends: ListAttribute = ListAttribute(of=UnicodeAttribute, default=[])
+    # reviews by users with too many friends are pulled into feeds, not fanned out
+    pull_author: BooleanAttribute = BooleanAttribute(default=False)
+    # ETag source, see openapi_server.etags
+    version: NumberAttribute = NumberAttribute(default=0)
+
+    # logins look users up by email
+    email_index: DbUsersByEmailIndex = DbUsersByEmailIndex()
@@ -0,0 +1,84 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Query
+
+DEFAULT_PAGE_SIZE: int = 20
+MAX_PAGE_SIZE: int = 100
+
+# used when CURSOR_SECRET is unset; only suits a single process, since every
+# worker must share the secret for cursors to survive load balancing
+_FALLBACK_SECRET: bytes = secrets.token_bytes(32)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(scope: str, payload: bytes) -> bytes:
+    secret: bytes = os.environ.get("CURSOR_SECRET", "").encode() or _FALLBACK_SECRET
+    return hmac.new(secret, scope.encode() + b"\0" + payload, hashlib.sha256).digest()
+
+
+def encode_cursor(scope: str, position: Dict[str, Any]) -> str:
+    """Packs a position (e.g. DynamoDB's LastEvaluatedKey) into an opaque cursor.
+
+    The scope names the listing the cursor belongs to, so a cursor issued for one
+    listing is rejected by every other.
+    """
+    payload: bytes = json.dumps(position, separators=(",", ":")).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(scope, payload))}"
+
+
+def decode_cursor(scope: str, cursor: str) -> Dict[str, Any]:
+    """raises InvalidCursor if the cursor was tampered with or is for another scope"""
+    try:
+        encoded_payload, encoded_signature = cursor.split(".")
+        payload: bytes = _b64decode(encoded_payload)
+        signature: bytes = _b64decode(encoded_signature)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if not hmac.compare_digest(signature, _sign(scope, payload)):
+        raise InvalidCursor("Invalid cursor signature")
+    return json.loads(payload)
+
+
+class PageParams:
+    """Query parameters shared by paginated list endpoints; use with Depends()"""
+
+    def __init__(
+        self,
+        limit: int = Query(
+            DEFAULT_PAGE_SIZE,
+            ge=1,
+            le=MAX_PAGE_SIZE,
+            description="maximum number of items to return",
+        ),
+        cursor: Optional[str] = Query(
+            None, description="nextCursor from the previous page"
+        ),
+    ) -> None:
+        self.limit: int = limit
+        self.cursor: Optional[str] = cursor
+
+    def position(self, scope: str) -> Optional[Dict[str, Any]]:
+        """Decodes the cursor, raising 400 if it is not valid for the scope"""
+        if self.cursor is None:
+            return None
+        try:
+            return decode_cursor(scope, self.cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
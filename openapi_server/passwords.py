@@ -0,0 +1,83 @@
+import base64
+import hashlib
+import hmac
+import os
+from typing import Optional, Tuple
+
+SCHEME: str = "scrypt"
+SALT_BYTES: int = 16
+KEY_BYTES: int = 32
+
+# scrypt cost parameters (n, r, p); memory per hash is 128 * r * n bytes
+Params = Tuple[int, int, int]
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _derive(password: str, salt: bytes, params: Params) -> bytes:
+    n, r, p = params
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        # OpenSSL refuses anything over 32 MiB by default
+        maxmem=128 * r * (n + p) + 2**20,
+        dklen=KEY_BYTES,
+    )
+
+
+def hash_password(password: str, params: Params) -> str:
+    """Returns the password as "scrypt$n$r$p$salt$key", with a fresh random salt.
+
+    CPU- and memory-bound; meant to run in a worker process.
+    """
+    salt: bytes = os.urandom(SALT_BYTES)
+    key: bytes = _derive(password, salt, params)
+    n, r, p = params
+    return f"{SCHEME}${n}${r}${p}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def _parse(encoded: str) -> Optional[Tuple[Params, bytes, bytes]]:
+    """Returns the parameters, salt and key of a hash, or None if it is not one"""
+    parts = encoded.split("$")
+    if len(parts) != 6 or parts[0] != SCHEME:
+        return None
+    try:
+        return (
+            (int(parts[1]), int(parts[2]), int(parts[3])),
+            _b64decode(parts[4]),
+            _b64decode(parts[5]),
+        )
+    except ValueError:
+        return None
+
+
+def verify_password(
+    password: str, encoded: str, params: Params
+) -> Tuple[bool, Optional[str]]:
+    """Checks a password against its stored hash.
+
+    Returns whether it matched and, when it did but the hash was made with other
+    parameters than these, a new hash to store in its place. Passwords stored in
+    plain text before hashing was introduced are compared directly and always
+    rehashed. Meant to run in a worker process, so a rehash costs no extra trip.
+    """
+    parsed: Optional[Tuple[Params, bytes, bytes]] = _parse(encoded)
+    if parsed is None:
+        matched: bool = bool(encoded) and hmac.compare_digest(
+            password.encode(), encoded.encode()
+        )
+    else:
+        stored_params, salt, key = parsed
+        matched = hmac.compare_digest(_derive(password, salt, stored_params), key)
+        if stored_params == params:
+            return matched, None
+    return matched, hash_password(password, params) if matched else None
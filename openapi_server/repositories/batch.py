@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Dict, Iterable, List, Type, TypeVar
+
+from pynamodb.models import Model
+
+from openapi_server.repositories.executor import run_db
+
+M = TypeVar("M", bound=Model)
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_CHUNK_SIZE: int = 100
+
+# most keys one batchGet endpoint call may ask for
+MAX_BATCH_GET_KEYS: int = 1000
+
+
+def _batch_get_chunk(model: Type[M], keys: List[Any]) -> List[M]:
+    # PynamoDB resends UnprocessedKeys until the chunk is complete
+    return list(model.batch_get(keys))
+
+
+async def batch_get(model: Type[M], keys: Iterable[Any]) -> Dict[Any, M]:
+    """Fetches items by hash key with one BatchGetItem per 100 keys.
+
+    Chunks run concurrently. Returns the found items by hash key; keys with no item
+    are absent.
+    """
+    unique_keys: List[Any] = list(dict.fromkeys(keys))
+    chunks: List[List[Any]] = [
+        unique_keys[i : i + BATCH_GET_CHUNK_SIZE]
+        for i in range(0, len(unique_keys), BATCH_GET_CHUNK_SIZE)
+    ]
+    pages: List[List[M]] = await asyncio.gather(
+        *[run_db(_batch_get_chunk, model, chunk) for chunk in chunks]
+    )
+    hash_key_name: str = model._hash_keyname
+    return {
+        getattr(item, hash_key_name): item
+        for page in pages
+        for item in page  # type: ignore
+    }
+
+
+def _batch_save(items: List[Model]) -> None:
+    if not items:
+        return
+    # BatchWrite commits every 25 items and retries UnprocessedItems with backoff
+    with type(items[0]).batch_write() as batch:
+        for item in items:
+            batch.save(item)
+
+
+async def batch_save(items: List[M]) -> None:
+    """Puts items of one model with BatchWriteItem"""
+    await run_db(_batch_save, items)
+
+
+def _batch_delete(items: List[Model]) -> None:
+    if not items:
+        return
+    with type(items[0]).batch_write() as batch:
+        for item in items:
+            batch.delete(item)
+
+
+async def batch_delete(items: List[M]) -> None:
+    """Deletes items of one model with BatchWriteItem"""
+    await run_db(_batch_delete, items)
@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Iterable, List
+
+from pynamodb.transactions import TransactWrite
+
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
+from openapi_server.repositories import batch
+from openapi_server.repositories.executor import run_db
+
+
+def _items(keys: Iterable[str]) -> List[DbPhotoCleanup]:
+    enqueued_at: str = str(datetime.now())
+    # one item per key; a transaction may not touch an item twice
+    return [DbPhotoCleanup(key, enqueued_at=enqueued_at) for key in dict.fromkeys(keys)]
+
+
+def enqueue_in(transaction: TransactWrite, keys: Iterable[str]) -> None:
+    """Queues the keys for deletion as part of a transaction, so they are queued
+    exactly when the write orphaning them commits.
+    """
+    for item in _items(keys):
+        transaction.save(item)
+
+
+async def enqueue(keys: Iterable[str]) -> None:
+    await batch.batch_save(_items(keys))
+
+
+def dequeue_in(transaction: TransactWrite, keys: Iterable[str]) -> None:
+    """Takes keys that are referenced again off the queue as part of a transaction"""
+    for key in dict.fromkeys(keys):
+        transaction.delete(DbPhotoCleanup(key))
+
+
+async def dequeue(keys: Iterable[str]) -> None:
+    await batch.batch_delete([DbPhotoCleanup(key) for key in dict.fromkeys(keys)])
+
+
+async def peek(limit: int) -> List[DbPhotoCleanup]:
+    """Returns up to limit queued keys, in no particular order"""
+    return await run_db(lambda: list(DbPhotoCleanup.scan(limit=limit)))
+
+
+async def remove(items: List[DbPhotoCleanup]) -> None:
+    await batch.batch_delete(items)
+
+
+async def record_failures(items: List[DbPhotoCleanup]) -> None:
+    """Counts a failed attempt against each item, which stays queued"""
+    for item in items:
+        item.attempts += 1
+    await batch.batch_save(items)
@@ -0,0 +1,46 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the pool PynamoDB calls run on, creating it on first use.
+
+    The pool size bounds how many DynamoDB requests are in flight at once and is
+    read from DYNAMODB_MAX_WORKERS (default 32).
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("DYNAMODB_MAX_WORKERS", "32")),
+            thread_name_prefix="dynamodb",
+        )
+    return _executor
+
+
+def configure_executor(max_workers: int) -> None:
+    """Replaces the pool with one of the given size (in-flight calls finish first)"""
+    global _executor
+    shutdown_executor()
+    _executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="dynamodb"
+    )
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a blocking PynamoDB call on the pool without stalling the event loop"""
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(fn, *args, **kwargs))
@@ -0,0 +1,53 @@
+from typing import List, Optional
+
+from openapi_server.orms.feed import DbFeedItem
+from openapi_server.repositories import batch
+from openapi_server.repositories.executor import run_db
+
+
+async def save_feed_items(items: List[DbFeedItem]) -> None:
+    await batch.batch_save(items)
+
+
+async def query_feed(
+    username: str, limit: int, before: Optional[str] = None
+) -> List[DbFeedItem]:
+    """Returns the user's newest feed entries with a feed key below before"""
+    return await run_db(
+        lambda: list(
+            DbFeedItem.query(
+                username,
+                DbFeedItem.feed_key < before if before else None,
+                scan_index_forward=False,  # newest first
+                limit=limit,
+                page_size=limit,
+            )
+        )
+    )
+
+
+async def _list_feed(username: str) -> List[DbFeedItem]:
+    return await run_db(lambda: list(DbFeedItem.query(username)))
+
+
+async def move_feed(old_username: str, new_username: str) -> None:
+    """Re-keys a renamed user's feed; the copies are written before the originals
+    are deleted, so a failure leaves entries duplicated rather than lost
+    """
+    items: List[DbFeedItem] = await _list_feed(old_username)
+    await batch.batch_save(
+        [
+            DbFeedItem(
+                new_username,
+                item.feed_key,
+                review_id=item.review_id,
+                author=item.author,
+            )
+            for item in items
+        ]
+    )
+    await batch.batch_delete(items)
+
+
+async def delete_feed(username: str) -> None:
+    await batch.batch_delete(await _list_feed(username))
@@ -0,0 +1,121 @@
+from datetime import datetime
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional, Tuple
+
+from openapi_server.orms.friend import DbFriend
+from openapi_server.repositories import batch
+from openapi_server.repositories.executor import run_db
+
+
+def _edge(username: str, friend_username: str, created_at: str, pull: bool) -> DbFriend:
+    edge: DbFriend = DbFriend(username, friend_username, created_at=created_at)
+    if pull:
+        edge.pull_username = username
+    return edge
+
+
+def _edges(
+    username: str,
+    friend_usernames: Iterable[str],
+    pull_authors: AbstractSet[str] = frozenset(),
+) -> List[DbFriend]:
+    """Both directions of each friendship"""
+    created_at: str = str(datetime.utcnow())
+    edges: List[DbFriend] = []
+    # a batch write may not touch the same key twice
+    for friend_username in dict.fromkeys(friend_usernames):
+        if friend_username == username:
+            continue
+        edges.append(
+            _edge(
+                username, friend_username, created_at, friend_username in pull_authors
+            )
+        )
+        edges.append(
+            _edge(friend_username, username, created_at, username in pull_authors)
+        )
+    return edges
+
+
+def _query_page(
+    username: str, limit: int, last_evaluated_key: Optional[Dict[str, Any]]
+) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+    results = DbFriend.query(
+        username,
+        limit=limit,
+        page_size=limit,
+        last_evaluated_key=last_evaluated_key,
+    )
+    friend_usernames: List[str] = [friend.friend_username for friend in results]
+    return friend_usernames, results.last_evaluated_key
+
+
+async def query_friends(
+    username: str,
+    limit: int,
+    last_evaluated_key: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+    """Returns a page of the user's friends' usernames and the key to resume after"""
+    return await run_db(_query_page, username, limit, last_evaluated_key)
+
+
+async def list_friends(username: str) -> List[str]:
+    """Returns the usernames of all of the user's friends"""
+    return await run_db(
+        lambda: [friend.friend_username for friend in DbFriend.query(username)]
+    )
+
+
+async def list_pull_authors(username: str) -> List[str]:
+    """Returns the user's friends whose reviews are not fanned out to feeds"""
+    return await run_db(
+        lambda: [
+            friend.friend_username for friend in DbFriend.pull_index.query(username)
+        ]
+    )
+
+
+async def add_friends(
+    username: str,
+    friend_usernames: Iterable[str],
+    pull_authors: AbstractSet[str] = frozenset(),
+) -> None:
+    """Writes both directions of each friendship.
+
+    pull_authors are the users among them, or the user, whose reviews are pulled
+    into their friends' feeds; edges pointing at them are added to the pull index.
+    """
+    await batch.batch_save(_edges(username, friend_usernames, pull_authors))
+
+
+async def remove_friends(username: str, friend_usernames: Iterable[str]) -> None:
+    await batch.batch_delete(_edges(username, friend_usernames))
+
+
+async def mark_pull_author(author: str) -> None:
+    """Adds every edge pointing at the author to the pull index"""
+    edges: List[DbFriend] = await run_db(lambda: list(DbFriend.query(author)))
+    await batch.batch_save(
+        [_edge(edge.friend_username, author, edge.created_at, True) for edge in edges]
+    )
+
+
+async def rename_friends(
+    old_username: str, new_username: str, pull_author: bool = False
+) -> None:
+    """Moves every edge touching the user to the new username"""
+    edges: List[DbFriend] = await run_db(lambda: list(DbFriend.query(old_username)))
+    renamed: List[DbFriend] = []
+    for edge in edges:
+        renamed.append(
+            _edge(
+                new_username,
+                edge.friend_username,
+                edge.created_at,
+                edge.pull_username is not None,
+            )
+        )
+        renamed.append(
+            _edge(edge.friend_username, new_username, edge.created_at, pull_author)
+        )
+    await batch.batch_save(renamed)
+    await remove_friends(old_username, [edge.friend_username for edge in edges])
@@ -0,0 +1,164 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+from openapi_server.clients.s3 import get_client, photo_bucket
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories.executor import run_db
+
+
+# most keys one DeleteObjects request may name
+MAX_DELETE_KEYS: int = 1000
+
+
+def photo_url(key: str) -> str:
+    """Where clients fetch the object; REVIEW_PHOTO_BASE_URL points at a CDN"""
+    base_url: Optional[str] = os.environ.get("REVIEW_PHOTO_BASE_URL")
+    if base_url is None:
+        endpoint: str = os.environ.get("AWS_S3_HOST", "https://s3.amazonaws.com")
+        base_url = f"{endpoint}/{photo_bucket()}"
+    return f"{base_url.rstrip('/')}/{key}"
+
+
+def key_for_url(url: Optional[str]) -> Optional[str]:
+    """The key of a url made by photo_url, or None for urls elsewhere"""
+    prefix: str = photo_url("")
+    if url is None or not url.startswith(prefix):
+        return None
+    return url[len(prefix) :]
+
+
+def review_key(review_id: str, url: Optional[str]) -> Optional[str]:
+    """The key of a url made by photo_url for one of the review's own objects, or
+    None. Objects of other reviews are never treated as the review's.
+    """
+    key: Optional[str] = key_for_url(url)
+    if key is None or not key.startswith(f"reviews/{review_id}/"):
+        return None
+    return key
+
+
+def review_photo_keys(review: DbReview) -> List[str]:
+    """Keys of the review's photo and its variants that the review owns"""
+    urls: List[Optional[str]] = [review.photo_url]
+    if review.photo_variants is not None:
+        urls.extend(review.photo_variants.as_dict().values())
+    keys: Iterator[Optional[str]] = (review_key(review.id, url) for url in urls)
+    return [key for key in keys if key is not None]
+
+
+async def create_bucket() -> None:
+    """Creates the photo bucket if it does not exist yet"""
+    try:
+        await run_db(get_client().head_bucket, Bucket=photo_bucket())
+    except ClientError:
+        await run_db(get_client().create_bucket, Bucket=photo_bucket())
+
+
+async def put_photo(key: str, body: bytes, content_type: str) -> None:
+    await run_db(
+        get_client().put_object,
+        Bucket=photo_bucket(),
+        Key=key,
+        Body=body,
+        ContentType=content_type,
+    )
+
+
+async def get_photo(key: str) -> bytes:
+    response: Dict[str, Any] = await run_db(
+        get_client().get_object, Bucket=photo_bucket(), Key=key
+    )
+    return await run_db(response["Body"].read)
+
+
+async def create_multipart_upload(key: str, content_type: str) -> str:
+    """Returns the upload id"""
+    response: Dict[str, Any] = await run_db(
+        get_client().create_multipart_upload,
+        Bucket=photo_bucket(),
+        Key=key,
+        ContentType=content_type,
+    )
+    return response["UploadId"]
+
+
+async def upload_part(
+    key: str, upload_id: str, part_number: int, body: bytes
+) -> Dict[str, Any]:
+    """Returns the part as complete_multipart_upload expects it"""
+    response: Dict[str, Any] = await run_db(
+        get_client().upload_part,
+        Bucket=photo_bucket(),
+        Key=key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=body,
+    )
+    return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+
+async def complete_multipart_upload(
+    key: str, upload_id: str, parts: List[Dict[str, Any]]
+) -> None:
+    await run_db(
+        get_client().complete_multipart_upload,
+        Bucket=photo_bucket(),
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": parts},
+    )
+
+
+async def abort_multipart_upload(key: str, upload_id: str) -> None:
+    await run_db(
+        get_client().abort_multipart_upload,
+        Bucket=photo_bucket(),
+        Key=key,
+        UploadId=upload_id,
+    )
+
+
+async def head_photo(key: str) -> Optional[Dict[str, Any]]:
+    """Returns the object's metadata, or None if there is no object at the key"""
+    try:
+        return await run_db(get_client().head_object, Bucket=photo_bucket(), Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+
+
+async def delete_photos(keys: List[str]) -> Dict[str, str]:
+    """Deletes up to MAX_DELETE_KEYS objects with one DeleteObjects call.
+
+    Returns the keys S3 could not delete, with the error code of each. Keys with no
+    object count as deleted.
+    """
+    response: Dict[str, Any] = await run_db(
+        get_client().delete_objects,
+        Bucket=photo_bucket(),
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+    )
+    return {error["Key"]: error["Code"] for error in response.get("Errors", [])}
+
+
+def presigned_post(
+    key: str, content_type: str, max_bytes: int, expires_in: int
+) -> Dict[str, Any]:
+    """Signs a POST form letting a client upload one object straight to S3.
+
+    S3 itself rejects uploads to another key, of another content type or larger
+    than max_bytes. Signing is local, so this makes no request.
+    """
+    return get_client().generate_presigned_post(
+        Bucket=photo_bucket(),
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, max_bytes],
+        ],
+        ExpiresIn=expires_in,
+    )
@@ -0,0 +1,132 @@
+from typing import Dict, Iterable, List, Optional
+
+from pynamodb.exceptions import PutError, UpdateError
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+
+from openapi_server.orms.restaurant import DbFoodCounter, DbRestaurant, set_geohash
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories import batch
+from openapi_server.repositories.executor import run_db
+
+
+async def get_restaurant(
+    restaurant_id: str, consistent_read: bool = False
+) -> DbRestaurant:
+    """raises DbRestaurant.DoesNotExist if there is no restaurant with the id"""
+    return await run_db(
+        DbRestaurant.get, restaurant_id, consistent_read=consistent_read
+    )
+
+
+async def save_restaurant(
+    restaurant: DbRestaurant, condition: Optional[Condition] = None
+) -> None:
+    await run_db(restaurant.save, condition=condition)
+
+
+async def create_restaurant(restaurant: DbRestaurant) -> DbRestaurant:
+    """Writes the restaurant only if no item with its id exists yet.
+
+    Returns the stored item, which is the one written by another worker if that
+    worker got there first.
+    """
+    set_geohash(restaurant)
+    try:
+        await save_restaurant(restaurant, condition=DbRestaurant.id.does_not_exist())
+        return restaurant
+    except PutError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+    return await run_db(DbRestaurant.get, restaurant.id, consistent_read=True)
+
+
+async def query_restaurants_by_cell(cell: str) -> List[DbRestaurant]:
+    """Returns every stored restaurant whose geohash starts with the cell"""
+    return await run_db(lambda: list(DbRestaurant.cell_index.query(cell)))
+
+
+async def batch_get_restaurants(
+    restaurant_ids: Iterable[str],
+) -> Dict[str, DbRestaurant]:
+    """Returns the restaurants that exist, by id"""
+    return await batch.batch_get(DbRestaurant, restaurant_ids)
+
+
+def rating_deltas(
+    removed: Iterable[DbReview] = (), added: Iterable[DbReview] = ()
+) -> Dict[str, int]:
+    """How a restaurant's review aggregates change when the removed reviews are
+    taken out and the added ones put in. An edit removes the old review and adds the
+    new one. Removed reviews that were never counted are skipped. Counters that do
+    not change are left out.
+    """
+    deltas: Dict[str, int] = {}
+    for reviews, sign in [(removed, -1), (added, 1)]:
+        for review in reviews:
+            if sign < 0 and not review.counted:
+                continue
+            counts: Dict[str, int] = {"review_count": 1, "rating_sum": review.rating}
+            if 1 <= review.rating <= 5:
+                counts[f"rating_{review.rating}"] = 1
+            if review.starred:
+                counts["starred_count"] = 1
+            for name, count in counts.items():
+                deltas[name] = deltas.get(name, 0) + sign * count
+    return {name: delta for name, delta in deltas.items() if delta}
+
+
+def rating_actions(
+    removed: Iterable[DbReview] = (), added: Iterable[DbReview] = ()
+) -> List[Action]:
+    """ADD actions applying rating_deltas in DynamoDB"""
+    return [
+        getattr(DbRestaurant, name).add(delta)
+        for name, delta in rating_deltas(removed, added).items()
+    ]
+
+
+def apply_rating_deltas(
+    restaurant: DbRestaurant,
+    removed: Iterable[DbReview] = (),
+    added: Iterable[DbReview] = (),
+) -> None:
+    """Applies rating_deltas to an item already read, to answer without re-reading"""
+    for name, delta in rating_deltas(removed, added).items():
+        setattr(restaurant, name, getattr(restaurant, name) + delta)
+
+
+async def update_aggregates(restaurant_id: str, actions: List[Action]) -> None:
+    if actions:
+        await run_db(
+            DbRestaurant(restaurant_id).update,
+            actions=[*actions, DbRestaurant.version.add(1)],
+        )
+
+
+async def update_top_foods(
+    restaurant: DbRestaurant, top_foods: List[DbFoodCounter]
+) -> bool:
+    """Replaces the restaurant's favorite food summary if nobody else has since it
+    was read. Returns False, without writing, if someone has.
+    """
+    version: int = restaurant.top_foods_version
+    condition: Condition = DbRestaurant.top_foods_version == version
+    if version == 0:
+        # restaurants stored before the summary existed have no version yet
+        condition = condition | DbRestaurant.top_foods_version.does_not_exist()
+    try:
+        await run_db(
+            DbRestaurant(restaurant.id).update,
+            actions=[
+                DbRestaurant.top_foods.set(top_foods),
+                DbRestaurant.top_foods_version.set(version + 1),
+                DbRestaurant.version.add(1),
+            ],
+            condition=condition,
+        )
+        return True
+    except UpdateError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+    return False
@@ -0,0 +1,444 @@
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pynamodb.exceptions import TransactWriteError, UpdateError
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+from pynamodb.indexes import Index
+from pynamodb.transactions import TransactWrite
+
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories import (
+    batch,
+    cleanup_repository,
+    photo_repository,
+    restaurant_repository,
+)
+from openapi_server.repositories.executor import run_db
+from openapi_server.repositories.transaction import (
+    TRANSACTION_CONFLICT_BACKOFF_SECONDS,
+    TRANSACTION_CONFLICT_RETRIES,
+    TRANSACTION_MAX_ITEMS,
+    condition_failed,
+    transact_write,
+)
+
+
+# times a write to a review that changed since it was read is tried again
+STALE_REVIEW_RETRIES: int = 3
+
+
+async def get_review(review_id: str) -> DbReview:
+    """raises DbReview.DoesNotExist if there is no review with the id"""
+    return await run_db(DbReview.get, review_id)
+
+
+def _transact(write: Callable[[TransactWrite], None], orphaned: Iterable[str]) -> bool:
+    """Commits the write; returns False if one of its conditions failed.
+
+    A transaction cancelled only because another one was writing the same item,
+    such as a busy restaurant, is retried with backoff, and raises once retries run
+    out.
+    """
+    for attempt in range(TRANSACTION_CONFLICT_RETRIES + 1):
+        try:
+            with transact_write() as transaction:
+                write(transaction)
+                # photos the write leaves unreferenced are queued in the same commit
+                cleanup_repository.enqueue_in(transaction, orphaned)
+            return True
+        except TransactWriteError as e:
+            if e.cause_response_code != "TransactionCanceledException":
+                raise
+            if condition_failed(e):
+                return False
+            if attempt == TRANSACTION_CONFLICT_RETRIES:
+                raise
+        time.sleep(TRANSACTION_CONFLICT_BACKOFF_SECONDS * 2**attempt)
+    return False  # not reached
+
+
+def _write_with_aggregates(
+    write: Callable[[TransactWrite], None],
+    restaurant_id: str,
+    actions: List[Action],
+    orphaned: Iterable[str] = (),
+) -> bool:
+    def write_all(transaction: TransactWrite) -> None:
+        write(transaction)
+        if actions:
+            transaction.update(
+                DbRestaurant(restaurant_id),
+                actions=[*actions, DbRestaurant.version.add(1)],
+            )
+
+    return _transact(write_all, orphaned)
+
+
+def _counted_unchanged(review: DbReview) -> Condition:
+    # the aggregate deltas depend on it; a backfill may count the review meanwhile
+    if review.counted:
+        return DbReview.counted.exists()
+    return DbReview.counted.does_not_exist()
+
+
+def _unchanged(review: DbReview) -> Condition:
+    """Holds while the stored review is the one read. Every other write bumps the
+    version, including recording photo variants, whose keys a write may orphan.
+    """
+    if review.version:
+        version: Condition = DbReview.version == review.version
+    else:
+        # reviews stored before versions existed lack the attribute
+        version = DbReview.id.exists() & (
+            DbReview.version.does_not_exist() | (DbReview.version == 0)
+        )
+    return version & _counted_unchanged(review)
+
+
+async def _retry_stale(
+    review: DbReview,
+    write: Callable[[DbReview], Awaitable[Optional[DbReview]]],
+    still_applies: Callable[[DbReview], bool] = lambda review: True,
+) -> Optional[DbReview]:
+    """Runs write, which returns None if the review changed since it was read. The
+    review is then read again and, if the write still applies to it, written again.
+
+    Returns what write returned, or None if the review was deleted, no longer
+    applies or kept changing.
+    """
+    for attempt in range(STALE_REVIEW_RETRIES + 1):
+        written: Optional[DbReview] = await write(review)
+        if written is not None or attempt == STALE_REVIEW_RETRIES:
+            return written
+        try:
+            review = await get_review(review.id)
+        except DbReview.DoesNotExist:
+            return None
+        if not still_applies(review):
+            return None
+    return None  # not reached
+
+
+async def create_review(review: DbReview) -> bool:
+    """Puts the review and adds it to its restaurant's aggregates in one transaction.
+
+    Returns False, without writing, if a review with the id already exists.
+    """
+    review.counted = True
+    return await run_db(
+        _write_with_aggregates,
+        lambda transaction: transaction.save(
+            review, condition=DbReview.id.does_not_exist()
+        ),
+        review.restaurantId,
+        restaurant_repository.rating_actions(added=[review]),
+    )
+
+
+async def _update(review: DbReview, changes: Dict[str, Any]) -> Optional[DbReview]:
+    updated: DbReview = DbReview.from_raw_data(review.serialize())
+    actions: List[Action] = [DbReview.version.add(1)]
+    for name, value in changes.items():
+        setattr(updated, name, value)
+        actions.append(getattr(DbReview, name).set(value))
+    orphaned: List[str] = []
+    if not review.counted:
+        # the edit puts it in the aggregates, without taking the old one out
+        actions.append(DbReview.counted.set(True))
+        updated.counted = True
+    if updated.photo_url != review.photo_url:
+        orphaned = photo_repository.review_photo_keys(review)
+        actions.append(DbReview.photo_variants.remove())
+        updated.photo_variants = None
+    written: bool = await run_db(
+        _write_with_aggregates,
+        lambda transaction: transaction.update(
+            review, actions=actions, condition=_unchanged(review)
+        ),
+        review.restaurantId,
+        restaurant_repository.rating_actions(removed=[review], added=[updated]),
+        orphaned,
+    )
+    if not written:
+        return None
+    updated.version += 1
+    return updated
+
+
+async def update_review(
+    review: DbReview, changes: Dict[str, Any]
+) -> Optional[DbReview]:
+    """Sets the changed attributes, by name, and moves the restaurant's aggregates
+    with them, in one transaction. If the review changed since it was read, the
+    changes are applied to it as it is now.
+
+    Returns the updated review, or None if it was deleted or kept changing; raises
+    if the transaction keeps colliding with others.
+    """
+    return await _retry_stale(review, lambda current: _update(current, changes))
+
+
+async def _delete(review: DbReview) -> Optional[DbReview]:
+    written: bool = await run_db(
+        _write_with_aggregates,
+        lambda transaction: transaction.delete(review, condition=_unchanged(review)),
+        review.restaurantId,
+        restaurant_repository.rating_actions(removed=[review]),
+        photo_repository.review_photo_keys(review),
+    )
+    return review if written else None
+
+
+async def delete_review(review: DbReview) -> bool:
+    """Deletes the review and takes it out of its restaurant's aggregates, as it is
+    when deleted rather than as it was read.
+
+    Returns False if it was deleted meanwhile or kept changing; raises if the
+    transaction keeps colliding with others.
+    """
+    return await _retry_stale(review, _delete) is not None
+
+
+async def _set_photo_url(
+    review: DbReview, photo_url: Optional[str]
+) -> Optional[DbReview]:
+    action: Action = (
+        DbReview.photo_url.set(photo_url)
+        if photo_url is not None
+        else DbReview.photo_url.remove()
+    )
+    attached: Optional[str] = photo_repository.review_key(review.id, photo_url)
+
+    def write(transaction: TransactWrite) -> None:
+        transaction.update(
+            review,
+            actions=[
+                action,
+                DbReview.photo_variants.remove(),  # rendered from the old photo
+                DbReview.version.add(1),
+            ],
+            condition=_unchanged(review),
+        )
+        if attached is not None:
+            # a photo attached again after being replaced must outlive the queue
+            cleanup_repository.dequeue_in(transaction, [attached])
+
+    written: bool = await run_db(
+        _transact,
+        write,
+        [
+            key
+            for key in photo_repository.review_photo_keys(review)
+            if photo_url is None or photo_repository.photo_url(key) != photo_url
+        ],
+    )
+    if not written:
+        return None
+    review.photo_url = photo_url
+    review.photo_variants = None
+    review.version += 1
+    return review
+
+
+async def set_photo_url(review: DbReview, photo_url: Optional[str]) -> bool:
+    """Points the review at a new photo, or none, updating the instance in place.
+    The photo it replaces is queued for deletion, unless it is the same object, and
+    the new one is taken off the queue.
+
+    Returns False, without writing, if the review was deleted or its photo replaced
+    since it was read; other changes, such as variants recorded meanwhile, are read
+    again first so their keys are queued too.
+    """
+    written: Optional[DbReview] = await _retry_stale(
+        DbReview.from_raw_data(review.serialize()),
+        lambda current: _set_photo_url(current, photo_url),
+        lambda current: current.photo_url == review.photo_url,
+    )
+    if written is None:
+        return False
+    review.deserialize(written.serialize())
+    return True
+
+
+async def set_photo_variants(
+    review_id: str, photo_url: str, variants: Dict[str, str]
+) -> bool:
+    """Records the variants rendered from photo_url.
+
+    Returns False, without writing, if the review was deleted or its photo replaced
+    meanwhile.
+    """
+    try:
+        await run_db(
+            DbReview(review_id).update,
+            actions=[
+                DbReview.photo_variants.set(variants),
+                DbReview.version.add(1),
+            ],
+            condition=DbReview.photo_url == photo_url,
+        )
+        return True
+    except UpdateError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+    return False
+
+
+async def batch_get_reviews(review_ids: Iterable[str]) -> Dict[str, DbReview]:
+    """Returns the reviews that exist, by id"""
+    return await batch.batch_get(DbReview, review_ids)
+
+
+def _count(reviews: List[DbReview]) -> bool:
+    """Marks reviews of one restaurant counted and adds them to its aggregates in
+    one transaction; False if any was counted or deleted meanwhile.
+    """
+
+    def write(transaction: TransactWrite) -> None:
+        for review in reviews:
+            transaction.update(
+                review,
+                actions=[DbReview.counted.set(True)],
+                condition=DbReview.id.exists() & DbReview.counted.does_not_exist(),
+            )
+
+    return _write_with_aggregates(
+        write,
+        reviews[0].restaurantId,
+        restaurant_repository.rating_actions(added=reviews),
+    )
+
+
+def add_to_aggregates(reviews: Iterable[DbReview]) -> int:
+    """Counts uncounted reviews into their restaurants' aggregates, exactly once
+    each. Returns how many it counted.
+
+    Blocking. Reviews go in one transaction per restaurant and chunk; a cancelled
+    chunk is retried one review at a time, skipping those already counted.
+    """
+    by_restaurant: Dict[str, List[DbReview]] = {}
+    for review in reviews:
+        by_restaurant.setdefault(review.restaurantId, []).append(review)
+    counted: int = 0
+    # one action is left for the restaurant update
+    size: int = TRANSACTION_MAX_ITEMS - 1
+    for restaurant_reviews in by_restaurant.values():
+        for start in range(0, len(restaurant_reviews), size):
+            chunk: List[DbReview] = restaurant_reviews[start : start + size]
+            if _count(chunk):
+                counted += len(chunk)
+            else:
+                counted += sum(_count([review]) for review in chunk)
+    return counted
+
+
+async def batch_save_reviews(reviews: List[DbReview]) -> None:
+    """Puts the reviews with BatchWriteItem, then counts them into the aggregates
+    of their restaurants.
+
+    The reviews are stored uncounted first. If counting fails partway, the rest stay
+    uncounted until they are edited or flavorite-backfill-review-aggregates runs;
+    they are never counted twice.
+    """
+    await batch.batch_save(reviews)
+    await run_db(add_to_aggregates, reviews)
+
+
+def _query_page(
+    index: Index,
+    hash_key: str,
+    limit: int,
+    last_evaluated_key: Optional[Dict[str, Any]],
+) -> Tuple[List[DbReview], Optional[Dict[str, Any]]]:
+    results = index.query(
+        hash_key,
+        scan_index_forward=False,  # newest first
+        limit=limit,
+        page_size=limit,
+        last_evaluated_key=last_evaluated_key,
+    )
+    reviews: List[DbReview] = list(results)
+    return reviews, results.last_evaluated_key
+
+
+async def query_reviews_by_restaurant(
+    restaurant_id: str,
+    limit: int,
+    last_evaluated_key: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[DbReview], Optional[Dict[str, Any]]]:
+    """Returns a page of the restaurant's reviews and the key to resume after"""
+    return await run_db(
+        _query_page, DbReview.restaurant_index, restaurant_id, limit, last_evaluated_key
+    )
+
+
+async def query_reviews_by_username(
+    username: str,
+    limit: int,
+    last_evaluated_key: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[DbReview], Optional[Dict[str, Any]]]:
+    """Returns a page of the user's reviews and the key to resume after"""
+    return await run_db(
+        _query_page, DbReview.username_index, username, limit, last_evaluated_key
+    )
+
+
+async def query_reviews_by_username_before(
+    username: str, limit: int, before_created_at: Optional[str] = None
+) -> List[DbReview]:
+    """Returns the user's newest reviews created at or before before_created_at"""
+    return await run_db(
+        lambda: list(
+            DbReview.username_index.query(
+                username,
+                DbReview.created_at <= before_created_at if before_created_at else None,
+                scan_index_forward=False,
+                limit=limit,
+                page_size=limit,
+            )
+        )
+    )
+
+
+# the iterators below block while pages are fetched; run them on worker threads
+
+
+def scan_reviews(
+    segment: int, total_segments: int, page_size: int
+) -> Iterator[DbReview]:
+    """Yields every review in one segment of a parallel Scan of the table"""
+    return DbReview.scan(
+        segment=segment, total_segments=total_segments, page_size=page_size
+    )
+
+
+def iter_reviews_by_username(
+    username: str, page_size: int, restaurant_id: Optional[str] = None
+) -> Iterator[DbReview]:
+    """Yields all of the user's reviews, optionally only those of one restaurant"""
+    return DbReview.username_index.query(
+        username,
+        filter_condition=DbReview.restaurantId == restaurant_id
+        if restaurant_id is not None
+        else None,
+        page_size=page_size,
+    )
+
+
+def iter_reviews_by_restaurant(
+    restaurant_id: str, page_size: int
+) -> Iterator[DbReview]:
+    """Yields all of the restaurant's reviews"""
+    return DbReview.restaurant_index.query(restaurant_id, page_size=page_size)
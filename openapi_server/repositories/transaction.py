@@ -0,0 +1,38 @@
+import re
+from typing import List, Optional
+
+from pynamodb.connection import Connection
+from pynamodb.exceptions import TransactWriteError
+from pynamodb.transactions import TransactWrite
+
+from openapi_server.orms.user import DbUser
+
+# TransactWriteItems accepts at most 100 actions
+TRANSACTION_MAX_ITEMS: int = 100
+# attempts after the first when a transaction collides with another on an item
+TRANSACTION_CONFLICT_RETRIES: int = 3
+TRANSACTION_CONFLICT_BACKOFF_SECONDS: float = 0.05
+
+
+def transact_write() -> TransactWrite:
+    """Opens a TransactWriteItems context; all tables share one endpoint"""
+    return TransactWrite(
+        connection=Connection(region=DbUser.Meta.region, host=DbUser.Meta.host)
+    )
+
+
+def cancellation_reasons(e: TransactWriteError) -> List[str]:
+    """The code DynamoDB gives each action of a cancelled transaction, in order.
+
+    PynamoDB drops CancellationReasons from the response, but the message lists the
+    codes too: "... specific reasons [ConditionalCheckFailed, None]".
+    """
+    message: str = e.cause_response_message or ""
+    match: Optional[re.Match] = re.search(r"\[([^\]]*)\]\s*$", message)
+    if match is None:
+        return []
+    return [code.strip() for code in match.group(1).split(",")]
+
+
+def condition_failed(e: TransactWriteError) -> bool:
+    return "ConditionalCheckFailed" in cancellation_reasons(e)
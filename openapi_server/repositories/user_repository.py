@@ -0,0 +1,278 @@
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pynamodb.exceptions import PutError, TransactWriteError, UpdateError
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+from pynamodb.transactions import TransactWrite
+
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+from openapi_server.repositories import batch
+from openapi_server.repositories.executor import run_db
+from openapi_server.repositories.transaction import (
+    TRANSACTION_MAX_ITEMS,
+    transact_write,
+)
+from openapi_server.ttl_cache import TTLCache
+
+# attempts at a spill-over review rewrite after the first is cancelled
+RENAME_RETRIES: int = 3
+
+# username -> (raw item, read units one GetItem of it costs)
+cache: TTLCache[Tuple[Dict[str, Any], float]] = TTLCache(
+    maxsize=int(os.environ.get("USER_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.environ.get("USER_CACHE_TTL_SECONDS", "60")),
+)
+read_units_saved: float = 0.0
+
+
+def _read_units(item: Dict[str, Any]) -> float:
+    # an eventually consistent read costs half a unit per started 4 KB
+    return math.ceil(len(json.dumps(item)) / 4096) * 0.5
+
+
+def _cache_user(user: DbUser) -> None:
+    item: Dict[str, Any] = user.serialize()
+    cache.set(user.username, (item, _read_units(item)))
+
+
+def _cached_user(username: str) -> Optional[DbUser]:
+    """Returns a fresh copy of the cached user, so callers may modify it freely"""
+    global read_units_saved
+    entry: Optional[Tuple[Dict[str, Any], float]] = cache.get(username)
+    if entry is None:
+        return None
+    read_units_saved += entry[1]
+    return DbUser.from_raw_data(entry[0])
+
+
+def invalidate_user(username: str) -> None:
+    cache.pop(username)
+
+
+def cache_stats() -> Dict[str, float]:
+    return {**cache.stats(), "read_units_saved": read_units_saved}
+
+
+def clear_cache() -> None:
+    global read_units_saved
+    cache.clear()
+    read_units_saved = 0.0
+
+
+async def get_user(username: str) -> DbUser:
+    """raises DbUser.DoesNotExist if there is no user with the username"""
+    user: Optional[DbUser] = _cached_user(username)
+    if user is None:
+        user = await run_db(DbUser.get, username)
+        _cache_user(user)
+    return user
+
+
+async def save_user(user: DbUser, condition: Optional[Condition] = None) -> None:
+    try:
+        await run_db(user.save, condition=condition)
+    finally:
+        invalidate_user(user.username)
+
+
+async def create_user(user: DbUser) -> bool:
+    """Writes the user in one conditional put.
+
+    Returns False, without writing, if the username is already taken.
+    """
+    try:
+        await save_user(user, condition=DbUser.username.does_not_exist())
+        return True
+    except PutError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+    return False
+
+
+async def update_user(username: str, actions: List[Action]) -> DbUser:
+    """Applies the actions with one UpdateItem, without reading the item first.
+
+    Returns the user as stored after the update; raises DbUser.DoesNotExist if there
+    is no user with the username.
+    """
+    user: DbUser = DbUser(username)
+    try:
+        # UpdateItem returns ALL_NEW values, which PynamoDB loads into the instance
+        await run_db(
+            user.update,
+            actions=[*actions, DbUser.version.add(1)],
+            condition=DbUser.username.exists(),
+        )
+    except UpdateError as e:
+        if e.cause_response_code == "ConditionalCheckFailedException":
+            raise DbUser.DoesNotExist()
+        raise
+    finally:
+        invalidate_user(username)
+    return user
+
+
+async def get_users_by_email(email: str) -> List[DbUser]:
+    """Emails are not kept unique, so any number of users may share one"""
+    return await run_db(lambda: list(DbUser.email_index.query(email)))
+
+
+async def replace_password(username: str, old: str, new: str) -> bool:
+    """Swaps a password hash for a rehash of the same password.
+
+    Returns False, without writing, if the password was changed meanwhile.
+    """
+    try:
+        await run_db(
+            DbUser(username).update,
+            actions=[DbUser.password.set(new), DbUser.version.add(1)],
+            condition=DbUser.password == old,
+        )
+        return True
+    except UpdateError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+    finally:
+        invalidate_user(username)
+    return False
+
+
+def _rewrite_review_usernames(
+    transaction: TransactWrite,
+    review_ids: List[str],
+    old_username: str,
+    new_username: str,
+) -> None:
+    for review_id in review_ids:
+        transaction.update(
+            DbReview(review_id),
+            actions=[DbReview.username.set(new_username), DbReview.version.add(1)],
+            condition=DbReview.username == old_username,
+        )
+
+
+class RenameIncomplete(Exception):
+    """The user was renamed, but some of their reviews still carry the old name"""
+
+    def __init__(self, renamed: DbUser, cause: Exception) -> None:
+        super().__init__(f"Reviews of {renamed.username} not renamed: {cause}")
+        self.renamed: DbUser = renamed
+
+
+def _rewrite_remaining(
+    review_ids: List[str], old_username: str, new_username: str
+) -> None:
+    """Rewrites one spill-over chunk; a review deleted or changed meanwhile cancels
+    the transaction, so it is retried with only the reviews still to rewrite.
+    """
+    for attempt in range(RENAME_RETRIES + 1):
+        try:
+            with transact_write() as transaction:
+                _rewrite_review_usernames(
+                    transaction, review_ids, old_username, new_username
+                )
+            return
+        except TransactWriteError as e:
+            if (
+                e.cause_response_code != "TransactionCanceledException"
+                or attempt == RENAME_RETRIES
+            ):
+                raise
+        review_ids = [
+            review.id
+            for review in DbReview.batch_get(review_ids)
+            if review.username == old_username
+        ]
+        if not review_ids:
+            return
+
+
+def _rename_user(user: DbUser, renamed: DbUser) -> bool:
+    # the user swap and as many review rewrites as fit commit together
+    first: int = TRANSACTION_MAX_ITEMS - 2
+    for attempt in range(RENAME_RETRIES + 1):
+        review_ids: List[str] = [
+            review.id for review in DbReview.username_index.query(user.username)
+        ]
+        try:
+            with transact_write() as transaction:
+                transaction.save(renamed, condition=DbUser.username.does_not_exist())
+                transaction.delete(user, condition=DbUser.username.exists())
+                _rewrite_review_usernames(
+                    transaction, review_ids[:first], user.username, renamed.username
+                )
+            break
+        except TransactWriteError as e:
+            if e.cause_response_code != "TransactionCanceledException":
+                raise
+            # only a taken name is a conflict; a review that changed is retried
+            if DbUser.count(renamed.username):
+                return False
+            if attempt == RENAME_RETRIES:
+                raise
+    try:
+        for start in range(first, len(review_ids), TRANSACTION_MAX_ITEMS):
+            _rewrite_remaining(
+                review_ids[start : start + TRANSACTION_MAX_ITEMS],
+                user.username,
+                renamed.username,
+            )
+    except Exception as e:
+        raise RenameIncomplete(renamed, e)
+    return True
+
+
+async def rename_user(user: DbUser, new_username: str) -> Optional[DbUser]:
+    """Moves the user item to a new key and points their reviews at it.
+
+    The new item is put and the old one deleted in one TransactWriteItems. Reviews
+    are rewritten in the same transaction, spilling into further transactions of
+    100 when there are too many. Returns None, without writing, if the new username
+    is already taken. Raises RenameIncomplete if a spill-over transaction still
+    fails after retries; the user is renamed by then.
+    """
+    item: Dict[str, Dict[str, Any]] = {
+        **user.serialize(),
+        "username": {"S": new_username},
+    }
+    if not user.email:
+        # users created before empty emails were stored as None hold "", which the
+        # email index rejects as a key
+        item.pop("email", None)
+    renamed: DbUser = DbUser.from_raw_data(item)
+    try:
+        if not await run_db(_rename_user, user, renamed):
+            return None
+    finally:
+        invalidate_user(user.username)
+        invalidate_user(new_username)
+    return renamed
+
+
+async def delete_user(user: DbUser) -> None:
+    try:
+        await run_db(user.delete)
+    finally:
+        invalidate_user(user.username)
+
+
+async def batch_get_users(usernames: Iterable[str]) -> Dict[str, DbUser]:
+    """Returns the users that exist, by username"""
+    users: Dict[str, DbUser] = {}
+    missing: List[str] = []
+    for username in dict.fromkeys(usernames):
+        user: Optional[DbUser] = _cached_user(username)
+        if user is None:
+            missing.append(username)
+        else:
+            users[username] = user
+    if missing:
+        fetched: Dict[str, DbUser] = await batch.batch_get(DbUser, missing)
+        for user in fetched.values():
+            _cache_user(user)
+        users.update(fetched)
+    return users
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from openapi_server.models.review import Review
+from openapi_server.orms.feed import DbFeedItem, feed_key
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+from openapi_server.repositories import (
+    feed_repository,
+    friend_repository,
+    review_repository,
+    user_repository,
+)
+from openapi_server.services.review_service import hydrate_reviews
+
+logger = logging.getLogger(__name__)
+
+# authors with more friends than this are read at feed time instead of fanned out
+FANOUT_MAX_FRIENDS: int = int(os.environ.get("FEED_FANOUT_MAX_FRIENDS", "1000"))
+
+
+async def _fan_out_author(author: str, reviews: List[DbReview]) -> None:
+    user: DbUser = await user_repository.get_user(author)
+    if user.pull_author:
+        return
+    friends: List[str] = await friend_repository.list_friends(author)
+    if len(friends) > FANOUT_MAX_FRIENDS:
+        # from now on the author's friends pull their reviews when reading the feed
+        await user_repository.update_user(author, [DbUser.pull_author.set(True)])
+        await friend_repository.mark_pull_author(author)
+        return
+    await feed_repository.save_feed_items(
+        [
+            DbFeedItem(
+                friend,
+                feed_key(review.created_at, review.id),
+                review_id=review.id,
+                author=author,
+            )
+            for friend in friends
+            for review in reviews
+        ]
+    )
+
+
+async def fan_out(reviews: List[DbReview]) -> None:
+    """Copies new reviews into the feeds of their authors' friends.
+
+    Meant to run after the response is sent; failures are logged, not raised.
+    """
+    by_author: Dict[str, List[DbReview]] = {}
+    for review in reviews:
+        by_author.setdefault(review.username, []).append(review)
+    results = await asyncio.gather(
+        *[_fan_out_author(author, written) for author, written in by_author.items()],
+        return_exceptions=True,
+    )
+    for author, result in zip(by_author, results):
+        if isinstance(result, Exception):
+            logger.warning("Feed fan-out for %s failed: %s", author, result)
+
+
+async def get_feed(
+    username: str, limit: int, before: Optional[str] = None
+) -> Tuple[List[Review], Optional[str]]:
+    """Returns the newest reviews by the user's friends with a feed key below before.
+
+    Fanned out reviews come from one Query of the feed; reviews by pull authors are
+    queried per author and merged in. Also returns the feed key to continue from.
+    """
+    feed_items, pull_authors = await asyncio.gather(
+        feed_repository.query_feed(username, limit, before),
+        friend_repository.list_pull_authors(username),
+    )
+    before_created_at: Optional[str] = before and before.split("#", 1)[0]
+    pulled: List[List[DbReview]] = await asyncio.gather(
+        *[
+            review_repository.query_reviews_by_username_before(
+                author, limit, before_created_at
+            )
+            for author in pull_authors
+        ]
+    )
+
+    # review id -> feed key, newest first; an id can come from both paths
+    keys: Dict[str, str] = {item.review_id: item.feed_key for item in feed_items}
+    reviews: Dict[str, DbReview] = {}
+    for author_reviews in pulled:
+        for review in author_reviews:
+            key: str = feed_key(review.created_at, review.id)
+            if before is None or key < before:
+                keys[review.id] = key
+                reviews[review.id] = review
+    page: List[str] = sorted(keys, key=keys.__getitem__, reverse=True)[:limit]
+
+    missing: List[str] = [review_id for review_id in page if review_id not in reviews]
+    if missing:
+        reviews.update(await review_repository.batch_get_reviews(missing))
+    hydrated: List[Review] = await hydrate_reviews(
+        [reviews[review_id] for review_id in page if review_id in reviews]
+    )
+    next_before: Optional[str] = keys[page[-1]] if len(page) == limit else None
+    return hydrated, next_before
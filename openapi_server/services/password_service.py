@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from openapi_server import passwords
+from openapi_server.repositories import user_repository
+
+logger = logging.getLogger(__name__)
+
+# changing these rehashes each password on its owner's next login; the default n
+# costs about 70 ms and 16 MiB per hash, see benchmarks/bench_password_hashing.py
+PARAMS: passwords.Params = (
+    int(os.environ.get("PASSWORD_SCRYPT_N", str(2**14))),
+    int(os.environ.get("PASSWORD_SCRYPT_R", "8")),
+    int(os.environ.get("PASSWORD_SCRYPT_P", "1")),
+)
+# one core is left to the event loop, so hashing cannot starve other requests
+WORKERS: int = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", str(max((os.cpu_count() or 1) - 1, 1)))
+)
+# hashes waiting for or running on a worker; beyond this callers are turned away
+# rather than queued for longer than a client would wait
+MAX_PENDING: int = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", str(WORKERS * 8)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: int = 0
+rejected: int = 0
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the pool passwords are hashed on, creating it on first use.
+
+    scrypt is CPU- and memory-bound by design and holds the GIL, so it runs in
+    other processes. Workers are spawned rather than forked from the threaded
+    server process.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def stats() -> Dict[str, int]:
+    return {"workers": WORKERS, "pending": _pending, "rejected": rejected}
+
+
+def reset_stats() -> None:
+    global rejected
+    rejected = 0
+
+
+async def _run(function: Callable[..., Any]) -> Any:
+    """raises PasswordPoolBusy, without queueing, if MAX_PENDING hashes are waiting"""
+    global _pending, rejected
+    if _pending >= MAX_PENDING:
+        rejected += 1
+        raise PasswordPoolBusy()
+    _pending += 1
+    try:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pool(), function)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(partial(passwords.hash_password, password, PARAMS))
+
+
+async def verify_password(password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+    """Returns whether the password matched and, if its hash is outdated, a new one"""
+    return await _run(partial(passwords.verify_password, password, encoded, PARAMS))
+
+
+async def store_rehash(username: str, old: str, new: str) -> None:
+    """Replaces an outdated hash after a login. Runs after the response is sent;
+    the old hash keeps working, so failures are only logged.
+    """
+    try:
+        await user_repository.replace_password(username, old, new)
+    except Exception as e:
+        logger.warning("Storing the rehashed password of %s failed: %s", username, e)
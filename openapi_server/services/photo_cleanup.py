@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List
+
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
+from openapi_server.repositories import cleanup_repository, photo_repository
+
+logger = logging.getLogger(__name__)
+
+# pause between drains once the queue has been emptied, or after an error
+INTERVAL_SECONDS: float = float(os.environ.get("PHOTO_CLEANUP_INTERVAL_SECONDS", "10"))
+# keys S3 keeps refusing to delete are dropped from the queue after this many tries
+MAX_ATTEMPTS: int = int(os.environ.get("PHOTO_CLEANUP_MAX_ATTEMPTS", "5"))
+
+_counters: Dict[str, int] = {
+    "batches": 0,
+    "deleted": 0,
+    "failed": 0,
+    "dropped": 0,
+    "errors": 0,
+}
+
+
+def stats() -> Dict[str, int]:
+    """Totals since startup: DeleteObjects calls, keys deleted, failed attempts of
+    single keys, keys given up on, and drains that raised
+    """
+    return dict(_counters)
+
+
+def reset_stats() -> None:
+    for name in _counters:
+        _counters[name] = 0
+
+
+async def drain_once() -> int:
+    """Deletes up to one DeleteObjects batch of queued keys.
+
+    Deleted keys leave the queue; keys S3 refused stay queued with their attempt
+    counted. Returns how many keys were taken from the queue.
+    """
+    items: List[DbPhotoCleanup] = await cleanup_repository.peek(
+        photo_repository.MAX_DELETE_KEYS
+    )
+    if not items:
+        return 0
+    errors: Dict[str, str] = await photo_repository.delete_photos(
+        [item.key for item in items]
+    )
+    _counters["batches"] += 1
+    done: List[DbPhotoCleanup] = []
+    retry: List[DbPhotoCleanup] = []
+    for item in items:
+        if item.key not in errors:
+            done.append(item)
+        elif item.attempts + 1 >= MAX_ATTEMPTS:
+            logger.warning("Giving up deleting %s: %s", item.key, errors[item.key])
+            _counters["dropped"] += 1
+            done.append(item)
+        else:
+            retry.append(item)
+    await asyncio.gather(
+        cleanup_repository.remove(done), cleanup_repository.record_failures(retry)
+    )
+    _counters["deleted"] += len(items) - len(errors)
+    _counters["failed"] += len(errors)
+    return len(items)
+
+
+async def run() -> None:
+    """Drains the queue until cancelled: full batches back to back, then a pause.
+    Errors are logged and retried after a pause.
+    """
+    while True:
+        try:
+            drained: int = await drain_once()
+        except Exception as e:
+            _counters["errors"] += 1
+            logger.warning("Photo cleanup failed: %s", e)
+            drained = 0
+        if drained < photo_repository.MAX_DELETE_KEYS:
+            await asyncio.sleep(INTERVAL_SECONDS)
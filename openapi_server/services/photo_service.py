@@ -0,0 +1,89 @@
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from openapi_server.repositories import photo_repository
+
+# largest photo accepted, streamed or presigned
+MAX_PHOTO_BYTES: int = int(os.environ.get("PHOTO_MAX_BYTES", str(20 * 1024 * 1024)))
+# uploads larger than one part go to S3 as a multipart upload; S3 needs at least
+# 5 MiB per part but the last
+PART_SIZE: int = int(os.environ.get("PHOTO_UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+PRESIGN_EXPIRES_SECONDS: int = int(
+    os.environ.get("PHOTO_PRESIGN_EXPIRES_SECONDS", "900")
+)
+
+
+class PhotoTooLarge(ValueError):
+    pass
+
+
+def new_photo_key(review_id: str) -> str:
+    """A fresh key per upload, so a replaced photo never serves stale bytes"""
+    return f"reviews/{review_id}/{uuid4().hex}/original"
+
+
+def is_photo_key(review_id: str, key: str) -> bool:
+    parts: List[str] = key.split("/")
+    return (
+        len(parts) == 4
+        and parts[:2] == ["reviews", review_id]
+        and parts[3] == "original"
+    )
+
+
+async def upload_stream(
+    key: str, chunks: AsyncIterator[bytes], content_type: str
+) -> int:
+    """Writes the chunks to S3 as they arrive and returns the size uploaded.
+
+    At most one part is buffered: a photo that fits in one part is put as is, a
+    larger one is sent as a multipart upload. Raises PhotoTooLarge past
+    MAX_PHOTO_BYTES; nothing is left behind in S3 on failure.
+    """
+    buffer: bytearray = bytearray()
+    size: int = 0
+    upload_id: Optional[str] = None
+    parts: List[Dict[str, Any]] = []
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_PHOTO_BYTES:
+                raise PhotoTooLarge()
+            buffer += chunk
+            while len(buffer) >= PART_SIZE:
+                if upload_id is None:
+                    upload_id = await photo_repository.create_multipart_upload(
+                        key, content_type
+                    )
+                parts.append(
+                    await photo_repository.upload_part(
+                        key, upload_id, len(parts) + 1, bytes(buffer[:PART_SIZE])
+                    )
+                )
+                del buffer[:PART_SIZE]
+        if upload_id is None:
+            await photo_repository.put_photo(key, bytes(buffer), content_type)
+            return size
+        if buffer:
+            parts.append(
+                await photo_repository.upload_part(
+                    key, upload_id, len(parts) + 1, bytes(buffer)
+                )
+            )
+        await photo_repository.complete_multipart_upload(key, upload_id, parts)
+        return size
+    except BaseException:
+        if upload_id is not None:
+            # S3 keeps (and bills) the parts of an upload until it is aborted
+            await photo_repository.abort_multipart_upload(key, upload_id)
+        raise
+
+
+def presign_upload(review_id: str, content_type: str) -> Dict[str, Any]:
+    """Returns a key and the signed form for uploading it straight to S3"""
+    key: str = new_photo_key(review_id)
+    post: Dict[str, Any] = photo_repository.presigned_post(
+        key, content_type, MAX_PHOTO_BYTES, PRESIGN_EXPIRES_SECONDS
+    )
+    return {"key": key, "url": post["url"], "fields": post["fields"]}
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+
+from openapi_server import imaging
+from openapi_server.repositories import (
+    cleanup_repository,
+    photo_repository,
+    review_repository,
+)
+
+logger = logging.getLogger(__name__)
+
+# JPEG quality of the variants
+VARIANT_QUALITY: int = int(os.environ.get("PHOTO_VARIANT_QUALITY", "80"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the pool photos are resized on, creating it on first use.
+
+    Resizing is CPU-bound, so it runs in other processes where it cannot hold the
+    event loop's GIL. PHOTO_VARIANT_WORKERS (default: one per CPU) sizes the pool.
+    Workers are spawned rather than forked from the threaded server process.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=int(
+                os.environ.get("PHOTO_VARIANT_WORKERS", str(os.cpu_count() or 1))
+            ),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def variant_key(key: str, name: str) -> str:
+    """Variants are stored next to the original"""
+    return f"{key.rsplit('/', 1)[0]}/{name}.jpg"
+
+
+async def render(data: bytes) -> Dict[str, bytes]:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_pool(),
+        partial(imaging.render_variants, data, imaging.VARIANT_SIZES, VARIANT_QUALITY),
+    )
+
+
+async def _generate(review_id: str, key: str) -> None:
+    variants: Dict[str, bytes] = await render(await photo_repository.get_photo(key))
+    keys: Dict[str, str] = {name: variant_key(key, name) for name in variants}
+    # variants of a photo attached again were queued when it was first replaced
+    await cleanup_repository.dequeue(keys.values())
+    await asyncio.gather(
+        *[
+            photo_repository.put_photo(keys[name], data, "image/jpeg")
+            for name, data in variants.items()
+        ]
+    )
+    recorded: bool = await review_repository.set_photo_variants(
+        review_id,
+        photo_repository.photo_url(key),
+        {name: photo_repository.photo_url(key) for name, key in keys.items()},
+    )
+    if not recorded:
+        # the photo was replaced while these were rendered
+        await cleanup_repository.enqueue(keys.values())
+
+
+async def generate(review_id: str, key: str) -> None:
+    """Renders the resized variants of an uploaded photo, stores them next to it
+    and records their urls on the review. Runs after the response is sent, so
+    failures are logged rather than raised.
+    """
+    try:
+        await _generate(review_id, key)
+    except Exception as e:
+        logger.warning("Rendering variants of %s failed: %s", key, e)
@@ -0,0 +1,108 @@
+import asyncio
+import math
+import os
+from typing import Dict, List, Set
+
+from openapi_server.converters import to_restaurant
+from openapi_server.geo import geohash_bounds, geohash_encode, haversine
+from openapi_server.models.restaurant import Restaurant
+from openapi_server.orms.restaurant import GEOHASH_CELL_PRECISION, DbRestaurant
+from openapi_server.repositories import restaurant_repository
+from openapi_server.singleflight import SingleFlight
+from openapi_server.ttl_cache import TTLCache
+
+METERS_PER_DEGREE_LATITUDE: float = 111320.0
+
+# searches needing more cells than this are left to Google
+MAX_CELLS_PER_SEARCH: int = 16
+
+# geohash cell -> restaurants stored in it, by id
+cells: TTLCache[Dict[str, Restaurant]] = TTLCache(
+    maxsize=int(os.environ.get("GEO_INDEX_MAX_CELLS", "5000")),
+    ttl=float(os.environ.get("GEO_INDEX_TTL_SECONDS", "600")),
+)
+_cell_loads: SingleFlight[Dict[str, Restaurant]] = SingleFlight()
+
+
+def covering_cells(latitude: float, longitude: float, radius: int) -> Set[str]:
+    """Returns the index cells overlapping the circle's bounding box"""
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(
+        geohash_encode(latitude, longitude, GEOHASH_CELL_PRECISION)
+    )
+    lat_step: float = (max_lat - min_lat) / 2
+    lng_step: float = (max_lng - min_lng) / 2
+    lat_delta: float = radius / METERS_PER_DEGREE_LATITUDE
+    lng_delta: float = radius / (
+        METERS_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 0.01)
+    )
+    lat_steps: int = math.ceil(2 * lat_delta / lat_step)
+    lng_steps: int = math.ceil(2 * lng_delta / lng_step)
+
+    covering: Set[str] = set()
+    for i in range(lat_steps + 1):
+        sample_lat: float = min(
+            latitude - lat_delta + i * lat_step, latitude + lat_delta
+        )
+        for j in range(lng_steps + 1):
+            sample_lng: float = min(
+                longitude - lng_delta + j * lng_step, longitude + lng_delta
+            )
+            covering.add(
+                geohash_encode(
+                    max(-90.0, min(90.0, sample_lat)),
+                    max(-180.0, min(180.0, sample_lng)),
+                    GEOHASH_CELL_PRECISION,
+                )
+            )
+            if len(covering) > MAX_CELLS_PER_SEARCH:
+                return covering
+    return covering
+
+
+async def _query_cell(cell: str) -> Dict[str, Restaurant]:
+    restaurants: Dict[str, Restaurant] = {
+        restaurant.id: to_restaurant(restaurant)
+        for restaurant in await restaurant_repository.query_restaurants_by_cell(cell)
+    }
+    cells.set(cell, restaurants)
+    return restaurants
+
+
+async def _load_cell(cell: str) -> Dict[str, Restaurant]:
+    restaurants = cells.get(cell)
+    if restaurants is None:
+        restaurants = await _cell_loads.do(cell, lambda: _query_cell(cell))
+    return restaurants
+
+
+async def find_nearby(
+    latitude: float, longitude: float, radius: int
+) -> List[Restaurant]:
+    """Returns stored restaurants within radius meters, nearest first.
+
+    Returns nothing for searches too wide for the index to cover.
+    """
+    covering: Set[str] = covering_cells(latitude, longitude, radius)
+    if len(covering) > MAX_CELLS_PER_SEARCH:
+        return []
+    loaded: List[Dict[str, Restaurant]] = await asyncio.gather(
+        *[_load_cell(cell) for cell in covering]
+    )
+    distances: Dict[str, float] = {}
+    nearby: List[Restaurant] = []
+    for restaurants in loaded:
+        for restaurant in restaurants.values():
+            distance: float = haversine(
+                latitude, longitude, restaurant.latitude, restaurant.longitude
+            )
+            if distance <= radius:
+                distances[restaurant.id] = distance
+                nearby.append(restaurant)
+    return sorted(nearby, key=lambda restaurant: distances[restaurant.id])
+
+
+def add(restaurant: DbRestaurant) -> None:
+    """Adds a newly stored restaurant to its cell if the cell is loaded"""
+    restaurants = cells.peek(restaurant.geohash_cell)
+    if restaurants is not None:
+        restaurants[restaurant.id] = to_restaurant(restaurant)
@@ -0,0 +1,156 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from openapi_server.clients import google_maps
+from openapi_server.geo import (
+    geohash_center,
+    geohash_encode,
+    geohash_half_diagonal,
+    haversine,
+)
+from openapi_server.models.restaurant import Restaurant
+from openapi_server.services import restaurant_index
+from openapi_server.ttl_cache import TTLCache
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# searches with at least this many stored restaurants in range skip Google
+LOCAL_RESULTS_THRESHOLD: int = int(os.environ.get("GEO_INDEX_MIN_LOCAL_RESULTS", "20"))
+
+# search radii are rounded up to one of these so nearby requests share entries
+RADIUS_BUCKETS: Tuple[int, ...] = (100, 250, 500, 1000, 2000, 5000, 10000, 25000, 50000)
+
+# the Places API rejects nearby searches wider than this many meters
+MAX_SEARCH_RADIUS: int = 50000
+
+# precision 6 cells are about 1.2km x 0.6km
+CELL_PRECISION: int = int(os.environ.get("GEO_CACHE_PRECISION", "6"))
+
+# (cell, radius bucket, page token) -> (restaurants, next_page_token)
+cache: TTLCache[Tuple[List[Restaurant], Optional[str]]] = TTLCache(
+    maxsize=int(os.environ.get("GEO_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.environ.get("GEO_CACHE_TTL_SECONDS", "300")),
+)
+
+
+def radius_bucket(radius: int) -> int:
+    for bucket in RADIUS_BUCKETS:
+        if radius <= bucket:
+            return bucket
+    return radius
+
+
+def to_restaurants(results: List[Dict[str, Any]]) -> List[Restaurant]:
+    restaurants: List[Restaurant] = []
+    for place in results:
+        if place["business_status"] == "OPERATIONAL":
+            restaurant: Restaurant = Restaurant(
+                id=place["place_id"],
+                name=place["name"],
+                latitude=place["geometry"]["location"]["lat"],
+                longitude=place["geometry"]["location"]["lng"],
+                address=place["vicinity"],
+            )
+            restaurants.append(restaurant)
+    return restaurants
+
+
+async def _load_candidates(
+    cell: str, bucket: int, page_token: Optional[str]
+) -> Tuple[List[Restaurant], Optional[str]]:
+    """Returns one cached Google result page for the cell and its next_page_token"""
+    key: Tuple[str, int, Optional[str]] = (cell, bucket, page_token)
+    entry: Optional[Tuple[List[Restaurant], Optional[str]]] = cache.get(key)
+    if entry is None:
+        response: Dict[str, Any]
+        if page_token is None:
+            center_lat, center_lng = geohash_center(cell)
+            # the widening cannot go past the cap; the top bucket misses the corners
+            # of the cell farthest from the point, as a search there always would
+            search_radius: int = min(
+                bucket + int(geohash_half_diagonal(cell)) + 1, MAX_SEARCH_RADIUS
+            )
+            response = await google_maps.nearby_search(
+                center_lat, center_lng, search_radius
+            )
+        else:
+            response = await google_maps.nearby_search_page(page_token)
+        entry = (to_restaurants(response["results"]), response.get("next_page_token"))
+        cache.set(key, entry)
+    return entry
+
+
+async def _find_stored(
+    latitude: float, longitude: float, radius: int
+) -> List[Restaurant]:
+    try:
+        return await restaurant_index.find_nearby(latitude, longitude, radius)
+    except Exception:
+        # the local index only saves Google calls; never fail a search over it
+        logger.warning("restaurant index lookup failed", exc_info=True)
+        return []
+
+
+async def find_restaurants(
+    latitude: float,
+    longitude: float,
+    radius: int,
+    limit: int,
+    position: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Restaurant], Optional[Dict[str, Any]]]:
+    """Returns a page of operational restaurants within radius meters of the point.
+
+    Restaurants already stored from reviews are looked up in the local index first;
+    when it holds at least LOCAL_RESULTS_THRESHOLD of them the search is answered
+    without Google. Otherwise Google is queried once per (geohash cell, radius
+    bucket): the search is centered on the cell and widened so it covers any point
+    in the cell, requests landing in a cached cell are answered by filtering that
+    result by distance, and stored restaurants Google left out are appended.
+
+    position is the previous page's returned position: an offset into the local
+    results or a Google result page, and the next_page_token of that page once it
+    is used up.
+    """
+    position = position or {}
+    page_token: Optional[str] = position.get("token")
+    offset: int = position.get("offset", 0)
+    next_page_token: Optional[str] = None
+    matching: List[Restaurant] = []
+
+    stored: List[Restaurant] = []
+    if page_token is None:
+        stored = await _find_stored(latitude, longitude, radius)
+    if position.get("local") or len(stored) >= LOCAL_RESULTS_THRESHOLD:
+        matching = stored
+    else:
+        cell: str = geohash_encode(latitude, longitude, CELL_PRECISION)
+        candidates, next_page_token = await _load_candidates(
+            cell, radius_bucket(radius), page_token
+        )
+        matching = [
+            restaurant
+            for restaurant in candidates
+            if haversine(latitude, longitude, restaurant.latitude, restaurant.longitude)
+            <= radius
+        ]
+        from_google: Set[str] = {restaurant.id for restaurant in matching}
+        matching += [
+            restaurant for restaurant in stored if restaurant.id not in from_google
+        ]
+
+    end: int = offset + limit
+    next_position: Optional[Dict[str, Any]] = None
+    if end < len(matching):
+        next_position = {"token": page_token, "offset": end}
+        if matching is stored:
+            next_position["local"] = True
+    elif next_page_token:
+        next_position = {"token": next_page_token, "offset": 0}
+    return matching[offset:end], next_position
+
+
+def cursor_scope(latitude: float, longitude: float, radius: int) -> str:
+    """Cursors stay valid for any search landing in the same cell and bucket"""
+    cell: str = geohash_encode(latitude, longitude, CELL_PRECISION)
+    return f"restaurants:{cell}:{radius_bucket(radius)}"
@@ -0,0 +1,39 @@
+from typing import Any, Dict
+
+from openapi_server.clients import google_maps
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.repositories import restaurant_repository
+from openapi_server.services import restaurant_index
+from openapi_server.singleflight import SingleFlight
+
+# place_id -> in-flight Place Details fetch and write
+_place_fetches: SingleFlight[DbRestaurant] = SingleFlight()
+
+
+async def _create_from_place_details(place_id: str) -> DbRestaurant:
+    result: Dict[str, Any] = (await google_maps.place_details(place_id))["result"]
+    restaurant: DbRestaurant = DbRestaurant(
+        result["place_id"],
+        name=result["name"],
+        latitude=result["geometry"]["location"]["lat"],
+        longitude=result["geometry"]["location"]["lng"],
+        address=result["formatted_address"],
+    )
+    restaurant = await restaurant_repository.create_restaurant(restaurant)
+    restaurant_index.add(restaurant)
+    return restaurant
+
+
+async def get_or_create_restaurant(place_id: str) -> DbRestaurant:
+    """Returns the stored restaurant, creating it from Google Place Details if new.
+
+    Concurrent requests in this process for the same unknown place share one
+    fetch and one write; across workers the conditional put lets one write win.
+    """
+    try:
+        return await restaurant_repository.get_restaurant(place_id)
+    except DbRestaurant.DoesNotExist:
+        pass
+    return await _place_fetches.do(
+        place_id, lambda: _create_from_place_details(place_id)
+    )
@@ -0,0 +1,142 @@
+import os
+import queue
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import orjson
+
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories import review_repository
+
+# parallel Scan segments read at once when exporting the whole table
+EXPORT_SEGMENTS: int = int(os.environ.get("REVIEW_EXPORT_SEGMENTS", "4"))
+# pages read ahead of the consumer; memory stays within
+# (EXPORT_QUEUE_PAGES + segments) * EXPORT_PAGE_SIZE reviews
+EXPORT_QUEUE_PAGES: int = int(os.environ.get("REVIEW_EXPORT_QUEUE_PAGES", "8"))
+EXPORT_PAGE_SIZE: int = 100
+
+# how often a blocked worker checks whether the consumer went away
+_PUT_TIMEOUT_SECONDS: float = 0.1
+
+_DONE: object = object()
+
+
+def _put(pages: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Waits for room on the queue; returns False if the export was abandoned"""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=_PUT_TIMEOUT_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(
+    source: Callable[[], Iterable[DbReview]],
+    pages: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    result: Any = _DONE
+    try:
+        page: List[DbReview] = []
+        for review in source():
+            page.append(review)
+            if len(page) == EXPORT_PAGE_SIZE:
+                if not _put(pages, page, stop):
+                    return
+                page = []
+        if page and not _put(pages, page, stop):
+            return
+    except Exception as e:
+        result = e  # re-raised by the consumer
+    _put(pages, result, stop)
+
+
+def iter_pages(
+    sources: List[Callable[[], Iterable[DbReview]]],
+) -> Iterator[List[DbReview]]:
+    """Reads every source on its own thread and yields pages as they arrive.
+
+    Workers block once EXPORT_QUEUE_PAGES pages are waiting, so a slow consumer
+    slows the reads down instead of buffering the table. Closing the iterator
+    stops the workers.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=EXPORT_QUEUE_PAGES)
+    stop: threading.Event = threading.Event()
+    workers: List[threading.Thread] = [
+        threading.Thread(
+            target=_produce,
+            args=(source, pages, stop),
+            name=f"review-export-{i}",
+            daemon=True,
+        )
+        for i, source in enumerate(sources)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        remaining: int = len(workers)
+        while remaining:
+            item: Any = pages.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def _sources(
+    username: Optional[str], restaurant_id: Optional[str], segments: int
+) -> List[Callable[[], Iterable[DbReview]]]:
+    if username is not None:
+        return [
+            partial(
+                review_repository.iter_reviews_by_username,
+                username,
+                EXPORT_PAGE_SIZE,
+                restaurant_id,
+            )
+        ]
+    if restaurant_id is not None:
+        return [
+            partial(
+                review_repository.iter_reviews_by_restaurant,
+                restaurant_id,
+                EXPORT_PAGE_SIZE,
+            )
+        ]
+    return [
+        partial(review_repository.scan_reviews, segment, segments, EXPORT_PAGE_SIZE)
+        for segment in range(segments)
+    ]
+
+
+def to_line(review: DbReview) -> bytes:
+    item: Dict[str, Any] = dict(review.attribute_values)
+    # a raw MapAttribute is not JSON serializable as loaded
+    if review.photo_variants is not None:
+        item["photo_variants"] = review.photo_variants.as_dict()
+    return orjson.dumps(item) + b"\n"
+
+
+def export_lines(
+    username: Optional[str] = None,
+    restaurant_id: Optional[str] = None,
+    segments: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Yields the reviews as NDJSON, one chunk per page, in no particular order.
+
+    Without filters the whole table is read with a parallel Scan; a username or
+    restaurant id queries the matching index instead.
+    """
+    for page in iter_pages(
+        _sources(username, restaurant_id, segments or EXPORT_SEGMENTS)
+    ):
+        yield b"".join(to_line(review) for review in page)
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Dict, List, Set, Tuple
+
+from openapi_server.converters import to_review
+from openapi_server.models.review import Review
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+from openapi_server.repositories import restaurant_repository, user_repository
+
+
+class ReviewLoader:
+    """Collects the users and restaurants that reviews refer to and resolves them
+    together, with one BatchGetItem per table however many reviews were added.
+    """
+
+    def __init__(self) -> None:
+        self._reviews: List[DbReview] = []
+        self._usernames: Set[str] = set()
+        self._restaurant_ids: Set[str] = set()
+        self._users: Dict[str, DbUser] = {}
+        self._restaurants: Dict[str, DbRestaurant] = {}
+
+    def add(self, review: DbReview) -> None:
+        self._reviews.append(review)
+        self._usernames.add(review.username)
+        self._restaurant_ids.add(review.restaurantId)
+
+    async def fetch(self) -> None:
+        """Loads the users and restaurants of the reviews added so far"""
+        self._users, self._restaurants = await asyncio.gather(
+            user_repository.batch_get_users(self._usernames),
+            restaurant_repository.batch_get_restaurants(self._restaurant_ids),
+        )
+
+    def _loaded(self) -> List[Tuple[DbReview, DbUser, DbRestaurant]]:
+        # reviews whose user or restaurant no longer exists are left out
+        return [
+            (
+                review,
+                self._users[review.username],
+                self._restaurants[review.restaurantId],
+            )
+            for review in self._reviews
+            if review.username in self._users
+            and review.restaurantId in self._restaurants
+        ]
+
+    def versions(self) -> List[Tuple[str, int, int, int]]:
+        """Versions of every item the built reviews depend on, after fetch(); equal
+        versions mean build() returns equal reviews.
+        """
+        return [
+            (review.id, review.version, user.version, restaurant.version)
+            for review, user, restaurant in self._loaded()
+        ]
+
+    def build(self) -> List[Review]:
+        """Builds Review models in the order the reviews were added, after fetch()"""
+        return [to_review(*loaded) for loaded in self._loaded()]
+
+    async def load(self) -> List[Review]:
+        """Fetches and builds; reviews whose user or restaurant no longer exists
+        are left out.
+        """
+        await self.fetch()
+        return self.build()
+
+
+async def hydrate_reviews(reviews: List[DbReview]) -> List[Review]:
+    """Builds Review models, fetching each distinct user and restaurant once"""
+    loader: ReviewLoader = ReviewLoader()
+    for review in reviews:
+        loader.add(review)
+    return await loader.load()
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Dict, List
+
+from openapi_server.orms.restaurant import DbFoodCounter, DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories import restaurant_repository
+from openapi_server.space_saving import SpaceSaving
+
+logger = logging.getLogger(__name__)
+
+# counters kept per restaurant; foods above 1/SUMMARY_SIZE of the reviews are kept
+SUMMARY_SIZE: int = int(os.environ.get("TOP_FOODS_SUMMARY_SIZE", "32"))
+MAX_ATTEMPTS: int = 5
+
+
+def normalize(food: str) -> str:
+    return " ".join(food.lower().split())
+
+
+def load_summary(restaurant: DbRestaurant) -> SpaceSaving:
+    summary: SpaceSaving = SpaceSaving(SUMMARY_SIZE)
+    for counter in restaurant.top_foods:
+        summary.counters[counter.name] = (counter.count, counter.error)
+    return summary
+
+
+async def _record_restaurant(restaurant_id: str, foods: Dict[str, int]) -> None:
+    for _ in range(MAX_ATTEMPTS):
+        restaurant: DbRestaurant = await restaurant_repository.get_restaurant(
+            restaurant_id, consistent_read=True
+        )
+        summary: SpaceSaving = load_summary(restaurant)
+        for food, count in foods.items():
+            summary.add(food, count)
+        top_foods: List[DbFoodCounter] = [
+            DbFoodCounter(name=name, count=count, error=error)
+            for name, count, error in summary.top(SUMMARY_SIZE)
+        ]
+        if await restaurant_repository.update_top_foods(restaurant, top_foods):
+            return
+    logger.warning("Gave up recording favorite foods for %s", restaurant_id)
+
+
+async def record(reviews: List[DbReview]) -> None:
+    """Adds the reviews' favorite foods to their restaurants' summaries.
+
+    Meant to run after the response is sent; failures are logged, not raised. Only
+    additions are counted: edited or deleted reviews are not taken back out.
+    """
+    by_restaurant: Dict[str, Counter] = {}
+    for review in reviews:
+        if review.favorite_food.strip():
+            by_restaurant.setdefault(review.restaurantId, Counter())[
+                normalize(review.favorite_food)
+            ] += 1
+    results = await asyncio.gather(
+        *[
+            _record_restaurant(restaurant_id, foods)
+            for restaurant_id, foods in by_restaurant.items()
+        ],
+        return_exceptions=True,
+    )
+    for restaurant_id, result in zip(by_restaurant, results):
+        if isinstance(result, Exception):
+            logger.warning(
+                "Recording favorite foods for %s failed: %s", restaurant_id, result
+            )
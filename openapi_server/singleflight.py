@@ -0,0 +1,28 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Collapses concurrent calls with the same key into one in-flight call.
+
+    The first caller for a key starts the call as a task; callers arriving while
+    it runs await the same task instead of starting their own. The key is
+    forgotten once the call finishes, so later callers start a fresh one.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, "asyncio.Task[T]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task: "asyncio.Task[T]" = self._calls.get(key)  # type: ignore
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # a cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,35 @@
+from typing import Dict, List, Tuple
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitters summary over a stream of item names.
+
+    Keeps at most capacity counters, so its size is constant however many distinct
+    items are seen. Every item occurring more than total / capacity times is kept.
+    A counter may overestimate its item by at most its error, the count of the item
+    it replaced.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity: int = capacity
+        # item -> (count, error)
+        self.counters: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self.counters:
+            current, error = self.counters[item]
+            self.counters[item] = (current + count, error)
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = (count, 0)
+        else:
+            # the new item takes over the smallest counter, inheriting it as error
+            smallest: str = min(self.counters, key=lambda key: self.counters[key][0])
+            minimum, _ = self.counters.pop(smallest)
+            self.counters[item] = (minimum + count, minimum)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """Returns up to k (item, count, error) triples, highest count first"""
+        return sorted(
+            ((item, count, error) for item, (count, error) in self.counters.items()),
+            key=lambda counter: (-counter[1], counter[0]),
+        )[:k]
@@ -3,6 +3,13 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from openapi_server.main import app as application
+from openapi_server.repositories import user_repository
+from openapi_server.services import (
+    password_service,
+    photo_cleanup,
+    restaurant_index,
+    restaurant_search,
+)
 
 
 @pytest.fixture
@@ -15,3 +22,13 @@ def app() -> FastAPI:
 @pytest.fixture
 def client(app) -> TestClient:
     return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    # process-level caches would otherwise leak between tests
+    restaurant_search.cache.clear()
+    restaurant_index.cells.clear()
+    user_repository.clear_cache()
+    photo_cleanup.reset_stats()
+    password_service.reset_stats()
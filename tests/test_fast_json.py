@@ -0,0 +1,69 @@
+# coding: utf-8
+
+import json
+from typing import Dict
+from unittest.mock import patch
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from moto import mock_dynamodb
+
+from openapi_server import fast_json
+from openapi_server.converters import to_review
+from openapi_server.main import app
+from openapi_server.models.list_reviews import ListReviews
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+
+REVIEW: DbReview = DbReview(
+    "review_id_example",
+    username="theUser",
+    restaurantId="restaurant_id_example",
+    rating=5,
+    favorite_food="pizza",
+    starred=True,
+    created_at="2022-12-01 00:00:00",
+    updated_at="2022-12-01 00:00:00",
+)
+USER: DbUser = DbUser("theUser", id="1", first_name="John")
+RESTAURANT: DbRestaurant = DbRestaurant(
+    "restaurant_id_example",
+    name="Joe's Pizza Broadway",
+    latitude=40.7546795,
+    longitude=-73.9870291,
+    review_count=2,
+    rating_sum=9,
+)
+
+
+def test_dumps_matches_default_encoding():
+    """The fast path should produce the same document FastAPI does"""
+    with patch.dict("os.environ", {"FAST_JSON_RESPONSES": "true"}):
+        fast: ListReviews = ListReviews(
+            reviews=[to_review(REVIEW, USER, RESTAURANT)] * 3, next_cursor="abc"
+        )
+    validated: ListReviews = ListReviews(
+        reviews=[to_review(REVIEW, USER, RESTAURANT)] * 3, next_cursor="abc"
+    )
+
+    assert json.loads(fast_json.dumps(fast)) == jsonable_encoder(
+        validated, by_alias=True
+    )
+
+
+@mock_dynamodb
+def test_routes_use_fast_path_when_enabled():
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    RESTAURANT.save()
+
+    default: Dict = client.request("GET", "restaurants/restaurant_id_example").json()
+    with patch.dict("os.environ", {"FAST_JSON_RESPONSES": "true"}):
+        with patch.object(fast_json, "dumps", wraps=fast_json.dumps) as dumps:
+            fast: Dict = client.request(
+                "GET", "restaurants/restaurant_id_example"
+            ).json()
+
+    assert dumps.call_count == 1
+    assert fast == default
@@ -0,0 +1,38 @@
+# coding: utf-8
+
+import asyncio
+from typing import List
+from unittest.mock import patch
+
+from moto import mock_dynamodb
+
+from openapi_server.orms.feed import DbFeedItem
+from openapi_server.orms.friend import DbFriend
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+from openapi_server.services import feed_service
+
+
+@mock_dynamodb
+def test_fan_out_switches_high_degree_authors_to_pull():
+    """Authors over the fan-out limit should be marked instead of copied to feeds"""
+    for model in [DbUser, DbFriend, DbFeedItem]:
+        model.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser("author").save()
+    friends: List[str] = ["friend1", "friend2", "friend3"]
+    for friend in friends:
+        DbFriend("author", friend).save()
+        DbFriend(friend, "author").save()
+    review: DbReview = DbReview(
+        "review", username="author", created_at="2022-12-01 00:00:00"
+    )
+
+    with patch.object(feed_service, "FANOUT_MAX_FRIENDS", 2):
+        asyncio.run(feed_service.fan_out([review]))
+
+    assert DbUser.get("author").pull_author
+    assert sum(DbFeedItem.count(friend) for friend in friends) == 0
+    for friend in friends:
+        assert [edge.friend_username for edge in DbFriend.pull_index.query(friend)] == [
+            "author"
+        ]
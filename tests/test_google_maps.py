@@ -0,0 +1,20 @@
+# coding: utf-8
+
+import asyncio
+
+from httpx import AsyncClient
+
+from openapi_server.clients import google_maps
+
+
+def test_client_is_shared_until_closed():
+    """Test case for the lifespan-managed Google Maps client"""
+
+    async def lifespan() -> None:
+        await google_maps.start_client()
+        client: AsyncClient = google_maps.get_client()
+        assert google_maps.get_client() is client
+        await google_maps.close_client()
+        assert client.is_closed
+
+    asyncio.run(lifespan())
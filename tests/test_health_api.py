@@ -0,0 +1,73 @@
+# coding: utf-8
+
+import asyncio
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from moto import mock_dynamodb
+
+from openapi_server.main import app
+from openapi_server.orms.dynamodb_setup import dynamodb_setup
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+
+
+def test_healthz(client: TestClient):
+    """Test case for healthz
+
+    Liveness probe
+    """
+    response = client.request("GET", "/healthz")
+
+    assert response.status_code == 200
+
+
+def test_metrics(client: TestClient):
+    """Test case for metrics
+
+    Cache metrics
+    """
+    response = client.request("GET", "/metrics")
+
+    assert response.status_code == 200
+    assert response.json()["user_cache"] == {
+        "size": 0,
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "hit_ratio": 0.0,
+        "read_units_saved": 0.0,
+    }
+
+
+def test_readyz_waits_for_provisioning(client: TestClient):
+    """Test case for readyz
+
+    Readiness probe
+    """
+    app.state.ready = False
+    response = client.request("GET", "/readyz")
+    assert response.status_code == 503
+
+    with patch.dict("os.environ", {"SKIP_DYNAMODB_PROVISIONING": "true"}):
+        with TestClient(app) as started_client:
+            deadline: float = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                response = started_client.request("GET", "/readyz")
+                if response.status_code == 200:
+                    break
+            assert response.status_code == 200
+    app.state.ready = False
+
+
+@mock_dynamodb
+def test_dynamodb_setup_creates_tables():
+    asyncio.run(dynamodb_setup())
+
+    assert DbUser.exists()
+    assert DbReview.exists()
+    assert DbRestaurant.exists()
+
+    asyncio.run(dynamodb_setup())  # already provisioned: nothing to do
@@ -0,0 +1,26 @@
+# coding: utf-8
+
+import pytest
+
+from openapi_server.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    position = {"id": {"S": "review1"}, "created_at": {"S": "2022-12-01"}}
+
+    cursor: str = encode_cursor("reviews:user:theUser", position)
+
+    assert decode_cursor("reviews:user:theUser", cursor) == position
+
+
+def test_cursor_rejects_tampering_and_other_scopes():
+    cursor: str = encode_cursor("favorite-foods:theUser", {"offset": 20})
+    signature: str = cursor.split(".")[1]
+    forged: str = encode_cursor("favorite-foods:theUser", {"offset": 0}).split(".")[0]
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor("favorite-foods:theUser", f"{forged}.{signature}")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("favorite-foods:someoneElse", cursor)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("favorite-foods:theUser", "not-a-cursor")
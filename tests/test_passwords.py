@@ -0,0 +1,38 @@
+from openapi_server import passwords
+
+PARAMS: passwords.Params = (2**4, 8, 1)
+
+
+def test_hash_password_salts_each_hash():
+    first: str = passwords.hash_password("12345", PARAMS)
+    second: str = passwords.hash_password("12345", PARAMS)
+
+    assert first.startswith("scrypt$16$8$1$")
+    assert first != second
+    assert passwords.verify_password("12345", first, PARAMS) == (True, None)
+    assert passwords.verify_password("12345", second, PARAMS) == (True, None)
+    assert passwords.verify_password("54321", first, PARAMS) == (False, None)
+
+
+def test_verify_password_rehashes_with_new_params():
+    encoded: str = passwords.hash_password("12345", PARAMS)
+    stronger: passwords.Params = (2**5, 8, 1)
+
+    matched, rehashed = passwords.verify_password("12345", encoded, stronger)
+
+    assert matched
+    assert rehashed is not None and rehashed.startswith("scrypt$32$8$1$")
+    assert passwords.verify_password("12345", rehashed, stronger) == (True, None)
+    # a wrong password is never rehashed
+    assert passwords.verify_password("54321", encoded, stronger) == (False, None)
+
+
+def test_verify_password_upgrades_plain_text():
+    matched, rehashed = passwords.verify_password("12345", "12345", PARAMS)
+
+    assert matched
+    assert rehashed is not None
+    assert passwords.verify_password("12345", rehashed, PARAMS) == (True, None)
+    assert passwords.verify_password("54321", "12345", PARAMS) == (False, None)
+    # users created without a password cannot log in with an empty one
+    assert passwords.verify_password("", "", PARAMS) == (False, None)
@@ -0,0 +1,76 @@
+# coding: utf-8
+
+import asyncio
+from typing import Dict, List
+from unittest.mock import patch
+
+from moto import mock_dynamodb, mock_s3
+
+from openapi_server.clients import s3 as s3_client
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
+from openapi_server.repositories import cleanup_repository, photo_repository
+from openapi_server.services import photo_cleanup
+
+
+def stored_keys() -> List[str]:
+    paginator = s3_client.get_client().get_paginator("list_objects_v2")
+    return [
+        item["Key"]
+        for page in paginator.paginate(Bucket=s3_client.photo_bucket())
+        for item in page.get("Contents", [])
+    ]
+
+
+@mock_dynamodb
+@mock_s3
+def test_drain_deletes_in_batches():
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    s3_client.get_client().create_bucket(Bucket=s3_client.photo_bucket())
+    keys: List[str] = [f"reviews/{i}/a/original" for i in range(1002)]
+    for key in keys[:1001]:
+        s3_client.get_client().put_object(
+            Bucket=s3_client.photo_bucket(), Key=key, Body=b"photo"
+        )
+    asyncio.run(cleanup_repository.enqueue(keys))  # the last has no object
+
+    assert asyncio.run(photo_cleanup.drain_once()) == 1000
+    assert asyncio.run(photo_cleanup.drain_once()) == 2
+    assert asyncio.run(photo_cleanup.drain_once()) == 0
+
+    assert stored_keys() == []
+    assert DbPhotoCleanup.count() == 0
+    assert photo_cleanup.stats() == {
+        "batches": 2,
+        "deleted": 1002,
+        "failed": 0,
+        "dropped": 0,
+        "errors": 0,
+    }
+
+
+@mock_dynamodb
+@patch.object(photo_cleanup, "MAX_ATTEMPTS", 2)
+def test_drain_retries_then_drops_failed_keys():
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    asyncio.run(cleanup_repository.enqueue(["ok", "denied"]))
+    errors: Dict[str, str] = {"denied": "AccessDenied"}
+
+    with patch.object(photo_repository, "delete_photos", return_value=errors):
+        asyncio.run(photo_cleanup.drain_once())
+        assert [(item.key, item.attempts) for item in DbPhotoCleanup.scan()] == [
+            ("denied", 1)
+        ]
+        asyncio.run(photo_cleanup.drain_once())
+
+    assert DbPhotoCleanup.count() == 0
+    assert photo_cleanup.stats() == {
+        "batches": 2,
+        "deleted": 1,
+        "failed": 2,
+        "dropped": 1,
+        "errors": 0,
+    }
@@ -0,0 +1,79 @@
+# coding: utf-8
+
+import asyncio
+from io import BytesIO
+from typing import Dict
+
+from moto import mock_dynamodb, mock_s3
+from PIL import Image
+
+from openapi_server import imaging
+from openapi_server.clients import s3 as s3_client
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
+from openapi_server.orms.review import DbReview
+from openapi_server.repositories import photo_repository
+from openapi_server.services import photo_cleanup, photo_variants
+
+
+def jpeg(width: int, height: int) -> bytes:
+    out: BytesIO = BytesIO()
+    Image.new("RGB", (width, height), (200, 80, 40)).save(out, "JPEG")
+    return out.getvalue()
+
+
+def test_render_variants_never_upscales():
+    variants: Dict[str, bytes] = imaging.render_variants(
+        jpeg(2000, 1000), {"large": 1080, "thumb": 160, "huge": 4000}
+    )
+
+    sizes: Dict[str, tuple] = {
+        name: Image.open(BytesIO(data)).size for name, data in variants.items()
+    }
+    assert sizes == {"huge": (2000, 1000), "large": (1080, 540), "thumb": (160, 80)}
+
+
+@mock_dynamodb
+@mock_s3
+def test_generate_records_variants():
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    asyncio.run(photo_repository.create_bucket())
+    key: str = "reviews/1/abc/original"
+    asyncio.run(photo_repository.put_photo(key, jpeg(1600, 1200), "image/jpeg"))
+    DbReview(
+        "1",
+        username="theUser",
+        restaurantId="restaurant",
+        created_at="2022-12-01 00:00:00",
+        photo_url=photo_repository.photo_url(key),
+    ).save()
+
+    try:
+        asyncio.run(photo_variants.generate("1", key))
+        review: DbReview = DbReview.get("1")
+        assert review.photo_variants.as_dict() == {
+            name: photo_repository.photo_url(f"reviews/1/abc/{name}.jpg")
+            for name in imaging.VARIANT_SIZES
+        }
+        thumb: bytes = asyncio.run(
+            photo_repository.get_photo("reviews/1/abc/thumb.jpg")
+        )
+        assert Image.open(BytesIO(thumb)).size == (160, 120)
+
+        # the photo was replaced before these variants were recorded
+        review.update(actions=[DbReview.photo_url.set("https://new")])
+        asyncio.run(photo_variants.generate("1", key))
+    finally:
+        photo_variants.shutdown_pool()
+
+    assert DbReview.get("1").version == review.version
+    assert sorted(item.key for item in DbPhotoCleanup.scan()) == sorted(
+        f"reviews/1/abc/{name}.jpg" for name in imaging.VARIANT_SIZES
+    )
+    asyncio.run(photo_cleanup.drain_once())
+    listed: Dict = s3_client.get_client().list_objects_v2(
+        Bucket=s3_client.photo_bucket()
+    )
+    assert [item["Key"] for item in listed["Contents"]] == [key]
@@ -0,0 +1,343 @@
+# coding: utf-8
+
+import asyncio
+import threading
+import time
+from typing import Dict, List
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_dynamodb
+from pynamodb.exceptions import TransactWriteError
+
+from openapi_server.backfill_review_aggregates import backfill
+from openapi_server.orms.dynamodb_setup import create_missing_indexes
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
+from openapi_server.orms.restaurant import DbRestaurant, rating_histogram
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+from openapi_server.repositories import (
+    photo_repository,
+    review_repository,
+    user_repository,
+)
+from openapi_server.repositories.batch import batch_get, batch_save
+from openapi_server.repositories.executor import configure_executor, run_db
+from openapi_server.repositories.transaction import transact_write
+
+
+def test_run_db_overlaps_blocking_calls():
+    """Blocking calls on the pool should run concurrently, not one after another"""
+    configure_executor(4)
+    thread_names: List[str] = []
+
+    def blocking_call() -> None:
+        thread_names.append(threading.current_thread().name)
+        time.sleep(0.1)
+
+    async def run_all() -> float:
+        start: float = time.perf_counter()
+        await asyncio.gather(*[run_db(blocking_call) for _ in range(4)])
+        return time.perf_counter() - start
+
+    elapsed: float = asyncio.run(run_all())
+
+    assert elapsed < 0.3
+    assert all(name.startswith("dynamodb") for name in thread_names)
+
+
+@mock_dynamodb
+def test_create_missing_indexes():
+    """Review tables created before the indexes existed should gain them"""
+    DbReview._get_connection().connection.create_table(
+        DbReview.Meta.table_name,
+        attribute_definitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        key_schema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        read_capacity_units=1,
+        write_capacity_units=1,
+    )
+
+    asyncio.run(create_missing_indexes(DbReview))
+
+    description: Dict = DbReview._get_connection().connection.describe_table(
+        DbReview.Meta.table_name
+    )
+    assert {index["IndexName"] for index in description["GlobalSecondaryIndexes"]} == {
+        "restaurantId-created_at-index",
+        "username-created_at-index",
+    }
+
+
+@mock_dynamodb
+def test_batch_get_chunks_keys():
+    """More than 100 keys should be split across BatchGetItem requests"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    users: List[DbUser] = [DbUser(f"user{i:03}", id=str(i)) for i in range(150)]
+    asyncio.run(batch_save(users))
+
+    found: Dict[str, DbUser] = asyncio.run(
+        batch_get(DbUser, [f"user{i:03}" for i in range(250)])
+    )
+
+    assert sorted(found) == [user.username for user in users]
+    assert found["user149"].id == "149"
+
+
+@mock_dynamodb
+def test_get_user_reads_through_cache():
+    """Repeated reads are served from the cache until a write invalidates them"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser("theUser", first_name="John").save()
+
+    async def read_twice() -> DbUser:
+        first: DbUser = await user_repository.get_user("theUser")
+        first.first_name = "changed locally"  # must not leak into the cache
+        return await user_repository.get_user("theUser")
+
+    assert asyncio.run(read_twice()).first_name == "John"
+    assert user_repository.cache_stats()["hits"] == 1
+    assert user_repository.cache_stats()["read_units_saved"] == 0.5
+
+    async def update() -> None:
+        user: DbUser = await user_repository.get_user("theUser")
+        user.first_name = "Jim"
+        await user_repository.save_user(user)
+
+    asyncio.run(update())
+    assert asyncio.run(user_repository.get_user("theUser")).first_name == "Jim"
+
+
+@mock_dynamodb
+def test_create_user_is_conditional():
+    """A signup for a taken username should not overwrite the existing user"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+
+    assert asyncio.run(user_repository.create_user(DbUser("theUser", id="first")))
+    assert not asyncio.run(user_repository.create_user(DbUser("theUser", id="second")))
+    assert DbUser.get("theUser").id == "first"
+
+
+@mock_dynamodb
+def test_set_photo_url_is_conditional():
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbReview(
+        "1", username="u", restaurantId="r", created_at="2022-12-01 00:00:00"
+    ).save()
+    first: DbReview = DbReview.get("1")
+    second: DbReview = DbReview.get("1")
+
+    assert asyncio.run(review_repository.set_photo_url(first, "https://a"))
+    assert first.photo_url == "https://a" and first.version == 1
+    # second was read before first replaced the photo
+    assert not asyncio.run(review_repository.set_photo_url(second, "https://b"))
+    assert asyncio.run(review_repository.set_photo_url(first, "https://c"))
+    assert not asyncio.run(review_repository.set_photo_url(DbReview("2"), "https://d"))
+    assert DbReview.get("1").photo_url == "https://c"
+
+
+def test_review_photo_keys_are_owned_by_the_review():
+    review: DbReview = DbReview(
+        "1",
+        photo_url=photo_repository.photo_url("reviews/2/a/original"),
+        photo_variants={
+            "thumb": photo_repository.photo_url("reviews/1/b/thumb.jpg"),
+            "large": "https://elsewhere.example/reviews/1/b/large.jpg",
+        },
+    )
+
+    # another review's photo is never queued for deletion with this one
+    assert photo_repository.review_photo_keys(review) == ["reviews/1/b/thumb.jpg"]
+
+
+@mock_dynamodb
+def test_uncounted_reviews_are_not_taken_out_of_aggregates():
+    """Reviews stored before the aggregates existed must not drive them negative"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant("r").save()
+    for review_id in ["1", "2"]:
+        DbReview(
+            review_id, username="u", restaurantId="r", rating=5, created_at="1"
+        ).save()
+
+    assert asyncio.run(review_repository.delete_review(DbReview.get("1")))
+    restaurant: DbRestaurant = DbRestaurant.get("r")
+    assert (restaurant.review_count, rating_histogram(restaurant)) == (
+        0,
+        [0, 0, 0, 0, 0],
+    )
+
+    # an edit counts it in, without taking the old one out
+    review: DbReview = DbReview.get("2")
+    assert asyncio.run(review_repository.update_review(review, {"rating": 4}))
+    restaurant = DbRestaurant.get("r")
+    assert (restaurant.review_count, restaurant.rating_sum) == (1, 4)
+    assert DbReview.get("2").counted
+
+
+@mock_dynamodb
+def test_review_counted_after_it_was_read_is_not_counted_twice():
+    """A backfill counting a review between its read and an edit must not have the
+    edit count it a second time
+    """
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant("r").save()
+    DbReview("1", username="u", restaurantId="r", rating=5, created_at="1").save()
+    review: DbReview = DbReview.get("1")
+    assert review_repository.add_to_aggregates([DbReview.get("1")]) == 1
+
+    updated: DbReview = asyncio.run(
+        review_repository.update_review(review, {"rating": 4})
+    )
+    assert (updated.rating, updated.counted) == (4, True)
+    restaurant: DbRestaurant = DbRestaurant.get("r")
+    assert (restaurant.review_count, restaurant.rating_sum) == (1, 4)
+
+    # review still holds what was read before the backfill and the edit
+    assert asyncio.run(review_repository.delete_review(review))
+    restaurant = DbRestaurant.get("r")
+    assert (restaurant.review_count, restaurant.rating_sum) == (0, 0)
+    assert not asyncio.run(review_repository.delete_review(review))
+
+
+@mock_dynamodb
+def test_variants_recorded_after_a_read_are_queued_for_deletion():
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    DbRestaurant("r").save()
+    photo_url: str = photo_repository.photo_url("reviews/1/a/original")
+    thumb: str = photo_repository.photo_url("reviews/1/a/thumb.jpg")
+
+    for write in [
+        lambda review: review_repository.delete_review(review),
+        lambda review: review_repository.update_review(
+            review, {"photo_url": "https://elsewhere.example/b.jpg"}
+        ),
+        lambda review: review_repository.set_photo_url(review, None),
+    ]:
+        DbPhotoCleanup("reviews/1/a/original").delete()
+        DbPhotoCleanup("reviews/1/a/thumb.jpg").delete()
+        DbReview(
+            "1",
+            username="u",
+            restaurantId="r",
+            created_at="1",
+            photo_url=photo_url,
+            counted=True,
+        ).save()
+        review: DbReview = DbReview.get("1")
+        # rendering finishes between the read and the write
+        assert asyncio.run(
+            review_repository.set_photo_variants("1", photo_url, {"thumb": thumb})
+        )
+
+        assert asyncio.run(write(review))
+        assert sorted(item.key for item in DbPhotoCleanup.scan()) == [
+            "reviews/1/a/original",
+            "reviews/1/a/thumb.jpg",
+        ]
+
+
+@mock_dynamodb
+def test_backfill_review_aggregates_counts_each_review_once():
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant("r", review_count=1, rating_sum=2, rating_2=1).save()
+    DbReview(
+        "counted",
+        username="u",
+        restaurantId="r",
+        rating=2,
+        created_at="1",
+        counted=True,
+    ).save()
+    for i, (restaurant_id, rating) in enumerate([("r", 5), ("r", 3), ("s", 4)]):
+        DbReview(
+            str(i),
+            username="u",
+            restaurantId=restaurant_id,
+            rating=rating,
+            created_at="1",
+        ).save()
+
+    assert backfill(page_size=2) == 3
+    assert backfill() == 0
+
+    r: DbRestaurant = DbRestaurant.get("r")
+    assert (r.review_count, r.rating_sum, rating_histogram(r)) == (
+        3,
+        10,
+        [0, 1, 1, 0, 1],
+    )
+    s: DbRestaurant = DbRestaurant.get("s")
+    assert (s.review_count, s.rating_sum) == (1, 4)
+    assert all(review.counted for review in DbReview.scan())
+
+    # a review counted or deleted meanwhile is skipped, not counted twice
+    stale: List[DbReview] = [DbReview.get("0"), DbReview("gone", restaurantId="r")]
+    stale[0].counted = None
+    assert review_repository.add_to_aggregates(stale) == 0
+    assert DbRestaurant.get("r").review_count == 3
+
+
+def _cancelled(*reasons: str) -> TransactWriteError:
+    message: str = (
+        "Transaction cancelled, please refer cancellation reasons for specific"
+        f" reasons [{', '.join(reasons)}]"
+    )
+    return TransactWriteError(
+        "Failed to write transaction items",
+        ClientError(
+            {"Error": {"Code": "TransactionCanceledException", "Message": message}},
+            "TransactWriteItems",
+        ),
+    )
+
+
+@mock_dynamodb
+@patch.object(review_repository, "TRANSACTION_CONFLICT_BACKOFF_SECONDS", 0)
+def test_create_review_retries_transaction_conflicts():
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant("r").save()
+    review: DbReview = DbReview(
+        "1", username="u", restaurantId="r", rating=5, created_at="1"
+    )
+
+    with patch.object(
+        review_repository,
+        "transact_write",
+        side_effect=[_cancelled("None", "TransactionConflict"), transact_write()],
+    ):
+        assert asyncio.run(review_repository.create_review(review))
+
+    assert DbReview.count() == 1
+    assert DbRestaurant.get("r").review_count == 1
+    # the id is taken now; a failed condition is reported, not retried
+    assert not asyncio.run(review_repository.create_review(review))
+    assert DbRestaurant.get("r").review_count == 1
+
+
+@mock_dynamodb
+@patch.object(review_repository, "TRANSACTION_CONFLICT_BACKOFF_SECONDS", 0)
+def test_delete_review_raises_on_persistent_conflicts():
+    """A busy restaurant is not mistaken for a review changed since it was read"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbReview("1", username="u", restaurantId="r", rating=5, created_at="1").save()
+    review: DbReview = DbReview.get("1")
+
+    with patch.object(
+        review_repository,
+        "transact_write",
+        side_effect=_cancelled("None", "TransactionConflict"),
+    ) as transactions:
+        with pytest.raises(TransactWriteError):
+            asyncio.run(review_repository.delete_review(review))
+
+    assert transactions.call_count == review_repository.TRANSACTION_CONFLICT_RETRIES + 1
+    assert DbReview.count() == 1
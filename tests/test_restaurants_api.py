@@ -1,5 +1,6 @@
 # coding: utf-8
 
+import asyncio
 from typing import Dict, List, Union, Tuple
 
 from fastapi.testclient import TestClient
@@ -7,78 +8,86 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch
 
 from httpx import Response
+from moto import mock_dynamodb
 
 from openapi_server.models.list_restaurants import ListRestaurants  # noqa: F401
 from openapi_server.models.list_reviews import ListReviews  # noqa: F401
 from openapi_server.main import app
+from openapi_server.repositories import restaurant_repository, user_repository
+from openapi_server.services import restaurant_search, top_foods
+from openapi_server.orms.restaurant import DbRestaurant, set_geohash
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
 
 
-@patch(
-    "httpx.AsyncClient.get",
-    return_value=Response(
-        200,
-        json={
-            "html_attributions": [],
-            "results": [
-                {
-                    "business_status": "OPERATIONAL",
-                    "geometry": {
-                        "location": {"lat": 40.7546795, "lng": -73.9870291},
-                        "viewport": {
-                            "northeast": {
-                                "lat": 40.75601118029149,
-                                "lng": -73.98556926970849,
-                            },
-                            "southwest": {
-                                "lat": 40.7533132197085,
-                                "lng": -73.9882672302915,
-                            },
+NEARBY_SEARCH_RESPONSE: Response = Response(
+    200,
+    json={
+        "html_attributions": [],
+        "results": [
+            {
+                "business_status": "OPERATIONAL",
+                "geometry": {
+                    "location": {"lat": 40.7546795, "lng": -73.9870291},
+                    "viewport": {
+                        "northeast": {
+                            "lat": 40.75601118029149,
+                            "lng": -73.98556926970849,
+                        },
+                        "southwest": {
+                            "lat": 40.7533132197085,
+                            "lng": -73.9882672302915,
                         },
                     },
-                    "icon": "https://maps.gstatic.com/mapfiles/place_api/icons/v1/png_71/restaurant-71.png",
-                    "icon_background_color": "#FF9E67",
-                    "icon_mask_base_uri": "https://maps.gstatic.com/mapfiles/place_api/icons/v2/restaurant_pinlet",
-                    "name": "Joe's Pizza Broadway",
-                    "opening_hours": {"open_now": True},
-                    "photos": [
-                        {
-                            "height": 9000,
-                            "html_attributions": [
-                                '<a href="https://maps.google.com/maps/contrib/102814344397000225596">Marlene Escobar</a>'
-                            ],
-                            "photo_reference": "ARywPAKhaV30O5tIjdrNQU4F9rxRqjbJ_deUxPouP-ieg05kgg_vySCuY2OzkbTBkE-3gftdXk213f2wyjK2RlHXjUiG0kziHarrSfXk6KYD7B9ZIt_MTxrp03V0DgxJbaLhnbeUStBjCgfVxGKzsqEsechd8_YPwUdB-p9S3yrWZzRss3MT",
-                            "width": 12000,
-                        }
-                    ],
-                    "place_id": "ChIJifIePKtZwokRVZ-UdRGkZzs",
-                    "plus_code": {
-                        "compound_code": "Q237+V5 New York, NY, USA",
-                        "global_code": "87G8Q237+V5",
-                    },
-                    "price_level": 1,
-                    "rating": 4.5,
-                    "reference": "ChIJifIePKtZwokRVZ-UdRGkZzs",
-                    "scope": "GOOGLE",
-                    "types": [
-                        "meal_delivery",
-                        "restaurant",
-                        "food",
-                        "point_of_interest",
-                        "establishment",
-                    ],
-                    "user_ratings_total": 13538,
-                    "vicinity": "1435 Broadway, New York",
-                }
-            ],
-            "status": "OK",
-        },
-    ),
+                },
+                "icon": "https://maps.gstatic.com/mapfiles/place_api/icons/v1/png_71/restaurant-71.png",
+                "icon_background_color": "#FF9E67",
+                "icon_mask_base_uri": "https://maps.gstatic.com/mapfiles/place_api/icons/v2/restaurant_pinlet",
+                "name": "Joe's Pizza Broadway",
+                "opening_hours": {"open_now": True},
+                "photos": [
+                    {
+                        "height": 9000,
+                        "html_attributions": [
+                            '<a href="https://maps.google.com/maps/contrib/102814344397000225596">Marlene Escobar</a>'
+                        ],
+                        "photo_reference": "ARywPAKhaV30O5tIjdrNQU4F9rxRqjbJ_deUxPouP-ieg05kgg_vySCuY2OzkbTBkE-3gftdXk213f2wyjK2RlHXjUiG0kziHarrSfXk6KYD7B9ZIt_MTxrp03V0DgxJbaLhnbeUStBjCgfVxGKzsqEsechd8_YPwUdB-p9S3yrWZzRss3MT",
+                        "width": 12000,
+                    }
+                ],
+                "place_id": "ChIJifIePKtZwokRVZ-UdRGkZzs",
+                "plus_code": {
+                    "compound_code": "Q237+V5 New York, NY, USA",
+                    "global_code": "87G8Q237+V5",
+                },
+                "price_level": 1,
+                "rating": 4.5,
+                "reference": "ChIJifIePKtZwokRVZ-UdRGkZzs",
+                "scope": "GOOGLE",
+                "types": [
+                    "meal_delivery",
+                    "restaurant",
+                    "food",
+                    "point_of_interest",
+                    "establishment",
+                ],
+                "user_ratings_total": 13538,
+                "vicinity": "1435 Broadway, New York",
+            }
+        ],
+        "status": "OK",
+    },
 )
+
+
+@mock_dynamodb
+@patch("httpx.AsyncClient.get", return_value=NEARBY_SEARCH_RESPONSE)
 def test_get_restaurants(client: TestClient):
     """Test case for get_restaurants
 
     Find restaurants in user location given
     """
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
     client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
 
     params: List[Tuple[str, Union[str, int, float, bool, None]]] = [
@@ -103,25 +112,316 @@ def test_get_restaurants(client: TestClient):
                 "latitude": 40.7546795,
                 "longitude": -73.9870291,
                 "address": "1435 Broadway, New York",
+                # not stored yet, so there are no review aggregates
+                "reviewCount": None,
+                "averageRating": None,
+                "ratingHistogram": None,
+                "starredCount": None,
             }
         ],
+        "nextCursor": None,
     }
 
 
+@mock_dynamodb
 def test_get_review_by_restaurant(client: TestClient):
     """Test case for get_review_by_restaurant
 
     Find reviews by restaurant
     """
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    DbUser("theUser", id="1", first_name="John").save()
+    DbRestaurant("restaurant_id_example", name="Joe's Pizza Broadway").save()
+    for review_id, created_at, restaurant_id in [
+        ("older", "2022-12-01 10:00:00", "restaurant_id_example"),
+        ("newer", "2022-12-02 10:00:00", "restaurant_id_example"),
+        ("elsewhere", "2022-12-03 10:00:00", "another_restaurant"),
+    ]:
+        DbReview(
+            review_id,
+            created_at=created_at,
+            updated_at=created_at,
+            username="theUser",
+            restaurantId=restaurant_id,
+            rating=5,
+            favorite_food="pizza",
+        ).save()
 
-    headers = {}
+    headers: Dict = {}
     response = client.request(
         "GET",
-        "/restaurants/{restaurantId}/reviews".format(
+        "restaurants/{restaurantId}/reviews".format(
             restaurantId="restaurant_id_example"
         ),
         headers=headers,
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 200
+    reviews: List[Dict] = response.json()["reviews"]
+    assert [review["id"] for review in reviews] == ["newer", "older"]
+    assert reviews[0]["user"]["username"] == "theUser"
+    assert reviews[0]["restaurant"]["name"] == "Joe's Pizza Broadway"
+
+    path: str = "restaurants/restaurant_id_example/reviews"
+    etag: str = response.headers["ETag"]
+    response = client.request("GET", path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.request(
+        "GET", path, params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+    # the reviews embed their author, so a profile edit changes the page
+    asyncio.run(user_repository.update_user("theUser", [DbUser.first_name.set("Jo")]))
+    response = client.request("GET", path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["reviews"][0]["user"]["firstName"] == "Jo"
+
+
+@mock_dynamodb
+def test_get_restaurants_uses_geo_cache():
+    """Requests landing in an already searched cell should not call Google again"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    with patch("httpx.AsyncClient.get", return_value=NEARBY_SEARCH_RESPONSE) as get:
+        for latitude, longitude, radius in [
+            (40.7546795, -73.9870291, 25),
+            (40.7547, -73.9871, 100),  # same cell, same radius bucket
+            (40.7484, -73.9857, 50),  # ~700m away, restaurant out of range
+        ]:
+            response = client.request(
+                "GET",
+                "restaurants",
+                params={"latitude": latitude, "longitude": longitude, "radius": radius},
+            )
+            assert response.status_code == 200
+
+        restaurants: List[Dict] = response.json()["restaurants"]
+
+    assert get.call_count == 2
+    assert restaurants == []
+
+
+@mock_dynamodb
+def test_get_restaurants_caps_the_search_radius():
+    """Widening the top bucket to cover the cell must stay within what Google takes"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    with patch("httpx.AsyncClient.get", return_value=NEARBY_SEARCH_RESPONSE) as get:
+        response = client.request(
+            "GET",
+            "restaurants",
+            params={"latitude": 40.7546795, "longitude": -73.9870291, "radius": 50000},
+        )
+
+    assert response.status_code == 200
+    assert get.call_args.kwargs["params"]["radius"] == (
+        restaurant_search.MAX_SEARCH_RADIUS
+    )
+
+
+@mock_dynamodb
+def test_get_restaurants_does_not_cache_google_errors():
+    """Quota and key errors come back as HTTP 200 and must not be cached as empty"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    params: Dict = {"latitude": 40.7546795, "longitude": -73.9870291, "radius": 25}
+    over_limit: Response = Response(
+        200,
+        json={"results": [], "status": "OVER_QUERY_LIMIT", "error_message": "quota"},
+    )
+
+    with patch("httpx.AsyncClient.get", return_value=over_limit) as get:
+        response = client.request("GET", "restaurants", params=params)
+        assert response.status_code == 500
+        assert "OVER_QUERY_LIMIT" in response.json()["detail"]
+        response = client.request("GET", "restaurants", params=params)
+        assert response.status_code == 500
+    assert get.call_count == 2
+
+    with patch("httpx.AsyncClient.get", return_value=NEARBY_SEARCH_RESPONSE):
+        response = client.request("GET", "restaurants", params=params)
+    assert response.status_code == 200
+    assert len(response.json()["restaurants"]) == 1
+
+
+def test_get_restaurants_requires_location():
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    response = client.request("GET", "restaurants", params={"radius": 25})
+
+    assert response.status_code == 400
+
+
+@mock_dynamodb
+def test_get_review_by_restaurant_pages_with_cursor():
+    """Pages should follow each other through nextCursor until it is absent"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    DbUser("theUser", id="1").save()
+    DbRestaurant("restaurant_id_example").save()
+    for day in range(1, 6):
+        DbReview(
+            f"review{day}",
+            created_at=f"2022-12-0{day} 10:00:00",
+            username="theUser",
+            restaurantId="restaurant_id_example",
+        ).save()
+
+    review_ids: List[str] = []
+    params: Dict = {"limit": 2}
+    while True:
+        response = client.request(
+            "GET", "restaurants/restaurant_id_example/reviews", params=params
+        )
+        assert response.status_code == 200
+        assert len(response.json()["reviews"]) <= 2
+        review_ids += [review["id"] for review in response.json()["reviews"]]
+        if response.json()["nextCursor"] is None:
+            break
+        params["cursor"] = response.json()["nextCursor"]
+
+    assert review_ids == ["review5", "review4", "review3", "review2", "review1"]
+
+    # cursors are only valid for the listing that issued them
+    response = client.request(
+        "GET",
+        "users/theUser/reviews",
+        params={"cursor": params["cursor"]},
+    )
+    assert response.status_code == 400
+
+
+@mock_dynamodb
+def test_get_restaurants_uses_stored_restaurants():
+    """Stored restaurants are merged into Google results, or replace them if enough"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    stored: DbRestaurant = DbRestaurant(
+        "stored_restaurant",
+        name="Stored Pizza",
+        latitude=40.7550,
+        longitude=-73.9870,
+        address="1 Stored St",
+    )
+    set_geohash(stored)
+    stored.save()
+    params: Dict = {"latitude": 40.7546795, "longitude": -73.9870291, "radius": 100}
+
+    with patch("httpx.AsyncClient.get", return_value=NEARBY_SEARCH_RESPONSE) as get:
+        response = client.request("GET", "restaurants", params=params)
+        assert get.call_count == 1
+    assert [restaurant["id"] for restaurant in response.json()["restaurants"]] == [
+        "ChIJifIePKtZwokRVZ-UdRGkZzs",
+        "stored_restaurant",
+    ]
+
+    restaurant_search.cache.clear()
+    with patch("httpx.AsyncClient.get", return_value=NEARBY_SEARCH_RESPONSE) as get:
+        with patch.object(restaurant_search, "LOCAL_RESULTS_THRESHOLD", 1):
+            response = client.request("GET", "restaurants", params=params)
+        assert get.call_count == 0
+    assert [restaurant["id"] for restaurant in response.json()["restaurants"]] == [
+        "stored_restaurant"
+    ]
+
+
+@mock_dynamodb
+def test_batch_get_restaurants():
+    """Stored restaurants come back in request order; unknown ids are skipped"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    for restaurant_id in ["first", "second"]:
+        DbRestaurant(
+            restaurant_id,
+            name=restaurant_id.title(),
+            latitude=40.7550,
+            longitude=-73.9870,
+            address="1 Stored St",
+        ).save()
+
+    response = client.request(
+        "POST",
+        "./restaurants:batchGet",
+        json={"keys": ["second", "unknown", "first", "second"]},
+    )
+
+    assert response.status_code == 200
+    assert [restaurant["name"] for restaurant in response.json()["restaurants"]] == [
+        "Second",
+        "First",
+    ]
+
+
+@mock_dynamodb
+def test_get_restaurant_by_id():
+    """Aggregates come from the restaurant item alone"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbRestaurant(
+        "restaurant_id_example",
+        name="Joe's Pizza Broadway",
+        review_count=4,
+        rating_sum=14,
+        rating_2=1,
+        rating_4=2,
+        rating_5=1,
+        starred_count=3,
+    ).save()
+
+    response = client.request("GET", "restaurants/restaurant_id_example")
+
+    assert response.status_code == 200
+    assert response.json()["reviewCount"] == 4
+    assert response.json()["averageRating"] == 3.5
+    assert response.json()["ratingHistogram"] == [0, 1, 0, 2, 1]
+    assert response.json()["starredCount"] == 3
+
+    response = client.request("GET", "restaurants/missing")
+    assert response.status_code == 404
+
+
+@mock_dynamodb
+def test_get_top_foods():
+    """Favorite foods from reviews are summarized on the restaurant item"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbRestaurant("restaurant_id_example", name="Joe's Pizza Broadway").save()
+    foods: List[str] = ["Pizza", "pizza ", "garlic knots", "pizza", "calzone"]
+    stale: DbRestaurant = DbRestaurant.get("restaurant_id_example")
+
+    asyncio.run(
+        top_foods.record(
+            [
+                DbReview(
+                    str(i), restaurantId="restaurant_id_example", favorite_food=food
+                )
+                for i, food in enumerate(foods)
+            ]
+        )
+    )
+    # a summary read before that write must not overwrite it
+    assert not asyncio.run(restaurant_repository.update_top_foods(stale, []))
+
+    response = client.request(
+        "GET", "restaurants/restaurant_id_example/top-foods", params={"limit": 2}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "topFoods": [
+            {"name": "pizza", "count": 3, "minCount": 3},
+            {"name": "calzone", "count": 1, "minCount": 1},
+        ]
+    }
+    response = client.request("GET", "restaurants/missing/top-foods")
+    assert response.status_code == 404
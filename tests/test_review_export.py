@@ -0,0 +1,96 @@
+# coding: utf-8
+
+import itertools
+import json
+import threading
+from pathlib import Path
+from typing import Iterator, List
+from unittest.mock import MagicMock, patch
+
+import pytest
+from moto import mock_dynamodb
+
+from openapi_server import export_reviews
+from openapi_server.orms.review import DbReview
+from openapi_server.services import review_export
+
+
+def fake_segment(segment: int, total_segments: int, page_size: int) -> List[DbReview]:
+    return [DbReview(f"{segment}-{i}") for i in range(5)]
+
+
+@patch.object(review_export, "EXPORT_PAGE_SIZE", 2)
+@patch.object(review_export.review_repository, "scan_reviews", fake_segment)
+def test_export_lines_merges_segments():
+    chunks: List[bytes] = list(review_export.export_lines(segments=3))
+
+    assert len(chunks) == 9  # pages of 2, 2 and 1 from each segment
+    ids: List[str] = [
+        json.loads(line)["id"] for chunk in chunks for line in chunk.splitlines()
+    ]
+    assert sorted(ids) == sorted(f"{s}-{i}" for s in range(3) for i in range(5))
+
+
+@mock_dynamodb
+def test_export_lines_includes_photo_variants():
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbReview(
+        "1",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+        photo_url="https://photos.example/original",
+        photo_variants={"thumb": "https://photos.example/thumb.jpg"},
+    ).save()
+    DbReview(
+        "2",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-02 00:00:00",
+    ).save()
+
+    lines: List[bytes] = b"".join(
+        review_export.export_lines(username="theUser")
+    ).splitlines()
+
+    exported = {item["id"]: item for item in map(json.loads, lines)}
+    assert exported["1"]["photo_variants"] == {
+        "thumb": "https://photos.example/thumb.jpg"
+    }
+    assert "photo_variants" not in exported["2"]
+
+
+def test_iter_pages_raises_worker_errors():
+    def failing() -> Iterator[DbReview]:
+        yield DbReview("1")
+        raise RuntimeError("scan failed")
+
+    with pytest.raises(RuntimeError, match="scan failed"):
+        list(review_export.iter_pages([failing]))
+
+
+@patch.object(review_export, "EXPORT_QUEUE_PAGES", 1)
+@patch.object(review_export, "EXPORT_PAGE_SIZE", 1)
+def test_iter_pages_applies_backpressure():
+    """Workers wait for the consumer and stop once it goes away"""
+    read: itertools.count = itertools.count()
+
+    def endless() -> Iterator[DbReview]:
+        while True:
+            yield DbReview(str(next(read)))
+
+    pages: Iterator[List[DbReview]] = review_export.iter_pages([endless])
+    next(pages)
+    pages.close()
+
+    assert next(read) <= 4  # one consumed, one queued, one waiting for room
+    assert not any(t.name.startswith("review-export") for t in threading.enumerate())
+
+
+@patch.object(review_export, "export_lines", return_value=iter([b"{}\n", b"{}\n"]))
+def test_cli_writes_output(mock_export: MagicMock, tmp_path: Path):
+    output: Path = tmp_path / "reviews.ndjson"
+    export_reviews.main(["--username", "theUser", "--output", str(output)])
+
+    mock_export.assert_called_once_with("theUser", None, review_export.EXPORT_SEGMENTS)
+    assert output.read_bytes() == b"{}\n{}\n"
@@ -0,0 +1,49 @@
+# coding: utf-8
+
+import asyncio
+from typing import List
+from unittest.mock import patch
+
+from moto import mock_dynamodb
+
+from openapi_server.models.review import Review
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbUser
+from openapi_server.repositories import batch
+from openapi_server.services.review_service import hydrate_reviews
+
+
+@mock_dynamodb
+def test_hydrate_reviews_batches_lookups():
+    """50 reviews should cost one BatchGetItem per table, not a get per review"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    for i in range(5):
+        DbUser(f"user{i}", id=str(i)).save()
+    for i in range(3):
+        DbRestaurant(f"restaurant{i}", name=f"Restaurant {i}").save()
+    reviews: List[DbReview] = [
+        DbReview(
+            str(i),
+            username=f"user{i % 6}",  # user5 does not exist
+            restaurantId=f"restaurant{i % 3}",
+            rating=5,
+            favorite_food="pizza",
+            starred=False,
+            created_at=str(i),
+            updated_at=str(i),
+        )
+        for i in range(50)
+    ]
+
+    with patch.object(
+        batch, "_batch_get_chunk", wraps=batch._batch_get_chunk
+    ) as batch_get_chunk:
+        hydrated: List[Review] = asyncio.run(hydrate_reviews(reviews))
+
+    assert batch_get_chunk.call_count == 2
+    assert [review.id for review in hydrated] == [
+        review.id for review in reviews if review.username != "user5"
+    ]
+    assert hydrated[0].restaurant.name == "Restaurant 0"
@@ -1,12 +1,14 @@
 # coding: utf-8
 
-from typing import Dict
+import asyncio
+import json
+from typing import Dict, List
 from httpx import Response
 
 from fastapi.testclient import TestClient
 
-from unittest.mock import patch
-from moto import mock_dynamodb
+from unittest.mock import MagicMock, patch
+from moto import mock_dynamodb, mock_s3
 
 from openapi_server.models.api_response import ApiResponse  # noqa: F401
 from openapi_server.models.create_review import CreateReview  # noqa: F401
@@ -14,80 +16,84 @@ from openapi_server.models.review import Review  # noqa: F401
 from openapi_server.models.update_review import UpdateReview  # noqa: F401
 from openapi_server.models.user import User
 from openapi_server.main import app
+from openapi_server.orms.photo_cleanup import DbPhotoCleanup
 from openapi_server.orms.review import DbReview
 from openapi_server.orms.user import DbUser
 from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.clients import s3 as s3_client
+from openapi_server.repositories import photo_repository
+from openapi_server.services import photo_service, photo_variants, review_export
+
+
+PLACE_DETAILS_RESPONSE: Dict = {
+    "html_attributions": [],
+    "result": {
+        "address_components": [],
+        "business_status": "OPERATIONAL",
+        "current_opening_hours": {},
+        "delivery": True,
+        "dine_in": True,
+        "editorial_summary": {
+            "language": "en",
+            "overview": "Modern outpost of a longtime counter-serve pizza joint prepping New York-style slices & pies.",
+        },
+        "formatted_address": "1435 Broadway, New York, NY 10018, USA",
+        "formatted_phone_number": "(646) 559-4878",
+        "geometry": {
+            "location": {"lat": 40.7546795, "lng": -73.9870291},
+            "viewport": {
+                "northeast": {
+                    "lat": 40.75601118029149,
+                    "lng": -73.98556926970849,
+                },
+                "southwest": {
+                    "lat": 40.7533132197085,
+                    "lng": -73.9882672302915,
+                },
+            },
+        },
+        "icon": "https://maps.gstatic.com/mapfiles/place_api/icons/v1/png_71/restaurant-71.png",
+        "icon_background_color": "#FF9E67",
+        "icon_mask_base_uri": "https://maps.gstatic.com/mapfiles/place_api/icons/v2/restaurant_pinlet",
+        "international_phone_number": "+1 646-559-4878",
+        "name": "Joe's Pizza Broadway",
+        "opening_hours": {},
+        "photos": [],
+        "place_id": "ChIJifIePKtZwokRVZ-UdRGkZzs",
+        "plus_code": {},
+        "price_level": 1,
+        "rating": 4.5,
+        "reference": "ChIJifIePKtZwokRVZ-UdRGkZzs",
+        "reservable": False,
+        "reviews": [],
+        "secondary_opening_hours": [],
+        "serves_breakfast": False,
+        "serves_brunch": False,
+        "serves_dinner": True,
+        "serves_lunch": True,
+        "takeout": True,
+        "types": [
+            "meal_delivery",
+            "restaurant",
+            "food",
+            "point_of_interest",
+            "establishment",
+        ],
+        "url": "https://maps.google.com/?cid=4280570365733019477",
+        "user_ratings_total": 13623,
+        "utc_offset": -300,
+        "vicinity": "1435 Broadway, New York",
+        "website": "http://joespizzanyc.com/",
+        "wheelchair_accessible_entrance": True,
+    },
+    "status": "OK",
+}
 
 
 @mock_dynamodb
 @patch(
     "httpx.AsyncClient.get",
-    return_value=Response(
-        200,
-        json={
-            "html_attributions": [],
-            "result": {
-                "address_components": [],
-                "business_status": "OPERATIONAL",
-                "current_opening_hours": {},
-                "delivery": True,
-                "dine_in": True,
-                "editorial_summary": {
-                    "language": "en",
-                    "overview": "Modern outpost of a longtime counter-serve pizza joint prepping New York-style slices & pies.",
-                },
-                "formatted_address": "1435 Broadway, New York, NY 10018, USA",
-                "formatted_phone_number": "(646) 559-4878",
-                "geometry": {
-                    "location": {"lat": 40.7546795, "lng": -73.9870291},
-                    "viewport": {
-                        "northeast": {
-                            "lat": 40.75601118029149,
-                            "lng": -73.98556926970849,
-                        },
-                        "southwest": {
-                            "lat": 40.7533132197085,
-                            "lng": -73.9882672302915,
-                        },
-                    },
-                },
-                "icon": "https://maps.gstatic.com/mapfiles/place_api/icons/v1/png_71/restaurant-71.png",
-                "icon_background_color": "#FF9E67",
-                "icon_mask_base_uri": "https://maps.gstatic.com/mapfiles/place_api/icons/v2/restaurant_pinlet",
-                "international_phone_number": "+1 646-559-4878",
-                "name": "Joe's Pizza Broadway",
-                "opening_hours": {},
-                "photos": [],
-                "place_id": "ChIJifIePKtZwokRVZ-UdRGkZzs",
-                "plus_code": {},
-                "price_level": 1,
-                "rating": 4.5,
-                "reference": "ChIJifIePKtZwokRVZ-UdRGkZzs",
-                "reservable": False,
-                "reviews": [],
-                "secondary_opening_hours": [],
-                "serves_breakfast": False,
-                "serves_brunch": False,
-                "serves_dinner": True,
-                "serves_lunch": True,
-                "takeout": True,
-                "types": [
-                    "meal_delivery",
-                    "restaurant",
-                    "food",
-                    "point_of_interest",
-                    "establishment",
-                ],
-                "url": "https://maps.google.com/?cid=4280570365733019477",
-                "user_ratings_total": 13623,
-                "utc_offset": -300,
-                "vicinity": "1435 Broadway, New York",
-                "website": "http://joespizzanyc.com/",
-                "wheelchair_accessible_entrance": True,
-            },
-            "status": "OK",
-        },
-    ),
+    return_value=Response(200, json=PLACE_DETAILS_RESPONSE),
 )
 def test_add_review(client: TestClient):
     """Test case for add_review
@@ -133,6 +139,9 @@ def test_add_review(client: TestClient):
 
     review_id: str = response.json()["id"]
     review_record: DbReview = DbReview.get(review_id)
+    # stored with its geohash so the local restaurant index can find it
+    assert DbRestaurant.get(create_review["restaurantId"]).geohash_cell == "dr5ru"
+    assert DbRestaurant.get(create_review["restaurantId"]).review_count == 1
 
     assert response.status_code == 200
     assert response.json() == {
@@ -143,7 +152,6 @@ def test_add_review(client: TestClient):
             "firstName": test_user.first_name,
             "lastName": test_user.last_name,
             "email": test_user.email,
-            "password": test_user.password,
         },
         "restaurant": {
             "id": create_review["restaurantId"],
@@ -151,10 +159,15 @@ def test_add_review(client: TestClient):
             "latitude": 40.7546795,
             "longitude": -73.9870291,
             "address": "1435 Broadway, New York, NY 10018, USA",
+            "reviewCount": 1,
+            "averageRating": 5.0,
+            "ratingHistogram": [0, 0, 0, 0, 1],
+            "starredCount": 1,
         },
         "rating": create_review["rating"],
         "content": create_review["content"],
         "photoUrl": create_review["photoUrl"],
+        "photoVariants": None,
         "favoriteFood": create_review["favoriteFood"],
         "starred": create_review["starred"],
         "createdAt": review_record.created_at,
@@ -162,97 +175,619 @@ def test_add_review(client: TestClient):
     }
 
 
-def test_delete_image(client: TestClient):
+@mock_dynamodb
+@patch(
+    "httpx.AsyncClient.get",
+    return_value=Response(200, json=PLACE_DETAILS_RESPONSE),
+)
+def test_batch_create_and_get_reviews(mock_get: MagicMock):
+    """Test case for batch_create_reviews and batch_get_reviews"""
+
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    for username in ["theUser", "otherUser"]:
+        DbUser(
+            username,
+            id=username,
+            first_name="John",
+            last_name="James",
+            email="john@email.com",
+            password="12345",
+        ).save()
+    create_reviews: List[Dict] = [
+        {
+            "restaurantId": "ChIJifIePKtZwokRVZ-UdRGkZzs",
+            "username": username,
+            "rating": rating,
+            "favoriteFood": "pizza",
+            "starred": False,
+        }
+        for username, rating in [("theUser", 5), ("otherUser", 3), ("theUser", 4)]
+    ]
+
+    response: Response = client.request(
+        "POST", "./reviews:batchCreate", json={"reviews": create_reviews}
+    )
+
+    assert response.status_code == 200
+    created: List[Dict] = response.json()["reviews"]
+    assert [review["rating"] for review in created] == [5, 3, 4]
+    assert [review["user"]["username"] for review in created] == [
+        "theUser",
+        "otherUser",
+        "theUser",
+    ]
+    # one Place Details fetch for the shared restaurant
+    assert mock_get.call_count == 1
+    assert created[-1]["restaurant"]["reviewCount"] == 3
+    assert DbRestaurant.get("ChIJifIePKtZwokRVZ-UdRGkZzs").rating_sum == 12
+
+    review_ids: List[str] = [review["id"] for review in created]
+    response = client.request(
+        "POST",
+        "./reviews:batchGet",
+        json={"keys": [review_ids[2], "missing", review_ids[0]]},
+    )
+
+    assert response.status_code == 200
+    assert [review["id"] for review in response.json()["reviews"]] == [
+        review_ids[2],
+        review_ids[0],
+    ]
+    assert response.json()["reviews"][0]["restaurant"]["name"] == (
+        "Joe's Pizza Broadway"
+    )
+
+    # every author must exist before anything is written
+    response = client.request(
+        "POST",
+        "./reviews:batchCreate",
+        json={"reviews": [{**create_reviews[0], "username": "nobody"}]},
+    )
+    assert response.status_code == 404
+    assert DbReview.count() == 3
+
+    response = client.request(
+        "POST", "./reviews:batchGet", json={"keys": [str(i) for i in range(1001)]}
+    )
+    assert response.status_code == 400
+
+
+@mock_dynamodb
+@patch.object(review_export, "EXPORT_PAGE_SIZE", 2)
+@patch.object(review_export, "EXPORT_SEGMENTS", 1)  # moto ignores Scan segments
+def test_export_reviews():
+    """Test case for export_reviews
+
+    Export reviews as NDJSON
+    """
+
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    for i in range(5):
+        DbReview(
+            str(i),
+            username=f"user{i % 2}",
+            restaurantId=f"restaurant{i % 3}",
+            rating=i + 1,
+            created_at=f"2022-12-0{i + 1} 00:00:00",
+        ).save()
+
+    def export(params: Dict) -> List[Dict]:
+        response: Response = client.request("GET", "./reviews:export", params=params)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    rows: List[Dict] = export({})
+    assert sorted(row["id"] for row in rows) == ["0", "1", "2", "3", "4"]
+    assert rows[0]["rating"] == int(rows[0]["id"]) + 1
+
+    assert sorted(row["id"] for row in export({"username": "user0"})) == [
+        "0",
+        "2",
+        "4",
+    ]
+    assert sorted(row["id"] for row in export({"restaurantId": "restaurant1"})) == [
+        "1",
+        "4",
+    ]
+    assert [
+        row["id"]
+        for row in export({"username": "user0", "restaurantId": "restaurant1"})
+    ] == ["4"]
+
+
+@mock_dynamodb
+def test_delete_image():
     """Test case for delete_image
 
     deletes an image
     """
-
-    headers = {}
-    response = client.request(
-        "DELETE",
-        "/reviews/{reviewId}/image".format(reviewId="review_id_example"),
-        headers=headers,
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
     )
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+        photo_url=photo_repository.photo_url("reviews/review_id_example/a/original"),
+        photo_variants={
+            "thumb": photo_repository.photo_url("reviews/review_id_example/a/thumb.jpg")
+        },
+    ).save()
+
+    response: Response = client.request("DELETE", "reviews/review_id_example/image")
+
+    assert response.status_code == 204
+    review: DbReview = DbReview.get("review_id_example")
+    assert (review.photo_url, review.photo_variants) == (None, None)
+    # S3 is left to the cleanup worker
+    assert sorted(item.key for item in DbPhotoCleanup.scan()) == [
+        "reviews/review_id_example/a/original",
+        "reviews/review_id_example/a/thumb.jpg",
+    ]
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    response = client.request("DELETE", "reviews/review_id_example/image")
+    assert response.status_code == 404
+    response = client.request("DELETE", "reviews/no_such_review/image")
+    assert response.status_code == 404
 
 
+@mock_dynamodb
 def test_delete_review(client: TestClient):
     """Test case for delete_review
 
     Deletes a review
     """
 
-    headers = {}
-    response = client.request(
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbRestaurant(
+        "restaurant_id_example", review_count=1, rating_sum=4, rating_4=1
+    ).save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        rating=4,
+        created_at="2022-12-01 00:00:00",
+        updated_at="2022-12-01 00:00:00",
+        photo_url=photo_repository.photo_url("reviews/review_id_example/a/original"),
+        counted=True,
+    ).save()
+
+    headers: Dict = {}
+    response: Response = client.request(
         "DELETE",
-        "/reviews/{reviewId}".format(reviewId="review_id_example"),
+        "reviews/{reviewId}".format(reviewId="review_id_example"),
         headers=headers,
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 204
+    assert DbReview.count() == 0
+    restaurant: DbRestaurant = DbRestaurant.get("restaurant_id_example")
+    assert (restaurant.review_count, restaurant.rating_sum, restaurant.rating_4) == (
+        0,
+        0,
+        0,
+    )
+    assert restaurant.version == 1  # bumped with the aggregates
+    assert [item.key for item in DbPhotoCleanup.scan()] == [
+        "reviews/review_id_example/a/original"
+    ]
+
+    response = client.request(
+        "DELETE",
+        "reviews/{reviewId}".format(reviewId="review_id_example"),
+        headers=headers,
+    )
+    assert response.status_code == 404
 
 
+@mock_dynamodb
 def test_get_review_by_id(client: TestClient):
     """Test case for get_review_by_id
 
     Find review by ID
     """
 
-    headers = {}
-    response = client.request(
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", id="1", first_name="John").save()
+    DbRestaurant("ChIJifIePKtZwokRVZ-UdRGkZzs", name="Joe's Pizza Broadway").save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="ChIJifIePKtZwokRVZ-UdRGkZzs",
+        rating=5,
+        favorite_food="pizza",
+        starred=True,
+        created_at="2022-12-01 00:00:00",
+        updated_at="2022-12-01 00:00:00",
+    ).save()
+
+    headers: Dict = {}
+    response: Response = client.request(
         "GET",
-        "/reviews/{reviewId}".format(reviewId="review_id_example"),
+        "reviews/{reviewId}".format(reviewId="review_id_example"),
         headers=headers,
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 200
+    assert response.json()["user"]["firstName"] == "John"
+    assert response.json()["restaurant"]["name"] == "Joe's Pizza Broadway"
+
+    response = client.request("GET", "reviews/missing", headers=headers)
+    assert response.status_code == 404
 
 
+@mock_dynamodb
 def test_update_reviewby_id(client: TestClient):
     """Test case for update_reviewby_id
 
     Update an existing review
     """
-    update_review = {
-        "photo_url": "www.photouploaded.com",
-        "starred": 1,
-        "favorite_food": "pizza",
+
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser").save()
+    DbRestaurant(
+        "restaurant_id_example", review_count=2, rating_sum=7, rating_3=1, rating_4=1
+    ).save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        rating=3,
+        favorite_food="pasta",
+        starred=False,
+        content="Fine",
+        created_at="2022-12-01 00:00:00",
+        updated_at="2022-12-01 00:00:00",
+        counted=True,
+    ).save()
+    update_review: Dict = {
+        "photoUrl": "www.photouploaded.com",
+        "starred": True,
+        "favoriteFood": "pizza",
         "rating": 5,
-        "content": "Awesome",
     }
 
-    headers = {}
-    response = client.request(
+    headers: Dict = {}
+    response: Response = client.request(
         "PUT",
-        "/reviews/{reviewId}".format(reviewId="review_id_example"),
+        "reviews/{reviewId}".format(reviewId="review_id_example"),
         headers=headers,
         json=update_review,
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 200
+    assert response.json()["rating"] == 5
+    assert response.json()["content"] == "Fine"  # not sent, so unchanged
+    assert response.json()["restaurant"]["averageRating"] == 4.5
+    assert response.json()["restaurant"]["ratingHistogram"] == [0, 0, 0, 1, 1]
+    assert response.json()["restaurant"]["starredCount"] == 1
+    assert DbReview.get("review_id_example").favorite_food == "pizza"
+
+    response = client.request(
+        "PUT",
+        "reviews/{reviewId}".format(reviewId="missing"),
+        headers=headers,
+        json=update_review,
+    )
+    assert response.status_code == 404
 
 
-def test_upload_image(client: TestClient):
+@mock_dynamodb
+@mock_s3
+@patch.object(photo_variants, "generate")
+def test_upload_image(mock_generate: MagicMock):
     """Test case for upload_image
 
     uploads an image
     """
-    body = "/path/to/file"
-    params = [("additional_metadata", "additional_metadata_example")]
-    headers = {}
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    asyncio.run(photo_repository.create_bucket())
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", id="1").save()
+    DbRestaurant("restaurant_id_example").save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+    ).save()
+    s3 = s3_client.get_client()
+
+    def stored(photo_url: str) -> Dict:
+        key: str = photo_url.split(f"/{s3_client.photo_bucket()}/", 1)[1]
+        return s3.get_object(Bucket=s3_client.photo_bucket(), Key=key)
+
+    response: Response = client.request(
+        "POST",
+        "reviews/review_id_example/image",
+        headers={"Content-Type": "image/jpeg"},
+        content=b"small photo",
+    )
+    assert response.status_code == 200
+    photo_url: str = response.json()["photoUrl"]
+    assert DbReview.get("review_id_example").photo_url == photo_url
+    mock_generate.assert_called_once_with(
+        "review_id_example", photo_url.split(f"/{s3_client.photo_bucket()}/", 1)[1]
+    )
+    assert stored(photo_url)["Body"].read() == b"small photo"
+
+    # larger photos are streamed to S3 part by part
+    chunk: bytes = b"x" * (1024 * 1024)
+    with patch.object(photo_service, "PART_SIZE", 5 * 1024 * 1024):
+        response = client.request(
+            "POST",
+            "reviews/review_id_example/image",
+            headers={"Content-Type": "image/jpeg"},
+            content=(chunk for _ in range(11)),
+        )
+    assert response.status_code == 200
+    large: Dict = stored(response.json()["photoUrl"])
+    assert large["ContentLength"] == 11 * len(chunk)
+    assert large["ETag"].endswith('-3"')  # three parts
+    # the replaced photo waits for the cleanup worker
+    assert [item.key for item in DbPhotoCleanup.scan()] == [
+        photo_repository.key_for_url(photo_url)
+    ]
+
+    # too large after the first part went up: the multipart upload is aborted
+    with patch.object(photo_service, "PART_SIZE", 5 * 1024 * 1024), patch.object(
+        photo_service, "MAX_PHOTO_BYTES", 7 * len(chunk)
+    ):
+        response = client.request(
+            "POST",
+            "reviews/review_id_example/image",
+            headers={"Content-Type": "image/jpeg"},
+            content=(chunk for _ in range(8)),
+        )
+    assert response.status_code == 413
+
     response = client.request(
         "POST",
-        "/reviews/{reviewId}/image".format(reviewId="review_id_example"),
-        headers=headers,
-        json=body,
-        params=params,
+        "reviews/review_id_example/image",
+        headers={"Content-Type": "text/plain"},
+        content=b"not a photo",
+    )
+    assert response.status_code == 415
+    response = client.request(
+        "POST",
+        "reviews/no_such_review/image",
+        headers={"Content-Type": "image/jpeg"},
+        content=b"small photo",
+    )
+    assert response.status_code == 404
+    assert s3.list_objects_v2(Bucket=s3_client.photo_bucket())["KeyCount"] == 2
+    assert (
+        s3.list_multipart_uploads(Bucket=s3_client.photo_bucket()).get("Uploads", [])
+        == []
+    )
+
+
+@mock_dynamodb
+@mock_s3
+@patch.object(photo_variants, "generate")
+def test_presigned_image_upload(mock_generate: MagicMock):
+    """Test case for presign_image and confirm_image"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    asyncio.run(photo_repository.create_bucket())
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", id="1").save()
+    DbRestaurant("restaurant_id_example").save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+    ).save()
+
+    response: Response = client.request(
+        "POST",
+        "reviews/review_id_example/image:presign",
+        params={"contentType": "image/png"},
+    )
+    assert response.status_code == 200
+    presigned: Dict = response.json()
+    assert presigned["key"].startswith("reviews/review_id_example/")
+    assert presigned["fields"]["key"] == presigned["key"]
+    assert presigned["fields"]["Content-Type"] == "image/png"
+    assert presigned["expiresIn"] == photo_service.PRESIGN_EXPIRES_SECONDS
+
+    confirm: Dict = {"key": presigned["key"]}
+    response = client.request(
+        "POST", "reviews/review_id_example/image:confirm", json=confirm
+    )
+    assert response.status_code == 400  # not uploaded yet
+
+    # stands in for the client's POST to S3
+    s3_client.get_client().put_object(
+        Bucket=s3_client.photo_bucket(), Key=presigned["key"], Body=b"photo"
+    )
+    response = client.request(
+        "POST", "reviews/review_id_example/image:confirm", json=confirm
+    )
+    assert response.status_code == 200
+    assert response.json()["photoUrl"] == photo_repository.photo_url(presigned["key"])
+    mock_generate.assert_called_once_with("review_id_example", presigned["key"])
+
+    response = client.request(
+        "POST",
+        "reviews/review_id_example/image:confirm",
+        json={"key": "reviews/another_review/abc/original"},
+    )
+    assert response.status_code == 400
+
+
+@mock_dynamodb
+@mock_s3
+@patch.object(photo_variants, "generate")
+def test_confirm_image_retried(mock_generate: MagicMock):
+    """Confirming the photo a review already has must not queue it for deletion"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    asyncio.run(photo_repository.create_bucket())
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", id="1").save()
+    DbRestaurant("restaurant_id_example").save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+    ).save()
+    key: str = photo_service.new_photo_key("review_id_example")
+    s3_client.get_client().put_object(
+        Bucket=s3_client.photo_bucket(), Key=key, Body=b"photo"
+    )
+
+    for _ in range(2):
+        response: Response = client.request(
+            "POST", "reviews/review_id_example/image:confirm", json={"key": key}
+        )
+        assert response.status_code == 200
+        assert response.json()["photoUrl"] == photo_repository.photo_url(key)
+
+    assert DbReview.get("review_id_example").photo_url == photo_repository.photo_url(
+        key
+    )
+    assert list(DbPhotoCleanup.scan()) == []
+    mock_generate.assert_called_once_with("review_id_example", key)
+
+
+@mock_dynamodb
+@mock_s3
+@patch.object(photo_variants, "generate")
+def test_confirm_image_reattached(mock_generate: MagicMock):
+    """A photo confirmed again after being replaced must be taken off the queue"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbPhotoCleanup.create_table(
+        read_capacity_units=1, write_capacity_units=1, wait=True
+    )
+    asyncio.run(photo_repository.create_bucket())
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", id="1").save()
+    DbRestaurant("restaurant_id_example").save()
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+    ).save()
+    first: str = photo_service.new_photo_key("review_id_example")
+    second: str = photo_service.new_photo_key("review_id_example")
+    for key in (first, second):
+        s3_client.get_client().put_object(
+            Bucket=s3_client.photo_bucket(), Key=key, Body=b"photo"
+        )
+
+    for key in (first, second, first):
+        response: Response = client.request(
+            "POST", "reviews/review_id_example/image:confirm", json={"key": key}
+        )
+        assert response.status_code == 200
+
+    assert DbReview.get("review_id_example").photo_url == photo_repository.photo_url(
+        first
     )
+    assert [item.key for item in DbPhotoCleanup.scan()] == [second]
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+
+@mock_dynamodb
+def test_photo_url_into_bucket_is_refused(client: TestClient):
+    """Photos in the bucket are only attached through the image endpoints"""
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", id="1").save()
+    DbRestaurant("restaurant_id_example").save()
+    own: str = photo_repository.photo_url("reviews/review_id_example/a/original")
+    DbReview(
+        "review_id_example",
+        username="theUser",
+        restaurantId="restaurant_id_example",
+        created_at="2022-12-01 00:00:00",
+        updated_at="2022-12-01 00:00:00",
+        photo_url=own,
+        counted=True,
+    ).save()
+    # another review's photo
+    other: str = photo_repository.photo_url("reviews/other_review/b/original")
+
+    response: Response = client.request(
+        "POST",
+        "reviews",
+        json={
+            "photoUrl": other,
+            "rating": 5,
+            "favoriteFood": "pizza",
+            "starred": False,
+            "restaurantId": "restaurant_id_example",
+            "username": "theUser",
+        },
+    )
+    assert response.status_code == 400
+    response = client.request(
+        "POST",
+        "./reviews:batchCreate",
+        json={
+            "reviews": [
+                {
+                    "photoUrl": other,
+                    "rating": 5,
+                    "favoriteFood": "pizza",
+                    "starred": False,
+                    "restaurantId": "restaurant_id_example",
+                    "username": "theUser",
+                }
+            ]
+        },
+    )
+    assert response.status_code == 400
+    response = client.request(
+        "PUT", "reviews/review_id_example", json={"photoUrl": other}
+    )
+    assert response.status_code == 400
+    assert DbReview.get("review_id_example").photo_url == own
+
+    # sending the review's own photo back is no change
+    response = client.request(
+        "PUT", "reviews/review_id_example", json={"photoUrl": own, "rating": 4}
+    )
+    assert response.status_code == 200
+    assert response.json()["photoUrl"] == own
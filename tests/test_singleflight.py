@@ -0,0 +1,82 @@
+# coding: utf-8
+
+import asyncio
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+from moto import mock_dynamodb
+
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.repositories import restaurant_repository
+from openapi_server.services import restaurant_service
+from openapi_server.singleflight import SingleFlight
+
+PLACE_ID: str = "ChIJifIePKtZwokRVZ-UdRGkZzs"
+
+
+async def fake_place_details(place_id: str) -> Dict[str, Any]:
+    await asyncio.sleep(0.05)  # keep the fetch in flight while the others arrive
+    return {
+        "result": {
+            "place_id": place_id,
+            "name": "Joe's Pizza Broadway",
+            "geometry": {"location": {"lat": 40.7546795, "lng": -73.9870291}},
+            "formatted_address": "1435 Broadway, New York, NY 10018, USA",
+        }
+    }
+
+
+def test_single_flight_shares_one_call():
+    calls: List[str] = []
+    flight: SingleFlight[str] = SingleFlight()
+
+    async def fetch() -> str:
+        calls.append("fetch")
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run() -> List[str]:
+        return await asyncio.gather(*[flight.do("key", fetch) for _ in range(10)])
+
+    assert asyncio.run(run()) == ["result"] * 10
+    assert calls == ["fetch"]
+    assert len(flight) == 0
+
+
+@mock_dynamodb
+def test_get_or_create_restaurant_fetches_once():
+    """Concurrent reviews of an unknown place should fetch and write it once"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+
+    async def run() -> List[DbRestaurant]:
+        return await asyncio.gather(
+            *[restaurant_service.get_or_create_restaurant(PLACE_ID) for _ in range(10)]
+        )
+
+    with patch(
+        "openapi_server.clients.google_maps.place_details",
+        side_effect=fake_place_details,
+    ) as place_details, patch.object(
+        restaurant_repository,
+        "save_restaurant",
+        wraps=restaurant_repository.save_restaurant,
+    ) as save_restaurant:
+        restaurants: List[DbRestaurant] = asyncio.run(run())
+
+    assert place_details.call_count == 1
+    assert save_restaurant.call_count == 1
+    assert {restaurant.id for restaurant in restaurants} == {PLACE_ID}
+
+
+@mock_dynamodb
+def test_create_restaurant_keeps_first_write():
+    """A worker losing the conditional put should get the winner's item back"""
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant(PLACE_ID, name="first").save()
+
+    restaurant: DbRestaurant = asyncio.run(
+        restaurant_repository.create_restaurant(DbRestaurant(PLACE_ID, name="second"))
+    )
+
+    assert restaurant.name == "first"
+    assert DbRestaurant.get(PLACE_ID).name == "first"
@@ -0,0 +1,32 @@
+# coding: utf-8
+
+from collections import Counter
+from random import Random
+from typing import List
+
+from openapi_server.space_saving import SpaceSaving
+
+
+def test_space_saving_counts_exactly_under_capacity():
+    summary: SpaceSaving = SpaceSaving(capacity=3)
+    for item in ["pizza", "sushi", "pizza", "ramen", "pizza", "sushi"]:
+        summary.add(item)
+
+    assert summary.top(2) == [("pizza", 3, 0), ("sushi", 2, 0)]
+
+
+def test_space_saving_keeps_heavy_hitters_in_bounded_space():
+    """Items above total / capacity must survive with bounded overestimates"""
+    random: Random = Random(7)
+    stream: List[str] = ["pizza"] * 300 + ["sushi"] * 200 + ["ramen"] * 150
+    stream += [f"dish{random.randrange(500)}" for _ in range(350)]
+    random.shuffle(stream)
+    summary: SpaceSaving = SpaceSaving(capacity=10)
+    for item in stream:
+        summary.add(item)
+
+    exact: Counter = Counter(stream)
+    assert len(summary.counters) == 10
+    assert [item for item, _, _ in summary.top(3)] == ["pizza", "sushi", "ramen"]
+    for item, count, error in summary.top(10):
+        assert count - error <= exact[item] <= count
@@ -0,0 +1,37 @@
+# coding: utf-8
+
+from typing import List
+
+from openapi_server.geo import geohash_encode, haversine
+from openapi_server.ttl_cache import TTLCache
+
+
+def test_ttl_cache_expires_entries():
+    now: List[float] = [0.0]
+    cache: TTLCache[str] = TTLCache(maxsize=10, ttl=5, timer=lambda: now[0])
+
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    now[0] = 5.0
+    assert cache.get("key") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache: TTLCache[int] = TTLCache(maxsize=2, ttl=60)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_geohash_encode():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert round(haversine(40.7546795, -73.9870291, 40.7484, -73.9857)) == 707
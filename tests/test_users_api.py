@@ -5,6 +5,8 @@ from typing import Dict, List, Union, Tuple
 
 from fastapi.testclient import TestClient
 
+from unittest.mock import patch
+
 from moto import mock_dynamodb
 
 from openapi_server.models.create_user import CreateUser  # noqa: F401
@@ -15,8 +17,16 @@ from openapi_server.models.login_payload import LoginPayload  # noqa: F401
 from openapi_server.models.login_user import LoginUser  # noqa: F401
 from openapi_server.models.update_user import UpdateUser  # noqa: F401
 from openapi_server.models.user import User  # noqa: F401
+from openapi_server import passwords
 from openapi_server.main import app
-from openapi_server.orms.user import DbUser
+from openapi_server.orms.feed import DbFeedItem
+from openapi_server.orms.friend import DbFriend
+from openapi_server.orms.restaurant import DbRestaurant
+from openapi_server.orms.review import DbReview
+from openapi_server.orms.user import DbFavoriteFood, DbUser
+from openapi_server.repositories import user_repository
+from openapi_server.repositories.transaction import transact_write
+from openapi_server.services import password_service
 
 
 @mock_dynamodb
@@ -53,8 +63,12 @@ def test_create_user(client: TestClient):
         "firstName": create_user["firstName"],
         "lastName": create_user["lastName"],
         "email": create_user["email"],
-        "password": create_user["password"],
     }
+    # only a hash of the password is stored
+    assert user_record.password.startswith("scrypt$")
+    assert passwords.verify_password(
+        create_user["password"], user_record.password, password_service.PARAMS
+    ) == (True, None)
 
     # create user with same values
     response = client.request(
@@ -66,21 +80,35 @@ def test_create_user(client: TestClient):
     assert response.status_code == 409
 
 
+@mock_dynamodb
 def test_delete_friends(client: TestClient):
     """Test case for delete_friends
 
     Remove all connections to friends of a user
     """
 
-    headers = {}
-    response = client.request(
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFriend.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser").save()
+    for friend_username in ["friend1", "friend2"]:
+        DbFriend("theUser", friend_username).save()
+        DbFriend(friend_username, "theUser").save()
+    DbFriend("friend1", "friend2").save()
+
+    headers: Dict = {}
+    response: httpx.Response = client.request(
         "DELETE",
-        "/users/{username}/friends".format(username="username_example"),
+        "users/{username}/friends".format(username="theUser"),
         headers=headers,
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 200
+    assert response.json()["friends"] == []
+    # edges between other users are left alone
+    assert [
+        (friend.username, friend.friend_username) for friend in DbFriend.scan()
+    ] == [("friend1", "friend2")]
 
 
 @mock_dynamodb
@@ -93,6 +121,9 @@ def test_delete_user(client: TestClient):
     DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
     client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
     test_create_user(client)  # using above test to create a user w/ username="theUser"
+    DbFriend.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFeedItem.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFeedItem("theUser", "1#review", review_id="review", author="pal").save()
 
     headers: Dict = {}
     response: httpx.Response = client.request(
@@ -101,6 +132,7 @@ def test_delete_user(client: TestClient):
         headers=headers,
     )
     assert response.status_code == 204
+    assert DbFeedItem.count("theUser") == 0
 
     # trying to delete already deleted record
     response = client.request(
@@ -131,6 +163,7 @@ def test_get_favorite_foods(client: TestClient):
     assert response.status_code == 200
     assert response.json() == {
         "favoriteFoods": [],
+        "nextCursor": None,
     }
 
     response = client.request(
@@ -141,38 +174,96 @@ def test_get_favorite_foods(client: TestClient):
     assert response.status_code == 404
 
 
+@mock_dynamodb
 def test_get_friends(client: TestClient):
     """Test case for get_friends
 
     Get friends of a user
     """
 
-    headers = {}
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFriend.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser").save()
+    for i in range(3):
+        DbUser(f"friend{i}", first_name=f"Friend {i}").save()
+        DbFriend("theUser", f"friend{i}").save()
+
+    headers: Dict = {}
+    response: httpx.Response = client.request(
+        "GET",
+        "users/{username}/friends".format(username="theUser"),
+        headers=headers,
+        params={"limit": 2},
+    )
+
+    assert response.status_code == 200
+    assert [friend["username"] for friend in response.json()["friends"]] == [
+        "friend0",
+        "friend1",
+    ]
     response = client.request(
         "GET",
-        "/users/{username}/friends".format(username="username_example"),
+        "users/{username}/friends".format(username="theUser"),
         headers=headers,
+        params={"limit": 2, "cursor": response.json()["nextCursor"]},
     )
+    assert [friend["firstName"] for friend in response.json()["friends"]] == [
+        "Friend 2"
+    ]
+    assert response.json()["nextCursor"] is None
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    response = client.request("GET", "users/nobody/friends", headers=headers)
+    assert response.status_code == 404
 
 
+@mock_dynamodb
 def test_get_reviews_by_username(client: TestClient):
     """Test case for get_reviews_by_username
 
     Get reviews by user name
     """
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    test_create_user(client)
+    # created after test_create_user, whose own mock resets the tables on exit
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbRestaurant.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+
+    DbRestaurant("ChIJifIePKtZwokRVZ-UdRGkZzs", name="Joe's Pizza Broadway").save()
+    for review_id, created_at, username in [
+        ("older", "2022-12-01 10:00:00", "theUser"),
+        ("newer", "2022-12-02 10:00:00", "theUser"),
+        ("someoneElses", "2022-12-03 10:00:00", "anotherUser"),
+    ]:
+        DbReview(
+            review_id,
+            created_at=created_at,
+            updated_at=created_at,
+            username=username,
+            restaurantId="ChIJifIePKtZwokRVZ-UdRGkZzs",
+            rating=4,
+            favorite_food="pizza",
+        ).save()
 
-    headers = {}
-    response = client.request(
+    headers: Dict = {}
+    response: httpx.Response = client.request(
         "GET",
-        "/users/{username}/reviews".format(username="username_example"),
+        "users/{username}/reviews".format(username="theUser"),
         headers=headers,
     )
+    assert response.status_code == 200
+    assert [review["id"] for review in response.json()["reviews"]] == [
+        "newer",
+        "older",
+    ]
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    response = client.request(
+        "GET",
+        "users/{username}/reviews".format(username="notTheUser"),
+        headers=headers,
+    )
+    assert response.status_code == 404
 
 
 @mock_dynamodb
@@ -200,7 +291,6 @@ def test_get_user_by_name(client: TestClient):
         "firstName": user_record.first_name,
         "lastName": user_record.last_name,
         "email": user_record.email,
-        "password": user_record.password,
     }
 
     # searching for username that doesn't exist
@@ -212,23 +302,176 @@ def test_get_user_by_name(client: TestClient):
     assert response.status_code == 404
 
 
+@mock_dynamodb
+def test_get_user_by_name_if_none_match(client: TestClient):
+    """Unchanged users are answered with 304 until the next write"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    test_create_user(client)
+
+    response: httpx.Response = client.request("GET", "users/theUser")
+    etag: str = response.headers["ETag"]
+
+    response = client.request(
+        "GET", "users/theUser", headers={"If-None-Match": f'"other", W/{etag}'}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    response = client.request(
+        "GET", "users/theUser/favorite-foods", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200  # tags are per listing
+    foods_etag: str = response.headers["ETag"]
+
+    response = client.request(
+        "PUT",
+        "users/theUser/favorite-foods",
+        json={"favoriteFoods": [{"id": 1, "name": "sushi"}]},
+    )
+    assert response.status_code == 200
+
+    with patch.dict("os.environ", {"FAST_JSON_RESPONSES": "true"}):
+        response = client.request(
+            "GET", "users/theUser", headers={"If-None-Match": etag}
+        )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert DbUser.get("theUser").version == 1
+
+    response = client.request(
+        "GET", "users/theUser/favorite-foods", headers={"If-None-Match": foods_etag}
+    )
+    assert response.status_code == 200
+    response = client.request(
+        "GET",
+        "users/theUser/favorite-foods",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
+@mock_dynamodb
+def test_batch_get_users(client: TestClient):
+    """Test case for batch_get_users
+
+    Get users by user names
+    """
+
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    for username in ["theUser", "otherUser"]:
+        DbUser(
+            username,
+            id=username,
+            first_name="John",
+            last_name="James",
+            email="john@email.com",
+            password="12345",
+        ).save()
+
+    response: httpx.Response = client.request(
+        "POST",
+        "./users:batchGet",
+        json={"keys": ["otherUser", "nobody", "theUser"]},
+    )
+
+    assert response.status_code == 200
+    assert [user["username"] for user in response.json()["users"]] == [
+        "otherUser",
+        "theUser",
+    ]
+
+    response = client.request(
+        "POST",
+        "./users:batchGet",
+        json={"keys": [f"user{i}" for i in range(1001)]},
+    )
+    assert response.status_code == 400
+
+
+@mock_dynamodb
 def test_login_user(client: TestClient):
     """Test case for login_user
 
     Logs user into the system
     """
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    test_create_user(client)  # using above test to create a user w/ username="theUser"
     login_user = {"password": "12345", "email": "john@email.com"}
 
     headers = {}
     response = client.request(
         "POST",
-        "/users/login",
+        "users/login",
         headers=headers,
         json=login_user,
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 200
+    assert response.json() == {"username": "theUser", "token": None}
+
+    response = client.request(
+        "POST",
+        "users/login",
+        headers=headers,
+        json={**login_user, "password": "54321"},
+    )
+    assert response.status_code == 400
+
+    response = client.request(
+        "POST",
+        "users/login",
+        headers=headers,
+        json={**login_user, "email": "nobody@email.com"},
+    )
+    assert response.status_code == 400
+
+
+@mock_dynamodb
+def test_login_user_rehashes_outdated_passwords(client: TestClient):
+    """Plain text passwords and hashes made with other parameters are replaced"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", email="john@email.com", password="12345").save()
+    login_user: Dict[str, str] = {"password": "12345", "email": "john@email.com"}
+
+    response: httpx.Response = client.request("POST", "users/login", json=login_user)
+
+    assert response.status_code == 200
+    stored: str = DbUser.get("theUser").password
+    assert stored.startswith(f"scrypt${password_service.PARAMS[0]}$")
+
+    cheaper: passwords.Params = (2**4, 8, 1)
+    with patch.object(password_service, "PARAMS", cheaper):
+        response = client.request("POST", "users/login", json=login_user)
+
+    assert response.status_code == 200
+    assert DbUser.get("theUser").password.startswith("scrypt$16$8$1$")
+    # still valid once rehashed
+    response = client.request("POST", "users/login", json=login_user)
+    assert response.status_code == 200
+
+
+@mock_dynamodb
+def test_login_user_busy(client: TestClient):
+    """Logins are turned away rather than queued once the hashing pool is full"""
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser("theUser", email="john@email.com", password="12345").save()
+
+    with patch.object(password_service, "MAX_PENDING", 0):
+        response: httpx.Response = client.request(
+            "POST",
+            "users/login",
+            json={"password": "12345", "email": "john@email.com"},
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert password_service.stats()["rejected"] == 1
 
 
 def test_logout_user(client: TestClient):
@@ -278,6 +521,7 @@ def test_update_favorite_foods(client: TestClient):
             {"id": 1, "name": "sushi"},
             {"id": 2, "name": "pizza"},
         ],
+        "nextCursor": None,
     }
 
     response = client.request(
@@ -289,21 +533,43 @@ def test_update_favorite_foods(client: TestClient):
     assert response.status_code == 404
 
 
+@mock_dynamodb
 def test_update_friends(client: TestClient):
     """Test case for update_friends
 
     Update friends of a user
     """
 
-    headers = {}
-    response = client.request(
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFriend.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    for username in ["theUser", "friend1", "friend2", "friend3"]:
+        DbUser(username).save()
+    DbFriend("theUser", "friend1").save()
+    DbFriend("friend1", "theUser").save()
+
+    headers: Dict = {}
+    response: httpx.Response = client.request(
         "PUT",
-        "/users/{username}/friends".format(username="username_example"),
+        "users/{username}/friends".format(username="theUser"),
         headers=headers,
+        json={"usernames": ["friend2", "friend3", "noAccount", "theUser"]},
     )
 
-    # uncomment below to assert the status code of the HTTP response
-    # assert response.status_code == 200
+    assert response.status_code == 200
+    assert [friend["username"] for friend in response.json()["friends"]] == [
+        "friend2",
+        "friend3",
+    ]
+    # edges are kept in both directions
+    assert sorted(
+        (friend.username, friend.friend_username) for friend in DbFriend.scan()
+    ) == [
+        ("friend2", "theUser"),
+        ("friend3", "theUser"),
+        ("theUser", "friend2"),
+        ("theUser", "friend3"),
+    ]
 
 
 @mock_dynamodb
@@ -316,6 +582,22 @@ def test_update_user(client: TestClient):
     DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
     client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
     test_create_user(client)  # using above test to create a user w/ username="theUser"
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFriend.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFeedItem.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFriend("theUser", "friendUser").save()
+    DbFriend("friendUser", "theUser").save()
+    for i in range(120):  # more than fit in one transaction
+        DbReview(
+            str(i),
+            username="theUser",
+            restaurantId="restaurant_id_example",
+            rating=5,
+            favorite_food="pizza",
+            starred=False,
+            created_at=str(i),
+            updated_at=str(i),
+        ).save()
 
     # only updating username
     update_user: Dict[str, str] = {
@@ -334,6 +616,15 @@ def test_update_user(client: TestClient):
         json=update_user,
     )
     assert response.status_code == 200
+    assert response.json()["username"] == "newUser"
+    assert DbUser.count("theUser") == 0
+    assert passwords.verify_password(
+        "12345", DbUser.get("newUser").password, password_service.PARAMS
+    ) == (True, None)
+    assert {review.username for review in DbReview.scan()} == {"newUser"}
+    assert [friend.friend_username for friend in DbFriend.query("friendUser")] == [
+        "newUser"
+    ]
 
     # creating another user w/ username="theUser" now that it's available
     test_user: DbUser = DbUser(
@@ -354,3 +645,189 @@ def test_update_user(client: TestClient):
     )
     # username "newUser" should be unavailable
     assert response.status_code == 409
+
+
+def _rename_fixture() -> None:
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbReview.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFriend.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbFeedItem.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    DbUser("old", id="1").save()
+    DbFeedItem("old", "1#review", review_id="review", author="pal").save()
+    DbFriend("old", "pal").save()
+    DbFriend("pal", "old").save()
+    for i in range(100):  # the last two spill into a second transaction
+        DbReview(
+            f"{i:03}",
+            username="old",
+            restaurantId="restaurant_id_example",
+            created_at=f"{i:03}",
+            updated_at=f"{i:03}",
+        ).save()
+
+
+@mock_dynamodb
+def test_update_user_rename_skips_deleted_reviews(client: TestClient):
+    """A review deleted while the user is renamed must not fail the rename"""
+    _rename_fixture()
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    transactions: List[int] = []
+
+    def delete_review_then_transact():
+        transactions.append(1)
+        if len(transactions) == 2:  # between the swap and the spill-over
+            DbReview("099").delete()
+        return transact_write()
+
+    with patch.object(
+        user_repository, "transact_write", side_effect=delete_review_then_transact
+    ):
+        response: httpx.Response = client.request(
+            "PUT", "users/old", json={"username": "new"}
+        )
+
+    assert response.status_code == 200
+    assert DbUser.count("old") == 0
+    assert {review.username for review in DbReview.scan()} == {"new"}
+    assert DbReview.count() == 99
+    # the home feed moves with the user
+    assert [(item.username, item.review_id) for item in DbFeedItem.scan()] == [
+        ("new", "review")
+    ]
+    assert sorted(
+        (edge.username, edge.friend_username) for edge in DbFriend.scan()
+    ) == [("new", "pal"), ("pal", "new")]
+
+
+@mock_dynamodb
+def test_update_user_rename_moves_friends_when_reviews_fail(client: TestClient):
+    """Once the user has moved, friends follow even if reviews could not"""
+    _rename_fixture()
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+
+    with patch.object(
+        user_repository, "_rewrite_remaining", side_effect=RuntimeError("throttled")
+    ):
+        response: httpx.Response = client.request(
+            "PUT", "users/old", json={"username": "new"}
+        )
+
+    assert response.status_code == 500
+    assert DbUser.count("old") == 0
+    assert DbUser.count("new") == 1
+    assert DbFeedItem.count("new") == 1
+    assert sorted(
+        (edge.username, edge.friend_username) for edge in DbFriend.scan()
+    ) == [("new", "pal"), ("pal", "new")]
+
+
+@mock_dynamodb
+def test_update_user_rename_drops_legacy_empty_email(client: TestClient):
+    """Users stored with email "" before it became None must still be renamed"""
+    _rename_fixture()
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    # an update stands in for a put from before the email index existed
+    DbUser("old").update(actions=[DbUser.email.set("")])
+
+    response: httpx.Response = client.request(
+        "PUT", "users/old", json={"username": "new"}
+    )
+
+    assert response.status_code == 200
+    assert DbUser.count("old") == 0
+    assert DbUser.get("new").email is None
+    assert DbUser.get("new").id == "1"
+
+
+@mock_dynamodb
+def test_update_user_writes_only_changed_fields(client: TestClient):
+    """Profile updates should leave attributes that were not sent untouched"""
+
+    DbUser.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbUser(
+        "theUser",
+        first_name="John",
+        last_name="James",
+        favorite_foods=[DbFavoriteFood(id=1, name="sushi")],
+    ).save()
+
+    response: httpx.Response = client.request(
+        "PUT", "users/theUser", json={"firstName": "Jim"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["firstName"] == "Jim"
+    assert response.json()["lastName"] == "James"
+    user_record: DbUser = DbUser.get("theUser")
+    assert user_record.first_name == "Jim"
+    assert [food.name for food in user_record.favorite_foods] == ["sushi"]
+
+    response = client.request("PUT", "users/nobody", json={"firstName": "Jim"})
+    assert response.status_code == 404
+    assert DbUser.count() == 1
+
+
+@mock_dynamodb
+def test_get_feed(client: TestClient):
+    """Test case for get_feed
+
+    Get recent reviews by friends of a user
+    """
+
+    for model in [DbUser, DbReview, DbRestaurant, DbFriend, DbFeedItem]:
+        model.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    client = TestClient(app, base_url="http://0.0.0.0:8080/api/v1/")
+    DbRestaurant("restaurant_id_example", name="Joe's Pizza Broadway").save()
+    DbUser("theUser").save()
+    DbUser("author").save()
+    DbUser("celebrity", pull_author=True).save()
+    DbFriend("theUser", "author").save()
+    DbFriend("author", "theUser").save()
+    DbFriend("theUser", "celebrity", pull_username="theUser").save()
+    DbFriend("celebrity", "theUser").save()
+
+    create_review: Dict = {
+        "restaurantId": "restaurant_id_example",
+        "username": "author",
+        "rating": 4,
+        "favoriteFood": "pizza",
+        "starred": False,
+    }
+    response: httpx.Response = client.request(
+        "POST",
+        "./reviews:batchCreate",
+        json={"reviews": [create_review, {**create_review, "rating": 5}]},
+    )
+    assert response.status_code == 200
+    fanned_out: List[str] = [review["id"] for review in response.json()["reviews"]]
+    # written after the fan-out, but never copied into feeds
+    DbReview(
+        "celebrity_review",
+        username="celebrity",
+        restaurantId="restaurant_id_example",
+        rating=3,
+        favorite_food="pizza",
+        starred=False,
+        created_at="9999",
+        updated_at="9999",
+    ).save()
+    assert DbFeedItem.count("theUser") == 2
+    assert DbFeedItem.count("celebrity") == 0
+
+    response = client.request("GET", "users/theUser/feed", params={"limit": 2})
+
+    assert response.status_code == 200
+    first_page: List[str] = [review["id"] for review in response.json()["reviews"]]
+    assert first_page[0] == "celebrity_review"
+    response = client.request(
+        "GET",
+        "users/theUser/feed",
+        params={"limit": 2, "cursor": response.json()["nextCursor"]},
+    )
+    second_page: List[str] = [review["id"] for review in response.json()["reviews"]]
+    assert sorted(first_page[1:] + second_page) == sorted(fanned_out)
+    assert response.json()["nextCursor"] is None
+
+    response = client.request("GET", "users/nobody/feed")
+    assert response.status_code == 404